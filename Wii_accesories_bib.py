@@ -13,147 +13,77 @@ import time
 import logging
 import evdev
 from evdev import ecodes, ff
-import glob
 import select
-import threading
 import sys
 import os
 import argparse
-import math
+import collections
 
-# Logger setup
-logging.basicConfig(level=logging.INFO, format='[%(asctime)s][%(levelname)s] %(message)s')
+from wii_calibration import default_store, evdev_board_key, evdev_board_sysfs, read_sysfs_calibration
+from wii_stats import resolve_registry
+from wii_signal import MorseDecoder, StabilityMonitor, PulseMonitor, BitClockEstimator # Re-exported (moved)
+from wii_demand import StreamDemand
+from wii_analytics import DEFAULT_PROFILE, IRTracker, BoardAnalytics, load_profile
+from wii_transport import SampleBatch, IR_CODES, set_ir_axis
+
+# Library logger; handlers are configured by applications (wiinux.setup_logging)
 logger = logging.getLogger("wii_accessories")
 
-# --- Utility: Morse Decoder with Integrator ---
+BOARD_CODES = range(16, 20) # TR, BR, TL, BL
+ACCEL_CODES = (3, 4, 5)     # ABS_RX, ABS_RY, ABS_RZ (hid-wiimote accelerometer node)
+NOMINAL_REPORT_RATE = 100.0 # Hz, used to estimate frames lost in an overrun
+MAX_GAP_HISTORY = 100
+FRAME_FLUSH_INTERVAL = 2.0 # s, longest stretch of a .wfc recording held in memory
 
-class MorseDecoder:
-    def __init__(self, bit_duration=0.1, callback=None):
-        self.bit_duration = bit_duration
-        self.callback = callback
-        self.buffer = []
-        self.lock = threading.Lock()
-        
-        self.last_update_time = time.time()
-        self.accumulated_active_time = 0.0
-        self.current_bit_progress = 0.0
-        self.is_currently_active = False
-
-    def feed(self, detected):
-        now = time.time()
-        dt = now - self.last_update_time
-        self.last_update_time = now
-
-        if self.is_currently_active:
-            self.accumulated_active_time += dt
-        
-        self.current_bit_progress += dt
-        self.is_currently_active = detected
-
-        if self.current_bit_progress >= self.bit_duration:
-            # Sensitive threshold (5%) to catch fast remotes
-            bit = 1 if (self.accumulated_active_time / self.current_bit_progress) > 0.05 else 0
-            
-            with self.lock:
-                self.buffer.append(bit)
-                self._check_buffer()
-            
-            self.current_bit_progress = 0
-            self.accumulated_active_time = 0
-
-    def _check_buffer(self):
-        if len(self.buffer) > 0:
-            stream = "".join(map(str, self.buffer[-20:]))
-            sys.stdout.write(f"\r[VLC Trace: ...{stream}]    ")
-            sys.stdout.flush()
-
-        if len(self.buffer) >= 10:
-            while len(self.buffer) >= 10:
-                if self.buffer[0] == 1 and self.buffer[9] == 0:
-                    data_bits = self.buffer[1:9]
-                    val = 0
-                    for i, b in enumerate(data_bits):
-                        val |= (b << (7 - i))
-                    if self.callback: self.callback(val)
-                    self.buffer = self.buffer[10:]
-                    break
-                else:
-                    self.buffer.pop(0)
-
-# --- Utility: Signal Stability Monitor ---
-
-class StabilityMonitor:
-    """
-    Tracks if coordinates are stable or jumping wildly.
-    Jumping points = Noise/Movement. Stable points = Signal.
-    """
-    def __init__(self, radius=50):
-        self.radius = radius
-        self.anchor_point = None
-        self.last_seen_time = 0
-        self.stability_factor = 0.0 # 0.0 to 1.0
-        self._history = [] # Bool: was it stable?
-
-    def feed(self, p):
-        now = time.time()
-        is_stable = False
-        
-        if p is None:
-            if now - self.last_seen_time > 0.5:
-                self.anchor_point = None
-        else:
-            if self.anchor_point is None:
-                self.anchor_point = p
-                is_stable = True
-            else:
-                dist = math.sqrt((p[0]-self.anchor_point[0])**2 + (p[1]-self.anchor_point[1])**2)
-                if dist < self.radius:
-                    is_stable = True
-                else:
-                    # Point jumped! Update anchor but mark as jitter
-                    self.anchor_point = p
-            self.last_seen_time = now
-
-        self._history.append(is_stable)
-        if len(self._history) > 100: self._history.pop(0)
-        self.stability_factor = sum(self._history) / len(self._history)
-        return is_stable
-
-# --- Utility: IR Pulse Monitor ---
-
-class PulseMonitor:
-    def __init__(self):
-        self.last_state = False
-        self.last_change_time = time.time()
-        self.is_valid = False # Only print if SF is high
-
-    def feed(self, detected, is_stable):
-        now = time.time()
-        trigger = detected and is_stable
-        if trigger != self.last_state:
-            duration_ms = (now - self.last_change_time) * 1000
-            label = "HOT " if self.last_state else "COLD"
-            if duration_ms > 2: 
-                # Print only pulses, avoid status line mess
-                sys.stdout.write(f"\n[Pulse: {label} {duration_ms:4.0f}ms]\n")
-            self.last_state = trigger
-            self.last_change_time = now
+def read_abs_state(device, codes):
+    """Current absolute axis values from the kernel (EVIOCGABS). None if the device is gone."""
+    try: return {code: device.absinfo(code).value for code in codes}
+    except OSError: return None
 
 # --- Wii Remote (IR Eye) Native ---
 
 class WiiEyeNative:
-    def __init__(self, bit_duration=0.1, raw_mode=False):
+    def __init__(self, bit_duration=0.1, raw_mode=False, stats=None, acquisition=None, record_format='status',
+                 on_demand=False, auto_clock=False, profile=None):
         self.dev_buttons = None
         self.dev_ir = None
+        self.dev_accel = None
+        # hid-wiimote enables IR / accelerometer reporting only while their node is open.
+        # on_demand=True: the IR node is open only while B is held or a consumer
+        # subscribe()d to 'ir'; the accelerometer node only for 'accel' subscribers.
+        self.on_demand = on_demand
+        self.streams = StreamDemand(('ir', 'accel'), self._on_stream_change)
+        self._ir_node = None
+        self._accel_node = None
+        self.accel = [0, 0, 0]
         self.running = False
+        # None: read inline in update(); 'thread' / 'process': dedicated reader (wii_acquire)
+        self.acquisition = acquisition
         self.raw_mode = raw_mode
-        self.points = [None] * 4 
-        self.points_persistence = [0.0] * 4 # Timestamps for clearing
+        self.device_id = None
+        self.frame = [None] * 4 # IR points of the report being read (no persistence)
         self.button_b = False
+        self.timestamp = 0.0 # Kernel time of the last complete IR report (SYN_REPORT)
+        # Evdev buffer overruns: fd -> True while discarding up to the next SYN_REPORT
+        self._dropping = {}
+        self.overruns = 0
+        self.gaps = collections.deque(maxlen=MAX_GAP_HISTORY) # (kernel ts, lost seconds)
+        # Instrumentation (wii_stats): None = off
+        self.stats_registry = resolve_registry(stats)
+        self.stats = None
         
-        self.decoder = MorseDecoder(bit_duration=bit_duration, callback=self._on_id_found)
-        self.stability = StabilityMonitor(radius=60)
-        self.pulsemon = PulseMonitor()
+        # Decoder parameters: a wii_tune profile (path or dict) overrides the arguments
+        params = dict(DEFAULT_PROFILE, bit_duration=bit_duration, auto_clock=auto_clock)
+        if profile: params.update(load_profile(profile) if isinstance(profile, str) else profile)
+        self.profile = params
+        # Persistence, stability, VLC decoding and the bit clock (wii_analytics),
+        # fed with one SampleBatch of kernel-timestamped frames per update()
+        self.tracker = IRTracker(**params, on_id_detected=self._on_id_found, trace=True, verbose=True,
+                                 on_clock=self._on_clock_update)
+        self.tracker.decoding = False # Only while B is held
+        self._frames_ts = []
+        self._frames = []
+        self._clock_logged = None
         
         self.on_id_detected = None
         self._ff_effect_id = None
@@ -164,20 +94,87 @@ class WiiEyeNative:
         self.raw_event_buffer = [] 
         self.is_recording = False
         self.last_idle_start = 0
+        # 'status': RLE rows -> wiieye_status_*.csv on release, 'wfc': every frame streamed to
+        # wiieye_frames_*.wfc (wii_codec, size follows signal activity)
+        if record_format not in ('status', 'wfc'): raise ValueError(f"Unknown record format: {record_format}")
+        self.record_format = record_format
+        self.frame_encoder = None
+
+    def _open_devices(self):
+        """Candidate input nodes (overridden by wii_broker.BrokerEye)."""
+        return [evdev.InputDevice(path) for path in evdev.list_devices()]
+
+    def _reopen(self, node):
+        """Fresh handle on a node found by _open_devices (overridden by wii_broker.BrokerEye)."""
+        return evdev.InputDevice(node.path)
 
     def connect(self):
-        devices = [evdev.InputDevice(path) for path in evdev.list_devices()]
+        devices = self._open_devices()
         for dev in devices:
             if "Nintendo Wii Remote" in dev.name:
-                if "IR" in dev.name: self.dev_ir = dev
-                elif "Accelerometer" not in dev.name: self.dev_buttons = dev
-        
-        if not self.dev_buttons or not self.dev_ir: return False
+                if "IR" in dev.name: self._ir_node = dev
+                elif "Accelerometer" in dev.name: self._accel_node = dev
+                else: self.dev_buttons = dev
+        for dev in devices:
+            # Unused nodes must not stay open: an open accelerometer node keeps it streaming
+            if dev is not self.dev_buttons: dev.close()
+
+        if not self.dev_buttons or not self._ir_node: return False
+        self.device_id = self._ir_node.uniq or self._ir_node.path
+        if self.acquisition:
+            from wii_acquire import AcquiredDevice
+            self.dev_buttons = AcquiredDevice(self.dev_buttons, self.acquisition)
+        if self.stats_registry:
+            self.stats = self.stats_registry.device(self.device_id)
         try: self._setup_rumble()
         except Exception as e: logger.warning(f"Rumble init failed: {e}")
         self.running = True
+        if not self.on_demand or self.raw_mode: self.streams.acquire('ir')
         return True
 
+    def subscribe(self, stream):
+        """Consumer of 'ir' or 'accel' (see on_demand); pair with unsubscribe()."""
+        self.streams.acquire(stream)
+
+    def unsubscribe(self, stream):
+        self.streams.release(stream)
+
+    def _open_stream_node(self, node):
+        dev = self._reopen(node)
+        if self.acquisition:
+            from wii_acquire import AcquiredDevice
+            dev = AcquiredDevice(dev, self.acquisition)
+        return dev
+
+    def _on_stream_change(self, stream, active):
+        if stream == 'ir':
+            if active and self.dev_ir is None:
+                self.dev_ir = self._open_stream_node(self._ir_node)
+            elif not active and self.dev_ir is not None:
+                self._dropping.pop(self.dev_ir.fd, None)
+                self.dev_ir.close()
+                self.dev_ir = None
+                self.frame = [None] * 4
+                self.tracker.points = [None] * 4
+            logger.info(f"IR stream {'on' if active else 'off'}")
+        elif stream == 'accel':
+            if self._accel_node is None:
+                logger.warning("No accelerometer node for this remote")
+            elif active and self.dev_accel is None:
+                self.dev_accel = self._open_stream_node(self._accel_node)
+            elif not active and self.dev_accel is not None:
+                self._dropping.pop(self.dev_accel.fd, None)
+                self.dev_accel.close()
+                self.dev_accel = None
+
+    def close(self):
+        """Closes all nodes (and stops dedicated readers)."""
+        self.running = False
+        self._close_frame_encoder() # Released mid-recording: keep what was recorded
+        for dev in (self.dev_buttons, self.dev_ir, self.dev_accel):
+            if dev: dev.close()
+        self.dev_buttons = self.dev_ir = self.dev_accel = None
+
     def _setup_rumble(self):
         rumble = ff.Rumble(strong_magnitude=0xffff, weak_magnitude=0xffff)
         effect = ff.Effect(
@@ -195,82 +192,164 @@ class WiiEyeNative:
                     self.dev_buttons.write(ecodes.EV_FF, self._ff_effect_id, 1)
                     self._rumble_active = True
                     self._rumble_stop_time = time.time() + 0.2
-                except: pass
+                except OSError: pass
+
+    # Tracker state, kept as driver attributes for existing callers
+    points = property(lambda self: self.tracker.points, doc="IR points with 150 ms persistence")
+    decoder = property(lambda self: self.tracker.decoder)
+    stability = property(lambda self: self.tracker.stability)
+    pulsemon = property(lambda self: self.tracker.pulsemon)
+    clock = property(lambda self: self.tracker.clock)
+    auto_clock = property(lambda self: self.tracker.auto_clock)
 
     def _on_id_found(self, val):
-        # We only log DECODED if stability is decent
-        if self.stability.stability_factor > 0.1:
-            logger.info(f"!!! DECODED: 0x{val:02X} (SF:{self.stability.stability_factor:.2f}) !!!")
-            if self.on_id_detected: self.on_id_detected(val)
-            self.pulse_rumble()
+        # Called by the tracker only when stability is decent (SF > min_sf)
+        if self.on_id_detected: self.on_id_detected(val)
+        if self.stats: self.stats.callback(self.timestamp)
+        self.pulse_rumble()
+
+    def stats_snapshot(self):
+        """Instrumentation snapshot (dict), or None when stats are disabled."""
+        return self.stats.snapshot() if self.stats else None
+
+    def _set_button_b(self, new_val):
+        if new_val and not self.button_b:
+            self.is_recording = True
+            self.recording_buffer = []
+            self.raw_event_buffer = []
+            self.last_idle_start = 0
+            if self.record_format == 'wfc': self._open_frame_encoder()
+            if self.on_demand: self.streams.acquire('ir') # Decoding / recording consumer
+            self.tracker.decoding = True
+            logger.info("REC Start")
+        elif not new_val and self.button_b:
+            self.is_recording = False
+            self.tracker.decoding = False
+            if self.on_demand: self.streams.release('ir')
+            self._close_frame_encoder()
+            self._save_to_csv()
+        self.button_b = new_val
+
+    def _on_clock_update(self, clock):
+        # Log the lock and period changes > 5%, not every edge
+        if self._clock_logged is None or abs(clock.bit_duration - self._clock_logged) > 0.05 * self._clock_logged:
+            self._clock_logged = clock.bit_duration
+            logger.info(f"VLC clock: {clock.summary()}")
+
+    def _set_ir_axis(self, code, value):
+        was_visible = self.frame[(code - 16) // 2] is not None
+        idx = set_ir_axis(self.frame, code, value)
+        cur = self.frame[idx]
+        if cur is not None and not was_visible and self.raw_mode:
+            # First burst in this cycle
+            sys.stdout.write(f"\n[IR BURST] P{idx}:({cur[0]:4d},{cur[1]:4d})")
+            sys.stdout.flush()
+
+    def _end_frame(self, ts):
+        """SYN_REPORT: the current points are one frame for the tracker."""
+        self.timestamp = ts
+        self._frames_ts.append(ts)
+        self._frames.append(list(self.frame))
+        if self.is_recording and self.frame_encoder: self.frame_encoder.encode(ts, self.frame)
+
+    def _flush_frames(self):
+        """Feeds the frames read so far to the tracker. False if there were none."""
+        if not self._frames_ts: return False
+        self.tracker.feed(SampleBatch(self.device_id, 'ir', self._frames_ts, self._frames))
+        self._frames_ts, self._frames = [], []
+        return True
+
+    def _resync(self, fd, ts):
+        """
+        After SYN_DROPPED: the kernel discarded queued events, so rebuild the
+        state from the device itself (EVIOCGABS for IR axes, EVIOCGKEY for B).
+        """
+        del self._dropping[fd]
+        if self.dev_accel is not None and fd == self.dev_accel.fd:
+            state = read_abs_state(self.dev_accel, ACCEL_CODES)
+            if state is not None: self.accel = [state[c] for c in ACCEL_CODES]
+        elif self.dev_ir is not None and fd == self.dev_ir.fd:
+            gap = ts - self.timestamp if self.timestamp else 0.0
+            self.overruns += 1
+            self.gaps.append((ts, gap))
+            state = read_abs_state(self.dev_ir, IR_CODES)
+            self._flush_frames()
+            if state is not None:
+                self.frame = [None] * 4
+                for code in IR_CODES: self._set_ir_axis(code, state[code])
+            # Bits integrated across the gap are garbage, start a new frame
+            self.tracker.restart(ts, list(self.frame) if state is not None else None)
+            self.timestamp = ts
+            if self.stats: self.stats.add('dropped', max(1, round(gap * NOMINAL_REPORT_RATE) - 1))
+            logger.warning(f"IR input overrun: {gap * 1000:.0f} ms lost, state resynced (#{self.overruns})")
+        else:
+            try: self._set_button_b(ecodes.BTN_EAST in self.dev_buttons.active_keys())
+            except OSError: pass
+            logger.warning("Button input overrun, state resynced")
 
     def update(self):
+        stats = self.stats
+        if stats:
+            loop_start = stats.loop_start()
+            frames = events = 0
         if self._rumble_active and time.time() > self._rumble_stop_time:
             if self._ff_effect_id is not None:
                 try: self.dev_buttons.write(ecodes.EV_FF, self._ff_effect_id, 0)
-                except: pass
+                except OSError: pass
             self._rumble_active = False
 
-        devices = {self.dev_buttons.fd: self.dev_buttons, self.dev_ir.fd: self.dev_ir}
+        devices = {dev.fd: dev for dev in (self.dev_buttons, self.dev_ir, self.dev_accel) if dev is not None}
         r, w, x = select.select(devices.keys(), [], [], 0.0)
         for fd in r:
+            dev = devices[fd]
+            if dev is not self.dev_buttons and dev is not self.dev_ir and dev is not self.dev_accel:
+                continue # Stream switched off during this update()
             try:
                 for event in devices[fd].read():
+                    if fd in self._dropping:
+                        # Overrun: events up to the next SYN_REPORT are incomplete
+                        if event.type == ecodes.EV_SYN and event.code == ecodes.SYN_REPORT:
+                            self._resync(fd, event.timestamp())
+                        continue
+                    if event.type == ecodes.EV_SYN and event.code == ecodes.SYN_DROPPED:
+                        self._dropping[fd] = True
+                        if stats: stats.add('syn_dropped')
+                        continue
                     if fd == self.dev_buttons.fd:
                         if event.type == ecodes.EV_KEY and event.code == ecodes.BTN_EAST:
-                            new_val = bool(event.value)
-                            if new_val and not self.button_b:
-                                self.is_recording = True
-                                self.recording_buffer = []
-                                self.raw_event_buffer = []
-                                self.last_idle_start = 0
-                                logger.info("REC Start")
-                            elif not new_val and self.button_b:
-                                self.is_recording = False
-                                self._save_to_csv()
-                            self.button_b = new_val
-                    elif fd == self.dev_ir.fd:
+                            self._set_button_b(bool(event.value))
+                    elif self.dev_accel is not None and fd == self.dev_accel.fd:
+                        if event.type == ecodes.EV_ABS and event.code in ACCEL_CODES:
+                            self.accel[event.code - ACCEL_CODES[0]] = event.value
+                    elif self.dev_ir is not None and fd == self.dev_ir.fd:
+                        if stats: events += 1
                         if (self.is_recording or self.raw_mode) and event.type == ecodes.EV_ABS:
                             self.raw_event_buffer.append([event.timestamp(), event.code, event.value])
                             if self.raw_mode:
                                 sys.stdout.write(f"\n[RAW IR] t:{event.timestamp():.3f} code:{event.code:2d} val:{event.value:4d}")
                                 sys.stdout.flush()
                         
-                        if event.type == ecodes.EV_ABS and 16 <= event.code <= 23:
-                            idx, axis = (event.code - 16) // 2, (event.code - 16) % 2
-                            cur = list(self.points[idx] or [1023, 1023])
-                            cur[axis] = event.value
-                            if cur == [1023, 1023]:
-                                self.points[idx] = None
-                            else:
-                                if self.points[idx] is None:
-                                    # First burst in this cycle
-                                    if self.raw_mode:
-                                        sys.stdout.write(f"\n[IR BURST] P{idx}:({cur[0]:4d},{cur[1]:4d})")
-                                        sys.stdout.flush()
-                                self.points[idx] = cur
-                                self.points_persistence[idx] = time.time() + 0.15 # 150ms visibility
-            except: pass
+                        if event.type == ecodes.EV_ABS and event.code in IR_CODES:
+                            self._set_ir_axis(event.code, event.value)
+                        elif event.type == ecodes.EV_SYN and event.code == ecodes.SYN_REPORT:
+                            self._end_frame(event.timestamp())
+                            if stats:
+                                stats.frame(self.timestamp, events)
+                                frames += 1
+                                events = 0
+            except BlockingIOError: pass
+            except OSError as e:
+                if self.running: logger.warning(f"Wiimote read failed: {e}")
+                self.running = False
         
-        # Persistence Logic: Show points even after they flicker out
-        now = time.time()
-        display_points = []
-        for i in range(4):
-            if self.points[i] and now > self.points_persistence[i]:
-                self.points[i] = None
-            display_points.append(self.points[i])
-
-        p0 = display_points[0]
-        is_stable = self.stability.feed(p0)
-        
-        if self.button_b:
-            active = p0 is not None
-            # Feed decoder ONLY if point is relatively stable
-            self.decoder.feed(active and is_stable)
-            self.pulsemon.feed(active, is_stable)
+        # Persistence, stability and decoding run on the frame timestamps; a silent
+        # camera (no reports while dark) still advances them on the wall clock
+        if not self._flush_frames(): self.tracker.tick(time.time())
 
         # RLE Recording
-        if self.is_recording:
+        if self.is_recording and self.frame_encoder:
+            self.frame_encoder.poll(time.time()) # Frames are encoded per SYN_REPORT
+        elif self.is_recording:
             now = time.time()
             if any(p is not None for p in self.points):
                 row = [now, 0]
@@ -288,6 +367,23 @@ class WiiEyeNative:
                         row = [now, dur] + [None]*8
                         self.recording_buffer.append(row)
 
+        if stats: stats.loop_end(loop_start, frames)
+
+    def _open_frame_encoder(self):
+        from wii_codec import FrameEncoder
+        fn = f"wiieye_frames_{int(time.time())}.wfc"
+        self.frame_encoder = FrameEncoder(open(fn, 'wb'), flush_interval=FRAME_FLUSH_INTERVAL)
+        self.frame_encoder.path = fn
+
+    def _close_frame_encoder(self):
+        encoder = self.frame_encoder
+        if encoder is None: return
+        self.frame_encoder = None
+        out = encoder.out
+        encoder.close()
+        out.close()
+        logger.info(f"Saved: {encoder.path} ({encoder.frames} frames, {encoder.bytes_written} bytes)")
+
     def _save_to_csv(self):
         if not self.recording_buffer and not self.raw_event_buffer: return
         ts = int(time.time())
@@ -310,45 +406,154 @@ class WiiEyeNative:
 # --- Wii Balance Board Native ---
 
 class WiiboardNative:
-    def __init__(self):
+    def __init__(self, calibration_store=None, stats=None, acquisition=None, sensor_filter=None):
         self.device = None
+        self.acquisition = acquisition # None, 'thread' or 'process' (wii_acquire)
+        self.board_id = None # Board MAC (or phys), key of the calibration cache
+        self.calibration_store = calibration_store if calibration_store is not None else default_store()
         self.code_to_index = {16: 0, 17: 1, 18: 2, 19: 3}
-        self.raw_values = [0] * 4
+        self.raw_values = [0] * 4 # Last kernel values
+        # Optional per-sensor filter (wii_filter): SensorFilter or dict of its arguments.
+        # values = filtered raw_values; weight, tare and samples use them.
+        if sensor_filter is not None:
+            from wii_filter import make_filter
+            sensor_filter = make_filter(sensor_filter)
+        self.sensor_filter = sensor_filter
+        self.values = [0] * 4
         self.calib = [] 
-        self.tare_offset = 0.0
-        self.weight = 0.0
-
-    def connect(self):
-        devices = [evdev.InputDevice(path) for path in evdev.list_devices()]
-        for dev in devices:
-            if "Nintendo" in dev.name and "Balance Board" in dev.name:
-                self.device = dev
-                if self.load_calibration():
+        # Tare, weight and center of pressure (wii_analytics), fed with one
+        # SampleBatch of calibrated sensor masses per drain
+        self.analytics = BoardAnalytics()
+        self.timestamp = 0.0 # Kernel time of the last complete report (SYN_REPORT)
+        self._dropping = False # Discarding up to the next SYN_REPORT after an overrun
+        self.overruns = 0
+        self.gaps = collections.deque(maxlen=MAX_GAP_HISTORY) # (kernel ts, lost seconds)
+        # Instrumentation (wii_stats): None = off
+        self.stats_registry = resolve_registry(stats)
+        self.stats = None
+
+    def connect(self, path=None, reuse_tare=False):
+        """
+        Connects to the first Balance Board found, or to the given evdev node.
+        reuse_tare: restore the last cached tare instead of re-taring (reconnect).
+        """
+        paths = [path] if path else self._board_paths()
+        for p in paths:
+            self.device = self._open_board(p)
+            if self.load_calibration():
+                if self.acquisition:
+                    from wii_acquire import AcquiredDevice
+                    self.device = AcquiredDevice(self.device, self.acquisition)
+                if self.stats_registry: self.stats = self.stats_registry.device(self.board_id or p)
+                if not (reuse_tare and self.restore_tare()):
                     self._auto_tare_sequence()
-                    return True
+                return True
+            self.close() # Not this board (no calibration): release its node before the next one
         return False
 
+    def _board_paths(self):
+        return list_board_paths()
+
+    def _open_board(self, path):
+        """Input node of one board (overridden by wii_broker.BrokerBoard)."""
+        return evdev.InputDevice(path)
+
+    def fileno(self):
+        return self.device.fd
+
+    def close(self):
+        if self.device: self.device.close()
+        self.device = None
+
+    def stats_snapshot(self):
+        """Instrumentation snapshot (dict), or None when stats are disabled."""
+        return self.stats.snapshot() if self.stats else None
+
     def load_calibration(self):
-        paths = glob.glob("/sys/bus/hid/drivers/wiimote/*/bboard_calib")
-        if not paths: return False
-        try:
-            with open(paths[0], 'r') as f:
-                parts = f.read().strip().split(':')
-                vals = [int(p, 16) for p in parts]
-                self.calib = []
-                for s in range(4): self.calib.append([vals[s], vals[s + 4], vals[s + 8]])
-                return True
-        except: return False
+        """
+        Calibration of THIS board: from the cache (keyed by board MAC), else
+        from the bboard_calib node of its own HID device in sysfs.
+        """
+        store = self.calibration_store
+        key = evdev_board_key(self.device)
+        blocks = store.get(key) if key else None
+        if blocks is None:
+            sys_key, calib_path = evdev_board_sysfs(self.device)
+            key = key or sys_key
+            if not calib_path: return False
+            try: blocks = read_sysfs_calibration(calib_path)
+            except (OSError, ValueError): return False
+            store.put(key, blocks, source="sysfs")
+        self.board_id = key
+        self.calib = [[blocks[0][s], blocks[1][s], blocks[2][s]] for s in range(4)]
+        return True
+
+    @property
+    def weight(self):
+        """Total mass (kg) after tare, as of the last drained report."""
+        return self.analytics.weight
+
+    @weight.setter
+    def weight(self, value):
+        self.analytics.weight = value
+
+    @property
+    def tare_sensors(self):
+        return self.analytics.tare_sensors
+
+    @tare_sensors.setter
+    def tare_sensors(self, values):
+        self.analytics.tare_sensors = list(values)
+
+    @property
+    def tare_offset(self):
+        return sum(self.analytics.tare_sensors)
+
+    @tare_offset.setter
+    def tare_offset(self, value):
+        # spread the change evenly so sum(tare_sensors) stays the offset
+        delta = (value - self.tare_offset) / 4
+        self.analytics.tare_sensors = [t + delta for t in self.analytics.tare_sensors]
+
+    def restore_tare(self):
+        """Applies the last cached tare of this board. False if there is none."""
+        last = self.calibration_store.last_tare(self.board_id) if self.board_id else None
+        if not last or not last[1]: return False
+        self.analytics.tare_sensors = list(last[1])
+        return True
 
     def _auto_tare_sequence(self):
-        start = time.time()
-        while True:
-            self.update()
-            if time.time() - start > 0.5: break
-        self.tare()
+        self.tare(samples=self.analytics.tare_samples)
+
+    def tare(self, samples=None, timeout=2.0):
+        """
+        Zeroes the board on the last drained report and caches the tare.
+        With `samples`, averages that many upcoming reports instead (50 is
+        0.5 s); False when the board sent too few within `timeout`, the
+        tare then completes on later reports, uncached.
+        """
+        analytics = self.analytics
+        if not samples:
+            analytics.tare_sensors = [s + t for s, t in zip(analytics.sensors, analytics.tare_sensors)]
+            analytics.sensors = [0.0] * 4
+            analytics.weight = 0.0
+        else:
+            analytics.tare(samples)
+            deadline = time.time() + timeout
+            while analytics.taring and time.time() < deadline:
+                self.update()
+                time.sleep(0.005)
+            if analytics.taring:
+                logger.warning("Tare: no board reports")
+                return False
+        if self.board_id: self.calibration_store.add_tare(self.board_id, self.tare_offset, self.tare_sensors)
+        return True
 
-    def tare(self):
-        self.tare_offset = sum([self.get_weight_for_sensor(i, self.raw_values[i]) for i in range(4)])
+    def sensor_weights(self, raw_values=None):
+        """Per-sensor mass (kg) after tare, order: TR, BR, TL, BL."""
+        if raw_values is None: return list(self.analytics.sensors)
+        tare = self.analytics.tare_sensors
+        return [self.get_weight_for_sensor(i, raw_values[i]) - tare[i] for i in range(4)]
 
     def get_weight_for_sensor(self, index, raw_input):
         c0, c17, c34 = self.calib[index]
@@ -358,41 +563,145 @@ class WiiboardNative:
         if raw_input < range1: return 17.0 * raw_input / range1
         else: return 17.0 + 17.0 * (raw_input - range1) / range2
 
-    def update(self):
-        if not self.device: return
+    def read_samples(self):
+        """
+        Drains all pending events without blocking.
+        Returns one (kernel_timestamp, values) pair per complete report
+        (filtered when a sensor_filter is set).
+        """
+        samples = self._drain()
+        self._emit(samples)
+        return samples
+
+    def read_batch(self):
+        """Drains like read_samples(); SampleBatch of calibrated (untared) kg, or None."""
+        return self._emit(self._drain())
+
+    def _emit(self, samples):
+        if not samples: return None
+        weight = self.get_weight_for_sensor
+        batch = SampleBatch(self.board_id or getattr(self.device, 'path', None), 'board', [t for t, raw in samples],
+                            [[weight(i, raw[i]) for i in range(4)] for t, raw in samples])
+        self.analytics.feed(batch)
+        return batch
+
+    def _drain(self):
+        samples = []
+        if not self.device: return samples
+        stats = self.stats
+        if stats:
+            loop_start = stats.loop_start()
+            events = 0
         while True:
-            r, w, x = select.select([self.device.fd], [], [], 0.0)
-            if not r: break
             try:
                 for event in self.device.read():
-                    if event.type == ecodes.EV_ABS and event.code in self.code_to_index:
+                    if stats: events += 1
+                    if self._dropping:
+                        # Overrun: events up to the next SYN_REPORT are incomplete
+                        if event.type == ecodes.EV_SYN and event.code == ecodes.SYN_REPORT:
+                            self._resync(event.timestamp())
+                            samples.append((self.timestamp, self._sample_values()))
+                            events = 0
+                    elif event.type == ecodes.EV_ABS and event.code in self.code_to_index:
                         self.raw_values[self.code_to_index[event.code]] = event.value
-            except: break
-        self.weight = sum([self.get_weight_for_sensor(i, self.raw_values[i]) for i in range(4)]) - self.tare_offset
+                    elif event.type == ecodes.EV_SYN and event.code == ecodes.SYN_REPORT:
+                        self.timestamp = event.timestamp()
+                        samples.append((self.timestamp, self._sample_values()))
+                        if stats:
+                            stats.frame(self.timestamp, events)
+                            events = 0
+                    elif event.type == ecodes.EV_SYN and event.code == ecodes.SYN_DROPPED:
+                        self._dropping = True
+                        if stats: stats.add('syn_dropped')
+            except BlockingIOError: break
+            except OSError as e:
+                logger.warning(f"Board read failed: {e}")
+                break
+        if stats: stats.loop_end(loop_start, len(samples))
+        return samples
+
+    def _sample_values(self):
+        if self.sensor_filter is None: self.values = list(self.raw_values)
+        else: self.values = self.sensor_filter.update(self.timestamp, self.raw_values).tolist()
+        return self.values
+
+    def _resync(self, ts):
+        """After SYN_DROPPED: re-read all four sensors from the kernel (EVIOCGABS)."""
+        self._dropping = False
+        gap = ts - self.timestamp if self.timestamp else 0.0
+        self.overruns += 1
+        self.gaps.append((ts, gap))
+        state = read_abs_state(self.device, BOARD_CODES)
+        if state is not None:
+            for code in BOARD_CODES: self.raw_values[self.code_to_index[code]] = state[code]
+        self.timestamp = ts
+        if self.stats: self.stats.add('dropped', max(1, round(gap * NOMINAL_REPORT_RATE) - 1))
+        logger.warning(f"Board input overrun: {gap * 1000:.0f} ms lost, state resynced (#{self.overruns})")
+
+    def update(self):
+        if not self.device: return
+        self.read_samples()
+
+def list_board_paths():
+    """Returns evdev paths of all connected Balance Boards."""
+    paths = []
+    for path in evdev.list_devices():
+        dev = evdev.InputDevice(path)
+        if "Nintendo" in dev.name and "Balance Board" in dev.name:
+            paths.append(path)
+        dev.close()
+    return paths
 
 # --- Interactive Diagnostic ---
 
 def main():
+    from wiinux import setup_logging
+    setup_logging()
     parser = argparse.ArgumentParser()
     parser.add_argument("--bit-duration", type=float, default=0.1)
+    parser.add_argument("--auto-clock", action="store_true", help="Estimate the bit duration from the pulses")
+    parser.add_argument("--profile", help="Decoder profile written by wii_tune.py")
     parser.add_argument("--raw", action="store_true", help="Stream absolute raw events")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this port")
+    parser.add_argument("--acquisition", choices=["thread", "process"], help="Read devices in a dedicated thread/process")
+    parser.add_argument("--on-demand", action="store_true", help="IR reporting only while B is held")
+    parser.add_argument("--record-format", choices=["status", "wfc"], default="status", help="B-hold recording: RLE CSV or frame codec")
+    parser.add_argument("--filter", choices=["median", "one_pole", "kalman"], help="Board: per-sensor filter (wii_filter)")
+    parser.add_argument("--median", type=int, default=5, help="Board filter: median window (reports)")
+    parser.add_argument("--latency", type=float, default=0.1, help="Board filter: latency budget (s)")
     args, unknown = parser.parse_known_args()
 
+    registry = None
+    if args.metrics_port:
+        from wii_stats import StatsRegistry, serve_prometheus
+        registry = StatsRegistry()
+        serve_prometheus(registry, args.metrics_port)
+        print(f"Metrics: http://127.0.0.1:{args.metrics_port}/metrics")
+
     print(f"\n--- Wii Accessories Diagnostic v1.9 {'[RAW MODE]' if args.raw else ''} ---")
     print("1. Wii Balance Board")
     print("2. Wiimote IR (Stability + Monitor)")
     choice = input("Choice (1/2): ")
 
     if choice == '1':
-        board = WiiboardNative()
+        sensor_filter = None
+        if args.filter:
+            sensor_filter = {'median': args.median, 'latency': args.latency,
+                             'smoother': None if args.filter == 'median' else args.filter}
+        board = WiiboardNative(stats=registry, acquisition=args.acquisition, sensor_filter=sensor_filter)
         if board.connect():
             try:
                 while True: board.update(); print(f"\rWeight: {board.weight:6.2f} kg", end=""); time.sleep(0.01)
             except KeyboardInterrupt: pass
+            finally: board.close()
     elif choice == '2':
-        eye = WiiEyeNative(bit_duration=args.bit_duration, raw_mode=args.raw)
+        eye = WiiEyeNative(bit_duration=args.bit_duration, raw_mode=args.raw, stats=registry, acquisition=args.acquisition,
+                           record_format=args.record_format, on_demand=args.on_demand, auto_clock=args.auto_clock,
+                           profile=args.profile)
         if eye.connect():
-            print(f"B-Hold mode. Bit: {args.bit_duration*1000:.0f}ms. CTRL+C to quit.")
+            bit_ms = eye.profile['bit_duration'] * 1000
+            bit = f"auto (from {bit_ms:.0f}ms)" if eye.auto_clock else f"{bit_ms:.0f}ms"
+            print(f"B-Hold mode. Bit: {bit}. CTRL+C to quit.")
             if args.raw: print("RAW STREAM ACTIVE. Every kernel event will be printed.")
             try:
                 last_ui = 0
@@ -409,6 +718,7 @@ def main():
                         last_ui = time.time()
                     time.sleep(0.005)
             except KeyboardInterrupt: pass
+            finally: eye.close()
     else: print("Error.")
 
 if __name__ == "__main__":
@@ -5,11 +5,14 @@ import sys
 
 # Import our new library
 try:
-    from wiiboard_native import WiiboardNative
-except ImportError:
-    print("Błąd: Nie znaleziono wiiboard_native.py w tym katalogu.")
+    from Wii_accesories_bib import WiiboardNative
+    from wii_resample import StreamResampler, board_chunk
+except ImportError as e:
+    print(f"Błąd: Nie można zaimportować biblioteki ({e}).")
     sys.exit(1)
 
+FPS = 20
+
 def clear_screen():
     print("\033[2J\033[H", end="")
 
@@ -36,6 +39,8 @@ def draw_bar(val, width=20, char='='):
     return "[" + "".join(bar) + "]"
 
 def main():
+    from wiinux import setup_logging
+    setup_logging()
     if not os.access('/dev/input/event0', os.R_OK):
         print("Brak uprawnień! Uruchom: sudo ./venv/bin/python example_game.py")
         return
@@ -51,14 +56,25 @@ def main():
     print(">>> (Graj balansem ciała lewo/prawo i przód/tył)")
     time.sleep(2)
 
+    # Waga raportuje nieregularnie (~100 Hz), gra działa w 20 FPS:
+    # decymacja z filtrem antyaliasingowym zamiast brania ostatniej wartości
+    resampler = StreamResampler(rate=FPS, channels=4, method='polyphase')
+    rv = list(board.raw_values)
+
     try:
         while True:
             # 1. Update stanu wagi (Non-blocking)
-            board.update()
+            ts, values = board_chunk(board.read_samples())
+            out_ts, out = resampler.feed(ts, values)
+            if not len(out):
+                # Brak zdarzeń = wartości bez zmian (evdev wysyła tylko zmiany)
+                out_ts, out = resampler.hold_until(time.time() - 0.1)
+            if len(out):
+                rv = [int(v) for v in out[-1]]
+            weight = sum(board.sensor_weights(rv))
             
             # 2. Logika gry (proste wyliczenie środka ciężkości)
             # Sensors: 0:TR, 1:BR, 2:TL, 3:BL
-            rv = board.raw_values
             
             total = sum(rv) + 1 # avoid div by zero
             
@@ -78,7 +94,7 @@ def main():
             # 3. Rysowanie (ASCII GUI)
             clear_screen()
             print("=== WII BALANCE BOARD GAME DEMO ===")
-            print(f"Total Weight: {board.weight:.2f} kg")
+            print(f"Total Weight: {weight:.2f} kg")
             print("")
             print(f"Balans L/P: {draw_bar(cog_x * 5)} ({cog_x:.2f})") # x5 sensitivity
             print(f"Balans T/P: {draw_bar(cog_y * 5)} ({cog_y:.2f})")
@@ -88,7 +104,7 @@ def main():
             print("")
             print("Ctrl+C aby wyjść")
             
-            time.sleep(0.05) # 20 FPS
+            time.sleep(1.0 / FPS)
 
     except KeyboardInterrupt:
         print("\nGame Over.")
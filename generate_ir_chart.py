@@ -2,6 +2,8 @@
 import csv
 import sys
 import os
+import html
+import struct
 
 def generate_html(csv_file):
     if not os.path.exists(csv_file):
@@ -78,11 +80,11 @@ def generate_html(csv_file):
             x = r['start'] * scale
             svg_content += f'<line x1="{x}" y1="150" x2="{r["end"] * scale}" y2="150" stroke="#888" stroke-width="2" />\n'
 
-    html = f"""
+    page = f"""
     <!DOCTYPE html>
     <html>
     <head>
-        <title>Wii IR Signal Chart - {csv_file}</title>
+        <title>Wii IR Signal Chart - {html.escape(csv_file)}</title>
         <style>
             body {{ background: #1a1a1b; color: #eee; font-family: sans-serif; padding: 20px; }}
             .container {{ overflow-x: auto; background: #2b2d2e; padding: 20px; border-radius: 8px; }}
@@ -93,7 +95,7 @@ def generate_html(csv_file):
     <body>
         <h1>Wii-Eye Signal Analysis</h1>
         <div class="info">
-            File: <b>{csv_file}</b><br>
+            File: <b>{html.escape(csv_file)}</b><br>
             Total Duration: <b>{duration:.2f} s</b>
         </div>
         <div class="container">
@@ -114,17 +116,283 @@ def generate_html(csv_file):
     
     output_file = csv_file.replace(".csv", ".html")
     with open(output_file, 'w') as f:
-        f.write(html)
+        f.write(page)
     print(f"Chart generated: {output_file}")
 
+# --- Level-of-detail renderer for long captures ---
+# One pass over the capture, constant memory: pixel columns are merged into
+# runs (a column is HOT if any point was visible in it), runs are cut at tile
+# edges and every finished <svg> tile is written to the file immediately.
+
+TILE_WIDTH = 4000   # px per <svg> tile
+MAX_WIDTH = 200000  # px, total width cap when the scale is chosen automatically
+LANE = 22           # px per point track
+SF_HEIGHT = 50
+DECODE_HEIGHT = 34
+BINARY_TRACKS = [('ANY', '#ff4444'), ('P0', '#ff8a65'), ('P1', '#ffd54f'), ('P2', '#81c784'), ('P3', '#64b5f6')]
+SF_TOP = len(BINARY_TRACKS) * LANE + 10
+DECODE_TOP = SF_TOP + SF_HEIGHT + 10
+CHART_HEIGHT = DECODE_TOP + DECODE_HEIGHT + 20
+MAX_LISTED = 200    # Decoded bytes listed below the chart
+TIME_STEPS = [0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600]
+
+def capture_span(path):
+    """
+    (first ts, last ts) of a capture without reading it all: CSV from the first
+    data row and the last line, .wcap from its block index, .wfc from its
+    first and last block. None if unknown.
+    """
+    try:
+        if path.endswith('.wcap'):
+            from wii_capture import CaptureReader
+            with CaptureReader(path) as reader:
+                return (reader.start, reader.end) if reader.blocks else None
+        if path.endswith('.wfc'):
+            from wii_codec import stream_span
+            with open(path, 'rb') as f: return stream_span(f)
+    except (ValueError, struct.error): return None
+    with open(path, 'rb') as f:
+        f.readline()
+        first = f.readline()
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 4096))
+        tail = f.read().splitlines()
+    try: return float(first.split(b',')[0]), float(tail[-1].split(b',')[0])
+    except (ValueError, IndexError): return None
+
+class _Tiles:
+    """Routes elements (absolute pixel x) to fixed-width tiles and streams finished tiles."""
+    def __init__(self, out, width, pps):
+        self.out = out
+        self.width = width
+        self.pps = pps
+        self.pending = {} # tile index -> [svg fragments]
+        self.polyline = {} # tile index -> ["x,y", ...]
+        self.last_point = None
+        self.next_tile = 0
+        step = next((s for s in TIME_STEPS if s * pps >= 120), TIME_STEPS[-1])
+        self.time_step = step
+
+    def rect(self, x0, x1, y, h, color):
+        w = self.width
+        while x0 < x1:
+            i = x0 // w
+            end = min(x1, (i + 1) * w)
+            self.pending.setdefault(i, []).append(
+                f'<rect x="{x0 - i * w}" y="{y}" width="{end - x0}" height="{h}" fill="{color}"/>')
+            x0 = end
+
+    def point(self, x, y):
+        w = self.width
+        i = x // w
+        if self.last_point and self.last_point[0] // w != i:
+            # Continue the line across the tile edge (clipped by the SVG)
+            lx, ly = self.last_point
+            self.polyline.setdefault(i, []).append(f"{lx - i * w},{ly:.1f}")
+            self.polyline.setdefault(lx // w, []).append(f"{x - (lx // w) * w},{y:.1f}")
+        self.polyline.setdefault(i, []).append(f"{x - i * w},{y:.1f}")
+        self.last_point = (x, y)
+
+    def marker(self, x, label):
+        i = x // self.width
+        x -= i * self.width
+        frags = self.pending.setdefault(i, [])
+        frags.append(f'<line x1="{x}" y1="{DECODE_TOP}" x2="{x}" y2="{DECODE_TOP + 12}" stroke="#00e676" stroke-width="2"/>')
+        if label: frags.append(f'<text x="{x + 2}" y="{DECODE_TOP + 26}" fill="#00e676" font-size="12">{label}</text>')
+
+    def flush(self, upto):
+        """Writes every tile that ends at or before pixel column `upto`."""
+        while (self.next_tile + 1) * self.width <= upto:
+            self._write(self.next_tile, self.width)
+            self.next_tile += 1
+
+    def finish(self, end):
+        self.flush(end)
+        last = max([end] + [(i + 1) * self.width for i in list(self.pending) + list(self.polyline)])
+        while self.next_tile * self.width < last:
+            self._write(self.next_tile, min(self.width, last - self.next_tile * self.width))
+            self.next_tile += 1
+
+    def _write(self, i, width):
+        w, out = self.width, self.out
+        out.write(f'<svg class="tile" width="{width}" height="{CHART_HEIGHT}">')
+        for lane in range(len(BINARY_TRACKS)):
+            y = lane * LANE + LANE - 4
+            out.write(f'<line x1="0" y1="{y}" x2="{width}" y2="{y}" stroke="#555"/>')
+        out.write(f'<rect x="0" y="{SF_TOP}" width="{width}" height="{SF_HEIGHT}" fill="#242526"/>')
+        step_px = self.time_step * self.pps
+        k = int(i * w / step_px) + (1 if i * w % step_px else 0)
+        while k * step_px < i * w + width:
+            x = k * step_px - i * w
+            out.write(f'<line x1="{x:.1f}" y1="0" x2="{x:.1f}" y2="{CHART_HEIGHT - 14}" stroke="#333"/>'
+                      f'<text x="{x + 2:.1f}" y="{CHART_HEIGHT - 3}" fill="#888" font-size="11">{k * self.time_step:g}s</text>')
+            k += 1
+        for frag in self.pending.pop(i, ()): out.write(frag)
+        points = self.polyline.pop(i, None)
+        if points: out.write(f'<polyline points="{" ".join(points)}" fill="none" stroke="#4fc3f7" stroke-width="1.5"/>')
+        out.write('</svg>\n')
+
+class _BinaryTrack:
+    """HOT/COLD lane: pixel columns merged into runs, runs cut at tile edges."""
+    def __init__(self, tiles, lane, color):
+        self.tiles = tiles
+        self.y = lane * LANE + 2
+        self.color = color
+        self.col = 0          # Current (open) pixel column
+        self.col_hot = False  # Any HOT seen in the current column
+        self.state = False    # State since the last event
+        self.run_start = 0    # Columns before run_start are already emitted
+        self.run_hot = False
+
+    def _extend(self, a, hot):
+        """Columns from `a` on have value `hot` (closes the run if it differs)."""
+        if hot != self.run_hot:
+            self._emit(a)
+            self.run_start, self.run_hot = a, hot
+
+    def _emit(self, end):
+        if self.run_hot and end > self.run_start:
+            self.tiles.rect(self.run_start, end, self.y, LANE - 6, self.color)
+
+    def advance(self, x):
+        if x <= self.col: return
+        self._extend(self.col, self.col_hot)
+        if x > self.col + 1: self._extend(self.col + 1, self.state)
+        self.col, self.col_hot = x, self.state
+        edge = (x // self.tiles.width) * self.tiles.width
+        if self.run_start < edge:
+            self._emit(edge) # Finished tiles must not wait for a long run
+            self.run_start = edge
+
+    def set(self, hot):
+        self.state = hot
+        self.col_hot = self.col_hot or hot
+
+    def finish(self):
+        self._extend(self.col, self.col_hot)
+        self._emit(self.col + 1)
+        self.run_start = self.col + 1
+
+def generate_lod_html(csv_file, output_file=None, px_per_second=None, tile_width=TILE_WIDTH,
+                      max_width=MAX_WIDTH, bit_duration=0.1):
+    """
+    Multi-track chart (any point, P0-P3, stability factor, decoded bytes) for
+    captures of any length. px_per_second=None: up to 1000 px/s, scaled down
+    so the whole chart stays within max_width.
+    """
+    from wii_transport import iter_capture
+    from wii_analytics import IRTracker
+
+    if not os.path.exists(csv_file):
+        print(f"Error: {csv_file} not found.")
+        return None
+    span = capture_span(csv_file)
+    if px_per_second is None:
+        duration = (span[1] - span[0]) if span else 0.0
+        px_per_second = 1000.0 if duration <= 0 else min(1000.0, max_width / duration)
+    kind, frames = iter_capture(csv_file)
+    if kind != 'ir':
+        print(f"Error: {csv_file} is not an IR capture.")
+        return None
+    output_file = output_file or os.path.splitext(csv_file)[0] + ".html"
+
+    decoded = [] # The first MAX_LISTED, tracker.decoded_count counts all
+    tracker = IRTracker(bit_duration=bit_duration, max_decoded=0)
+    title = html.escape(csv_file)
+    with open(output_file, 'w') as out:
+        out.write(f"""<!DOCTYPE html>
+<html><head><title>Wii IR Signal Chart - {title}</title>
+<style>
+body {{ background: #1a1a1b; color: #eee; font-family: sans-serif; padding: 20px; }}
+h1 {{ color: #00e676; }}
+.container {{ display: flex; overflow-x: auto; background: #2b2d2e; padding: 20px 0; border-radius: 8px; }}
+.labels {{ position: sticky; left: 0; z-index: 1; background: #2b2d2e; padding: 0 8px; flex: none; font-size: 12px; }}
+.labels div {{ height: {LANE}px; line-height: {LANE}px; }}
+.tile {{ flex: none; content-visibility: auto; }}
+</style></head><body>
+<h1>Wii-Eye Signal Analysis</h1>
+<div class="info">File: <b>{title}</b> | Scale: <b>{px_per_second:g} px/s</b> | Tiles: {tile_width} px</div>
+<div class="container"><div class="labels">""")
+        out.write("".join(f"<div>{label}</div>" for label, color in BINARY_TRACKS))
+        out.write(f'<div style="margin-top:10px;height:{SF_HEIGHT}px">SF</div>'
+                  f'<div style="margin-top:10px">Decoded</div></div>\n')
+
+        tiles = _Tiles(out, tile_width, px_per_second)
+        tracks = [_BinaryTrack(tiles, lane, color) for lane, (label, color) in enumerate(BINARY_TRACKS)]
+        state = {'t0': None, 'x': 0, 'last_label': -10 ** 9, 'sf_x': -1, 'sf_y': None, 'count': 0, 't': None}
+
+        def on_decoded(val):
+            if len(decoded) < MAX_LISTED: decoded.append((tracker.ts - state['t0'], val))
+            x = state['x']
+            show = x - state['last_label'] >= 40 # Labels closer than 40 px only get a tick
+            if show: state['last_label'] = x
+            tiles.marker(x, f"0x{val:02X}" if show else None)
+        tracker.on_id_detected = on_decoded
+
+        def chart_frames():
+            # Point lanes and the decode marker position come from the frame itself
+            for t, frame in frames:
+                if state['t0'] is None: state['t0'] = t
+                x = int((t - state['t0']) * px_per_second)
+                state['x'] = x
+                for track in tracks: track.advance(x)
+                tracks[0].set(any(p is not None for p in frame))
+                for i in range(4): tracks[i + 1].set(frame[i] is not None)
+                yield t, frame
+
+        def on_frame(t, frame):
+            state['t'] = t
+            x = state['x']
+            y = SF_TOP + SF_HEIGHT * (1.0 - tracker.stability_factor)
+            if x != state['sf_x']:
+                if state['sf_y'] is not None and x > state['sf_x'] + 1:
+                    tiles.point(x - 1, state['sf_y']) # Hold the level across skipped columns
+                tiles.point(x, y)
+                state['sf_x'] = x
+            state['sf_y'] = y
+            state['count'] += 1
+            tiles.flush(min(track.run_start for track in tracks))
+
+        tracker.replay(chart_frames(), on_frame)
+        for track in tracks: track.finish()
+        end = max(track.col + 1 for track in tracks)
+        tiles.finish(end)
+
+        count = state['count']
+        duration = (state['t'] - state['t0']) if count else 0.0
+        shown = ", ".join(f"{ts:.2f}s: 0x{v:02X}" for ts, v in decoded)
+        out.write(f"""</div>
+<p>Duration: <b>{duration:.2f} s</b> | Frames: {count} | Width: {end} px in {tiles.next_tile} tiles</p>
+<p>Decoded ({tracker.decoded_count}): {shown}{' ...' if tracker.decoded_count > len(decoded) else ''}</p>
+<p>Lanes: red/colour blocks = point visible (HOT). Blue line = stability factor (top = 1.0). Green ticks = decoded bytes.</p>
+</body></html>
+""")
+    print(f"Chart generated: {output_file}")
+    return output_file
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
+    import argparse
+    parser = argparse.ArgumentParser(description="HTML/SVG chart of a Wii-Eye capture")
+    parser.add_argument("csv_file", nargs="?", help="Capture (default: latest wiieye_raw_*.csv)")
+    parser.add_argument("-o", "--output", help="Output HTML file")
+    parser.add_argument("--classic", action="store_true", help="Single-track chart at 1000 px/s (short captures)")
+    parser.add_argument("--px-per-second", type=float, help="Time scale (default: automatic, max 1000)")
+    parser.add_argument("--tile-width", type=int, default=TILE_WIDTH)
+    parser.add_argument("--max-width", type=int, default=MAX_WIDTH)
+    parser.add_argument("--bit-duration", type=float, default=0.1)
+    args = parser.parse_args()
+
+    csv_file = args.csv_file
+    if csv_file is None:
         # Find latest raw csv
         files = [f for f in os.listdir('.') if f.startswith("wiieye_raw_") and f.endswith(".csv")]
         if not files:
             print("No raw csv files found.")
-        else:
-            files.sort()
-            generate_html(files[-1])
+            sys.exit(1)
+        files.sort()
+        csv_file = files[-1]
+    if args.classic:
+        generate_html(csv_file)
     else:
-        generate_html(sys.argv[1])
+        generate_lod_html(csv_file, args.output, args.px_per_second, args.tile_width,
+                          args.max_width, args.bit_duration)
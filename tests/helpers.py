@@ -0,0 +1,11 @@
+from wii_transport import SimulatorTransport
+
+def sim_frames(count, kind='ir', **kwargs):
+    """(ts, values) pairs from a seeded SimulatorTransport on a virtual clock."""
+    sim = SimulatorTransport(kind, realtime=False, start_time=1000.0, seed=3, **kwargs)
+    sim.open()
+    out = []
+    while len(out) < count:
+        batch = sim.read()
+        out.extend(zip(batch.ts, batch.values))
+    return out[:count]
@@ -0,0 +1,84 @@
+import pytest
+
+pytest.importorskip("evdev")
+
+from evdev import ecodes
+from wii_acquire import AcquiredDevice, EventRing, RingCursor
+
+def new_ring(capacity=16):
+    return EventRing(bytearray(EventRing.size_for(capacity)), capacity)
+
+def events(start, count):
+    # value carries the sequence number so gaps and stale records show up
+    return [(1000 + i // 100, i % 100 * 10000, ecodes.EV_ABS, 0, i) for i in range(start, start + count)]
+
+def values(records):
+    return [r[4] for r in records]
+
+def test_cursors_are_independent():
+    ring = new_ring()
+    late = RingCursor(ring)
+    ring.publish(events(0, 5))
+    early = RingCursor(ring, from_start=True)
+    assert values(early.read()[0]) == [0, 1, 2, 3, 4]
+    ring.publish(events(5, 3))
+    assert values(early.read()[0]) == [5, 6, 7]
+    assert values(late.read()[0]) == list(range(8))
+    assert early.read() == ([], 0)
+
+def test_max_events():
+    ring = new_ring()
+    cursor = RingCursor(ring)
+    ring.publish(events(0, 10))
+    assert values(cursor.read(max_events=4)[0]) == [0, 1, 2, 3]
+    assert values(cursor.read()[0]) == list(range(4, 10))
+
+def test_overrun_skips_to_valid_records():
+    ring = new_ring(16)
+    cursor = RingCursor(ring)
+    for start in range(0, 50, 10): ring.publish(events(start, 10))
+    records, lost = cursor.read()
+    got = values(records)
+    assert got == list(range(got[0], 50)) # Contiguous, ends with the newest
+    assert lost == got[0] and lost + len(got) == 50
+    assert len(got) <= 16 and cursor.lost == lost
+
+class TornRing(EventRing):
+    """Runs `producer` the second time reserved_seq is read: after the cursor copied its records."""
+    def __init__(self, capacity, producer):
+        super().__init__(bytearray(EventRing.size_for(capacity)), capacity)
+        self.producer = producer
+        self.reads = 0
+
+    @property
+    def reserved_seq(self):
+        self.reads += 1
+        if self.reads == 2: self.producer(self)
+        return EventRing.reserved_seq.fget(self)
+
+def test_records_overwritten_during_copy_are_dropped():
+    ring = TornRing(16, lambda ring: ring.publish(events(16, 4)))
+    cursor = RingCursor(ring)
+    ring.publish(events(0, 16)) # Full ring, cursor still in time
+    ring.reads = 0
+    records, lost = cursor.read()
+    assert values(records) == list(range(4, 16)) # 0-3 were overwritten while copying
+    assert lost == 4
+    assert values(cursor.read()[0]) == [16, 17, 18, 19]
+
+def test_batch_reserved_but_not_published_counts_as_torn():
+    ring = new_ring(16)
+    cursor = RingCursor(ring)
+    ring.publish(events(0, 16))
+    # Producer announced 4 more records and is writing them: slots 0-3 are unreliable
+    ring.buf[8:16] = (20).to_bytes(8, 'little')
+    records, lost = cursor.read()
+    got = values(records)
+    assert got[0] >= 4 and got == list(range(got[0], 16)) # Plus slack for the running producer
+    assert lost == got[0]
+
+def test_overrun_is_delivered_as_syn_dropped():
+    evs = list(AcquiredDevice._events([(1000, 5, ecodes.EV_ABS, 0, 7)], lost=3))
+    assert (evs[0].type, evs[0].code) == (ecodes.EV_SYN, ecodes.SYN_DROPPED)
+    assert (evs[1].sec, evs[1].usec, evs[1].value) == (1000, 5, 7)
+    assert len(list(AcquiredDevice._events([], lost=0))) == 0
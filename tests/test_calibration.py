@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from wii_calibration import CalibrationStore, MAX_TARE_HISTORY, parse_sysfs_calibration, valid_calibration
+
+KEY = "00:22:4C:AA:BB:CC"
+BLOCKS = [[1000, 1100, 1200, 1300], [2700, 2800, 2900, 3000], [4400, 4500, 4600, 4700]]
+
+def reopen(store):
+    return CalibrationStore(store.path).load()
+
+@pytest.fixture
+def store(tmp_path):
+    return CalibrationStore(str(tmp_path / "calib.json"))
+
+def test_roundtrip_is_keyed_case_insensitively(store):
+    assert store.put(KEY, BLOCKS, source="sysfs")
+    assert reopen(store).get(KEY.lower()) == BLOCKS
+    assert reopen(store).get("00:22:4c:00:00:00") is None
+
+@pytest.mark.parametrize("blocks", [
+    BLOCKS[:2],                                                 # Missing the 34 kg block
+    [BLOCKS[0], BLOCKS[0], BLOCKS[2]],                          # Not increasing
+    [BLOCKS[0], BLOCKS[1], [4400, 4500, 4600, 0x10000]],        # Not 16-bit
+    [BLOCKS[0], BLOCKS[1], [4400, 4500, 4600, None]],
+])
+def test_invalid_calibration_is_rejected(store, blocks):
+    assert not valid_calibration(blocks)
+    assert not store.put(KEY, blocks)
+    assert reopen(store).get(KEY) is None
+
+def edit_entry(store, **fields):
+    with open(store.path) as f: data = json.load(f)
+    data["boards"][KEY.lower()].update(fields)
+    with open(store.path, 'w') as f: json.dump(data, f)
+
+def test_crc_mismatch_drops_entry(store, caplog):
+    store.put(KEY, BLOCKS)
+    store.add_tare(KEY, 1.5, [0.5, 0.5, 0.25, 0.25])
+    tampered = [list(b) for b in BLOCKS]
+    tampered[1][0] += 1 # Still a valid shape, wrong checksum
+    edit_entry(store, calib=tampered)
+    cached = reopen(store)
+    assert cached.get(KEY) is None
+    assert "invalid" in caplog.text
+    assert cached.get(KEY) is None # Dropped, not re-validated every time
+    assert cached.last_tare(KEY) == (1.5, [0.5, 0.5, 0.25, 0.25]) # Tare history kept
+
+@pytest.mark.parametrize("calib", ["garbage", [[1, 2, "x", 4]] * 3, None])
+def test_malformed_entry_is_rejected(store, calib):
+    store.put(KEY, BLOCKS)
+    edit_entry(store, calib=calib)
+    assert reopen(store).get(KEY) is None
+
+def test_unreadable_file_is_ignored(store):
+    with open(store.path, 'w') as f: f.write("{not json")
+    assert store.load().boards == {}
+    assert store.put(KEY, BLOCKS) and reopen(store).get(KEY) == BLOCKS
+
+def test_tare_history_is_bounded(store):
+    for i in range(MAX_TARE_HISTORY + 5): store.add_tare(KEY, float(i))
+    history = reopen(store).tare_history(KEY)
+    assert len(history) == MAX_TARE_HISTORY
+    assert history[-1][1] == MAX_TARE_HISTORY + 4
+    assert reopen(store).last_tare(KEY) == (MAX_TARE_HISTORY + 4, None)
+
+def test_sysfs_format():
+    text = ":".join(f"{v:04x}" for block in BLOCKS for v in block) + "\n"
+    assert parse_sysfs_calibration(text) == BLOCKS
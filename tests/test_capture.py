@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from wii_capture import CaptureWriter, CaptureReader, Catalog, TRAILER, convert_csv
+from helpers import sim_frames
+
+def write_capture(path, samples, kind='ir', device="00:1F:32:AA:BB:CC", block_records=100):
+    with CaptureWriter(str(path), kind, device, block_records) as writer:
+        for t, values in samples: writer.append(t, values)
+    return str(path)
+
+def test_block_index(tmp_path):
+    samples = sim_frames(1050)
+    path = write_capture(tmp_path / "ir.wcap", samples)
+    with CaptureReader(path) as reader:
+        assert not reader.recovered
+        assert (reader.kind, reader.device) == ('ir', "00:1F:32:AA:BB:CC")
+        assert [b.count for b in reader.blocks] == [100] * 10 + [50]
+        assert reader.count == len(samples)
+        assert (reader.start, reader.end) == (samples[0][0], samples[-1][0])
+        for i, block in enumerate(reader.blocks):
+            assert (block.t_first, block.t_last) == (samples[i * 100][0], samples[min(i * 100 + 99, 1049)][0])
+        assert list(reader.read()) == samples
+
+def test_read_range_reads_only_overlapping_blocks(tmp_path):
+    samples = sim_frames(1000)
+    path = write_capture(tmp_path / "ir.wcap", samples)
+    t0, t1 = samples[250][0], samples[349][0]
+    with CaptureReader(path) as reader:
+        assert list(reader.read(t0, t1)) == samples[250:350]
+        assert reader.blocks_read == 2
+        assert list(reader.read(t1=samples[9][0])) == samples[:10]
+        assert list(reader.read(t0=samples[-1][0] + 1)) == []
+
+def test_board_samples(tmp_path):
+    samples = sim_frames(300, kind='board')
+    path = write_capture(tmp_path / "board.wcap", samples, kind='board')
+    with CaptureReader(path) as reader:
+        for (t, values), (t_ref, ref) in zip(reader.read(), samples):
+            assert t == t_ref
+            assert values == pytest.approx(ref, rel=1e-6) # Stored as float32
+
+def test_recovers_index_without_footer(tmp_path):
+    samples = sim_frames(1000)
+    path = write_capture(tmp_path / "ir.wcap", samples)
+    with open(path, 'rb') as f:
+        f.seek(-TRAILER.size, os.SEEK_END)
+        index_offset = TRAILER.unpack(f.read())[0]
+    with open(path, 'r+b') as f: f.truncate(index_offset + 3) # Writer killed while writing the footer
+    with CaptureReader(path) as reader:
+        assert reader.recovered
+        assert len(reader.blocks) == 10
+        assert list(reader.read(samples[420][0], samples[480][0])) == samples[420:481]
+
+def test_catalog_keeps_devices_apart(tmp_path):
+    first, second = sim_frames(400)[:200], sim_frames(400)[200:]
+    write_capture(tmp_path / "a.wcap", first, device="00:1F:32:00:00:01")
+    write_capture(tmp_path / "b.wcap", second, device="00:1F:32:00:00:02")
+    catalog = Catalog(str(tmp_path / "catalog.db"))
+    try:
+        assert catalog.scan(str(tmp_path)) == (2, 0)
+        assert list(catalog.read("00:1F:32:00:00:01")) == first
+        assert list(catalog.read("00:1F:32:00:00:02", second[10][0], second[19][0])) == second[10:20]
+    finally:
+        catalog.close()
+
+def test_convert_csv_requires_device(tmp_path):
+    csv_path = tmp_path / "wiieye_record_1.csv"
+    csv_path.write_text("")
+    with pytest.raises(ValueError):
+        convert_csv(str(csv_path))
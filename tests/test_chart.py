@@ -0,0 +1,30 @@
+import html
+
+from generate_ir_chart import generate_html, generate_lod_html
+
+def write_raw_capture(path, blinks=20):
+    # wiieye_raw_* format: one evdev event per row, P0 blinking at 5 Hz
+    rows = ["ts,code,val"]
+    t = 1000.0
+    for i in range(blinks):
+        rows += [f"{t:.3f},16,500", f"{t:.3f},17,300"]
+        t += 0.1
+        rows += [f"{t:.3f},16,1023", f"{t:.3f},17,1023"]
+        t += 0.1
+    path.write_text("\n".join(rows) + "\n")
+    return str(path)
+
+def test_classic_chart(tmp_path):
+    capture = write_raw_capture(tmp_path / "wiieye_raw_1&2.csv")
+    generate_html(capture)
+    page = (tmp_path / "wiieye_raw_1&2.html").read_text()
+    assert html.escape(capture) in page
+    assert page.count('fill="#ff4444"') == 20
+
+def test_lod_chart(tmp_path):
+    capture = write_raw_capture(tmp_path / "wiieye_raw_<1>.csv")
+    output = generate_lod_html(capture, str(tmp_path / "chart.html"))
+    page = open(output).read()
+    assert html.escape(capture) in page and capture not in page
+    assert "Duration: <b>3.90 s</b>" in page
+    assert page.rstrip().endswith("</html>")
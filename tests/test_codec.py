@@ -0,0 +1,58 @@
+import io
+
+import pytest
+
+from wii_codec import FrameEncoder, encode_frames, decode_bytes, decode_stream, stream_span
+from helpers import sim_frames
+
+def beacon_frames(count=3000):
+    # Blinking point: frame-to-frame deltas, runs of identical dark frames and key frames
+    return sim_frames(count, pattern=[0x5A, 0xC3], bit_duration=0.05)
+
+def assert_same(decoded, frames):
+    assert len(decoded) == len(frames)
+    for (ts, frame), (t, expected) in zip(decoded, frames):
+        assert ts == pytest.approx(t, abs=1e-3)
+        assert frame == expected
+
+@pytest.mark.parametrize("compression", [None, 'zlib', 'lzma'])
+def test_roundtrip(compression):
+    frames = beacon_frames()
+    data = encode_frames(frames, compression=compression, block_frames=256)
+    assert_same(decode_bytes(data), frames)
+
+def test_runs_compress_static_frames():
+    frames = [(1000.0 + i * 0.01, [[100, 200], None, None, None]) for i in range(5000)]
+    data = encode_frames(frames)
+    assert len(data) < 100
+    assert_same(decode_bytes(data), frames)
+
+def test_truncated_stream_keeps_complete_blocks():
+    frames = beacon_frames()
+    data = encode_frames(frames, block_frames=256)
+    decoded = decode_bytes(data[:len(data) * 2 // 3])
+    assert 0 < len(decoded) < len(frames)
+    assert_same(decoded, frames[:len(decoded)])
+
+def test_not_a_stream():
+    with pytest.raises(ValueError):
+        decode_bytes(b"WCAP" + bytes(20))
+
+def test_stream_span(tmp_path):
+    frames = beacon_frames()
+    path = tmp_path / "frames.wfc"
+    path.write_bytes(encode_frames(frames, compression='zlib', block_frames=256))
+    with open(path, 'rb') as f: first, last = stream_span(f)
+    assert first == pytest.approx(frames[0][0], abs=1e-3)
+    assert last == pytest.approx(frames[-1][0], abs=1e-3)
+
+def test_flush_interval_writes_blocks_while_encoding():
+    out = io.BytesIO()
+    encoder = FrameEncoder(out, flush_interval=1.0)
+    frames = beacon_frames(500) # 5 s
+    for ts, frame in frames: encoder.encode(ts, frame)
+    written = out.tell()
+    assert len(list(decode_stream(io.BytesIO(out.getvalue())))) >= 400
+    encoder.close()
+    assert out.tell() > written
+    assert_same(decode_bytes(out.getvalue()), frames)
@@ -0,0 +1,56 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from wii_filter import SensorFilter, make_filter
+from helpers import sim_frames
+
+RATE = 100.0
+
+def run(f, signal, start=1000.0):
+    """Filters a per-report list of 4-sensor values, returns an (n, 4) array."""
+    return np.array([f.update(start + i / RATE, values).copy() for i, values in enumerate(signal)])
+
+@pytest.mark.parametrize("burst", [1, 2])
+def test_median_rejects_spikes(burst):
+    signal = [[10.0, 20.0, 30.0, 40.0]] * 50
+    for i in range(20, 20 + burst): signal[i] = [500.0, -500.0, 30.0, 0.0]
+    out = run(SensorFilter(median=5, smoother=None), signal)
+    assert out == pytest.approx(np.array(signal[:1] * 50))
+
+def test_median_delays_a_step_by_half_its_window():
+    signal = [[0.0] * 4] * 20 + [[1.0] * 4] * 20
+    out = run(SensorFilter(median=5, smoother=None), signal)
+    assert np.argmax(out[:, 0] > 0.5) == 20 + 2
+
+@pytest.mark.parametrize("smoother", ['one_pole', 'kalman'])
+def test_ramp_lags_by_the_latency_budget(smoother):
+    f = SensorFilter(median=5, smoother=smoother, latency=0.1)
+    assert f.delay == pytest.approx(0.1)
+    ramp = [[i / RATE] * 4 for i in range(300)] # 1 unit/s
+    out = run(f, ramp)
+    # Steady state: output(t) == input(t - delay), within half a report (discrete smoother)
+    assert out[-1, 0] == pytest.approx(ramp[-1][0] - f.delay, abs=0.6 / RATE)
+
+@pytest.mark.parametrize("smoother", ['one_pole', 'kalman'])
+def test_smoothing_reduces_noise(smoother):
+    raw = np.array([v for t, v in sim_frames(2000, kind='board', sway=0.0, noise=0.5)])
+    out = run(SensorFilter(smoother=smoother, latency=0.1), raw)
+    assert out[200:].mean(axis=0) == pytest.approx(raw[200:].mean(axis=0), abs=0.1)
+    assert (out[200:].std(axis=0) < raw[200:].std(axis=0) / 3).all()
+
+def test_kalman_settles_faster_than_one_pole():
+    start = [[0.0] * 4] * 1 + [[10.0] * 4] * 30 # Starts at 0, then the real load
+    one_pole = run(SensorFilter(median=1, smoother='one_pole', latency=0.1), start)
+    kalman = run(SensorFilter(median=1, smoother='kalman', latency=0.1), start)
+    assert kalman[5, 0] > one_pole[5, 0]
+
+def test_apply_in_place():
+    f = make_filter({'median': 3, 'smoother': None})
+    mass = [1.0, 2.0, 3.0, 4.0]
+    assert f.apply(1000.0, mass) is mass and mass == [1.0, 2.0, 3.0, 4.0]
+    assert make_filter(f) is f and make_filter(None) is None
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError): SensorFilter(smoother='butterworth')
+    with pytest.raises(ValueError): SensorFilter(median=0)
@@ -0,0 +1,77 @@
+import struct
+
+import pytest
+
+import wii_protocol as proto
+from wii_protocol import BoardSample, IRFrame, complete, parse_board_sensors, parse_board_sensors_into
+
+def board_report(raw, buttons=0x0008):
+    return bytes([0xA1, proto.REPORT_EXT8]) + struct.pack('>H4H', buttons, *raw)
+
+def ir_object(x, y, size):
+    return [x & 0xFF, y & 0xFF, (y >> 8) << 6 | (x >> 8) << 4 | size]
+
+def ir_extended_report(objects, accel=(0x80, 0x81, 0x9a)):
+    body = []
+    for obj in objects: body += ir_object(*obj) if obj else [0xFF] * 3
+    return bytes([0xA1, proto.REPORT_IR_EXTENDED, 0x00, 0x04, *accel, *body])
+
+def ir_full_report(report_id, objects):
+    body = []
+    for obj in objects:
+        if obj is None:
+            body += [0xFF] * 9
+        else:
+            x, y, size, bbox, intensity = obj
+            body += ir_object(x, y, size) + list(bbox) + [0, intensity]
+    return bytes([0xA1, report_id, 0x10, 0x00, 0x80]) + bytes(body)
+
+def test_board_sensors():
+    report = board_report([1000, 2000, 3000, 65535])
+    sample = parse_board_sensors(report, BoardSample())
+    assert sample.raw == [1000, 2000, 3000, 65535]
+    assert sample.buttons == proto.BUTTON_A
+    # In place, from any buffer type
+    out = [0] * 6
+    parse_board_sensors_into(memoryview(bytearray(report)), out, 2)
+    assert out == [0, 0, 1000, 2000, 3000, 65535]
+
+@pytest.mark.parametrize("report_id, size", [(proto.REPORT_EXT8, 12), (proto.REPORT_STATUS, 8),
+                                             (proto.REPORT_IR_EXTENDED, 19), (proto.REPORT_IR_FULL_A, 23),
+                                             (proto.REPORT_IR_FULL_B, 23)])
+def test_complete_rejects_short_reports(report_id, size):
+    report = bytes([0xA1, report_id]) + bytes(size - 2)
+    assert complete(report)
+    assert not complete(report[:-1])
+
+def test_complete_header():
+    assert complete(b'\xa1\x99') # Unknown report: header only
+    assert not complete(b'\xa1')
+    assert not complete(b'')
+
+def test_ir_extended():
+    frame = IRFrame()
+    proto.parse_ir_extended(ir_extended_report([(1022, 767, 3), None, (0, 0, 15), (300, 513, 0)]), frame)
+    assert frame.points == [[1022, 767], None, [0, 0], [300, 513]]
+    assert frame.size == [3, 0, 15, 0]
+    assert frame.accel == (0x80, 0x81, 0x9a)
+    assert frame.buttons == proto.BUTTON_B and not frame.full
+
+def test_ir_full_interleaved():
+    frame = IRFrame()
+    first = ir_full_report(proto.REPORT_IR_FULL_A, [(512, 384, 7, (10, 11, 20, 21), 200), None])
+    second = ir_full_report(proto.REPORT_IR_FULL_B, [None, (1000, 700, 2, (1, 2, 3, 4), 35)])
+    assert proto.parse_ir_full(first, frame) is False # Objects 0-1 only
+    assert proto.parse_ir_full(second, frame) is True
+    assert frame.points == [[512, 384], None, None, [1000, 700]]
+    assert frame.intensity == [200, 0, 0, 35]
+    assert frame.bbox[0] == (10, 11, 20, 21) and frame.bbox[3] == (1, 2, 3, 4)
+    assert frame.full and frame.buttons == proto.BUTTON_PLUS
+    assert [b[0] for b in frame.blobs(min_intensity=50)] == [0]
+
+def test_ir_frame_copy_is_independent():
+    frame = IRFrame()
+    proto.parse_ir_extended(ir_extended_report([(5, 6, 1), None, None, None]), frame)
+    kept = frame.copy()
+    proto.parse_ir_extended(ir_extended_report([None] * 4), frame)
+    assert kept.points[0] == [5, 6] and frame.points == [None] * 4
@@ -0,0 +1,74 @@
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from wii_resample import Decimator, StreamResampler, board_chunk
+from helpers import sim_frames
+
+def sine(freq, count, rate=100.0):
+    return np.sin(2 * np.pi * freq * np.arange(count) / rate)
+
+def test_decimator_output_rate_and_group_delay():
+    dec = Decimator(4)
+    ramp = np.arange(400, dtype=float)
+    index, y = dec.feed(ramp)
+    assert list(index) == list(range(0, 400 - dec.delay, 4))
+    # Delay removed: a ramp comes out at its own index once past the padded start
+    steady = index >= dec.delay
+    assert y[steady, 0] == pytest.approx(index[steady])
+
+def test_decimator_chunking_does_not_change_output():
+    x = sine(3.0, 1000) + sine(40.0, 1000)
+    ref_index, ref = Decimator(5).feed(x)
+    dec = Decimator(5)
+    parts = [dec.feed(chunk) for chunk in np.array_split(x, [7, 100, 101, 513])]
+    assert list(np.concatenate([p[0] for p in parts])) == list(ref_index)
+    assert np.concatenate([p[1] for p in parts]) == pytest.approx(ref)
+
+def test_decimator_removes_aliases():
+    dec = Decimator(5) # 100 -> 20 Hz, new Nyquist 10 Hz
+    _, passed = dec.feed(sine(2.0, 2000))
+    dec.reset()
+    _, stopped = dec.feed(sine(30.0, 2000))
+    assert np.abs(passed[40:]).max() == pytest.approx(1.0, abs=0.05)
+    assert np.abs(stopped[40:]).max() < 0.02
+
+@pytest.mark.parametrize("method", ['linear', 'polyphase'])
+def test_resampler_output_grid(method):
+    ts, values = board_chunk(sim_frames(1000, kind='board'))
+    ts = ts + 0.0037 # Off the output grid
+    res = StreamResampler(50.0, 4, method=method)
+    out_ts, out = [], []
+    for i in range(0, len(ts), 64):
+        t, v = res.feed(ts[i:i + 64], values[i:i + 64])
+        out_ts.append(t)
+        out.append(v)
+    out_ts, out = np.concatenate(out_ts), np.concatenate(out)
+    assert np.diff(out_ts) == pytest.approx(0.02)
+    assert out_ts / 0.02 == pytest.approx(np.round(out_ts / 0.02), abs=1e-6) # Absolute multiples
+    assert len(out_ts) == pytest.approx(len(ts) / 2, abs=10)
+    assert out.sum(axis=1) == pytest.approx(70.0, abs=1.0)
+
+def test_polyphase_has_no_residual_delay():
+    ts = 1000.0 + np.arange(2000) * 0.01
+    res = StreamResampler(20.0, 1, method='polyphase', oversample=5)
+    out_ts, out = res.feed(ts, np.sin(2 * np.pi * 0.5 * ts))
+    steady = out_ts > ts[0] + 1.0
+    assert out[steady, 0] == pytest.approx(np.sin(2 * np.pi * 0.5 * out_ts[steady]), abs=0.01)
+
+def test_resampler_holds_across_gaps():
+    res = StreamResampler(10.0, 1, hold_gap=0.05)
+    t, v = res.feed([1000.0, 1000.5], [[1.0], [3.0]])
+    assert list(t) == pytest.approx([1000.0 + i * 0.1 for i in range(6)])
+    assert list(v[:, 0]) == [1.0] * 5 + [3.0]
+    t, v = res.hold_until(1000.75)
+    assert list(v[:, 0]) == [3.0, 3.0]
+
+def test_resampler_holds_before_missing_ir_points():
+    res = StreamResampler(100.0, 2)
+    _, v = res.feed([1000.005, 1000.015, 1000.025, 1000.035],
+                    [[5, 5], [6, 6], [math.nan, math.nan], [8, 8]])
+    assert v[:2, 0] == pytest.approx([5.5, 6.0]) # Held towards the gap, not NaN
+    assert math.isnan(v[2, 0]) # Not visible at that instant
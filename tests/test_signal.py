@@ -0,0 +1,36 @@
+import collections
+
+import pytest
+
+from wii_signal import BitClockEstimator, MorseDecoder, estimate_bit_clock
+from wii_analytics import IRTracker
+from helpers import sim_frames
+
+@pytest.mark.parametrize("bit_duration", [0.05, 0.1, 0.2])
+def test_bit_clock_locks_on_synthetic_beacon(bit_duration):
+    clock = estimate_bit_clock(sim_frames(6000, pattern=[0x5A, 0xC3], bit_duration=bit_duration))
+    assert clock.locked
+    assert clock.bit_duration == pytest.approx(bit_duration, rel=0.01)
+
+def test_bit_clock_needs_runs():
+    frames = sim_frames(300, pattern=[0x5A], bit_duration=0.1)[:40] # Two runs
+    assert not estimate_bit_clock(frames).locked
+
+def test_steady_point_never_locks():
+    clock = BitClockEstimator()
+    for t, frame in sim_frames(3000):
+        clock.feed(frame[0] is not None, t)
+    assert not clock.locked
+
+def test_auto_clock_decodes_beacon():
+    frames = sim_frames(6000, pattern=[0x5A], bit_duration=0.05)
+    tracker = IRTracker(bit_duration=0.08, auto_clock=True).replay(frames) # Wrong preset period
+    values = collections.Counter(value for ts, value in tracker.decoded)
+    assert values.most_common(1)[0][0] == 0x5A
+
+def test_retune_keeps_configured_thresholds():
+    decoder = MorseDecoder(trace=False, threshold=0.2, aligned_threshold=0.4)
+    decoder.retune(0.1)
+    assert decoder.threshold == 0.2
+    decoder.retune(0.1, boundary=0.0)
+    assert decoder.threshold == 0.4
@@ -0,0 +1,60 @@
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from wii_spectrum import SwaySpectrum, BoardSpectra
+from wii_sync import SENSOR_SPACING_X
+from wii_transport import SampleBatch
+from helpers import sim_frames
+
+def sway_sensors(seconds, freq, amplitude, mass=70.0, rate=100.0, start=1000.0):
+    """Board samples whose CoP X is amplitude * sin(2 pi freq t) cm, CoP Y 0."""
+    ts, values = [], []
+    for i in range(int(seconds * rate)):
+        t = start + i / rate
+        right = 0.5 + amplitude * math.sin(2 * math.pi * freq * t) / SENSOR_SPACING_X
+        ts.append(t)
+        values.append([mass * right / 2, mass * right / 2, mass * (1 - right) / 2, mass * (1 - right) / 2])
+    return ts, values
+
+@pytest.mark.parametrize("freq, band", [(5.0, 'tremor_rest'), (10.0, 'tremor_physiological'), (1.0, 'sway_fast')])
+def test_band_power_of_a_sine(freq, band):
+    spectrum = SwaySpectrum()
+    assert spectrum.feed_samples(*sway_sensors(40, freq, amplitude=2.0)) > 0
+    features = spectrum.features()
+    # All of the variance (A^2 / 2) in the sine's band, none in the others
+    assert features[f'cop_x_{band}'] == pytest.approx(2.0, rel=0.03)
+    assert features['cop_x_power'] == pytest.approx(2.0, rel=0.03)
+    for other, lo, hi in spectrum.bands:
+        if other != band: assert features[f'cop_x_{other}'] < 0.01
+    assert features['cop_x_peak_hz'] == pytest.approx(freq, abs=spectrum.df)
+    assert features['cop_x_median_hz'] == pytest.approx(freq, abs=spectrum.df)
+    assert features['cop_y_power'] < 1e-6
+
+def test_updates_every_hop():
+    spectrum = SwaySpectrum(segment=256, overlap=0.5)
+    ts, values = sway_sensors(20, 5.0, 1.0) # 1000 samples at 50 Hz
+    updates = sum(spectrum.feed_samples(ts[i:i + 37], values[i:i + 37]) for i in range(0, len(ts), 37))
+    assert spectrum.hop == 128
+    assert updates == spectrum.updates == (999 - 256) // 128 + 1
+    assert not SwaySpectrum().ready
+
+def test_empty_board_segments_are_skipped():
+    spectrum = SwaySpectrum(segment=128)
+    ts, values = sway_sensors(10, 5.0, 1.0, mass=0.0)
+    spectrum.feed_samples(ts, values)
+    assert not spectrum.ready and spectrum.skipped > 0
+    assert spectrum.features() == {}
+
+def test_spectra_per_board():
+    spectra = BoardSpectra()
+    for device in ('board-a', 'board-b'):
+        samples = sim_frames(3000, kind='board')
+        spectra.feed(SampleBatch(device, 'board', [t for t, v in samples], [v for t, v in samples]))
+    spectra.feed(SampleBatch('eye', 'ir', [1000.0], [[None] * 4]))
+    assert sorted(spectra.boards) == ['board-a', 'board-b']
+    # Simulated sway: 0.3 Hz in X, 0.2 Hz in Y
+    features = spectra.boards['board-a'].features()
+    assert features['cop_x_sway_slow'] > 10 * features['cop_x_sway_fast']
@@ -0,0 +1,63 @@
+import urllib.request
+
+import pytest
+
+from wii_stats import Histogram, StatsRegistry, resolve_registry, prometheus_text, serve_prometheus
+
+def test_histogram_buckets_are_upper_bounds():
+    h = Histogram((0.001, 0.01, 0.1))
+    for value in (0.001, 0.002, 0.01, 0.05, 3.0):
+        h.observe(value)
+    assert h.counts == [1, 2, 1, 1] # le semantics, last bucket +Inf
+    assert (h.count, h.max) == (5, 3.0) and h.sum == pytest.approx(3.063)
+    assert h.quantile(0.5) == 0.01
+    assert h.quantile(0.99) == 3.0 # +Inf bucket reports the maximum
+    assert Histogram().quantile(0.5) == 0.0
+
+def test_device_counters_and_latency():
+    registry = StatsRegistry()
+    stats = registry.device("board")
+    assert registry.device("board") is stats
+    stats.frame(1000.0, events=5, now=1000.004)
+    stats.frame(1000.01, events=5, now=1000.012)
+    stats.callback(1000.01, now=1000.02)
+    start = stats.loop_start()
+    stats.loop_end(start, frames=2)
+    snap = registry.snapshot()["board"]
+    assert snap["counters"]["frames"] == 2 and snap["counters"]["events"] == 10
+    assert snap["counters"]["coalesced"] == 1 and snap["counters"]["callbacks"] == 1
+    frame = snap["histograms"]["frame"]
+    assert frame["count"] == 2 and frame["max"] == pytest.approx(0.004)
+    assert frame["p50"] == 0.0025
+
+def test_resolve_registry():
+    registry = StatsRegistry()
+    assert resolve_registry(registry) is registry
+    assert isinstance(resolve_registry(True), StatsRegistry)
+    assert resolve_registry(None) is None and resolve_registry(False) is None
+
+def test_prometheus_text():
+    registry = StatsRegistry()
+    stats = registry.device('eye "1"')
+    stats.frame(1000.0, events=3, now=1000.0007)
+    stats.frame(1000.0, events=3, now=1000.2)
+    text = prometheus_text(registry)
+    dev = 'device="eye \\"1\\""'
+    assert f'wii_frames_total{{{dev}}} 2' in text
+    # Cumulative buckets
+    assert f'wii_frame_seconds_bucket{{{dev},le="0.001"}} 1' in text
+    assert f'wii_frame_seconds_bucket{{{dev},le="0.25"}} 2' in text
+    assert f'wii_frame_seconds_bucket{{{dev},le="+Inf"}} 2' in text
+    assert f'wii_frame_seconds_count{{{dev}}} 2' in text
+
+def test_serve_prometheus():
+    registry = StatsRegistry()
+    registry.device("board").frame(1000.0, events=4, now=1000.001)
+    server = serve_prometheus(registry, port=0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert 'wii_events_total{device="board"} 4' in response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from wii_stream import (encode_batch, decode_packet, StreamServer, WebSocketSubscriber, MAX_PACKET,
+                        MAX_DEVICE_ID)
+from wii_transport import SampleBatch, SimulatorTransport
+from helpers import sim_frames
+
+MAC = "00:1F:32:AA:BB:CC" # 17 characters: did not fit the version 1 id field
+
+def batch_of(kind, count, device=MAC):
+    samples = sim_frames(count, kind=kind)
+    return SampleBatch(device, kind, [t for t, v in samples], [v for t, v in samples])
+
+def decode_all(packets):
+    seqs, ts, values = [], [], []
+    for packet in packets:
+        assert len(packet) <= MAX_PACKET
+        seq, batch = decode_packet(packet)
+        seqs.append(seq)
+        ts += batch.ts
+        values += batch.values
+    return seqs, batch, ts, values
+
+def test_ir_packet_roundtrip():
+    batch = batch_of('ir', 500)
+    seqs, decoded, ts, values = decode_all(encode_batch(batch, 7))
+    assert seqs == list(range(7, 7 + len(seqs))) and len(seqs) > 1
+    assert (decoded.device, decoded.kind) == (MAC, 'ir')
+    assert ts == pytest.approx(batch.ts, abs=1e-6)
+    assert values == batch.values
+
+def test_board_packet_roundtrip():
+    batch = batch_of('board', 200)
+    seqs, decoded, ts, values = decode_all(encode_batch(batch, 0))
+    assert (decoded.device, decoded.kind) == (MAC, 'board')
+    assert ts == pytest.approx(batch.ts, abs=1e-6)
+    for got, ref in zip(values, batch.values): assert got == pytest.approx(ref, rel=1e-6)
+
+def test_device_ids_stay_distinct():
+    ids = ["00:1F:32:AA:BB:01", "00:1F:32:AA:BB:02"]
+    assert [decode_packet(encode_batch(batch_of('ir', 5, d), 0)[0])[1].device for d in ids] == ids
+    long_id = "x" * (MAX_DEVICE_ID + 10)
+    assert decode_packet(encode_batch(batch_of('ir', 5, long_id), 0)[0])[1].device == long_id[:MAX_DEVICE_ID]
+
+@pytest.mark.parametrize("damage", [lambda p: p[:10], lambda p: p[:-3], lambda p: b"XXXX" + p[4:]])
+def test_damaged_packets_raise(damage):
+    packet = encode_batch(batch_of('ir', 20), 0)[0]
+    with pytest.raises(ValueError):
+        decode_packet(damage(packet))
+
+async def _receive(path, count):
+    sim = SimulatorTransport('ir', device_id=MAC, realtime=False, chunk=10, start_time=1000.0, seed=3)
+    sim.open()
+    server = StreamServer([sim], rate=50.0, ws_port=0)
+    task = asyncio.ensure_future(server.serve(duration=10.0))
+    try:
+        while server._server is None: await asyncio.sleep(0.01)
+        subscriber = await WebSocketSubscriber(f"ws://127.0.0.1:{server.ws_port}/{path}").connect()
+        received = [await asyncio.wait_for(subscriber.recv(), 5.0) for _ in range(count)]
+        await subscriber.close()
+        return received
+    finally:
+        server.running = False
+        await task
+
+@pytest.mark.parametrize("path", ["", "?json"])
+def test_websocket_roundtrip(path):
+    received = asyncio.run(_receive(path, 3))
+    seqs = [seq for seq, batch in received]
+    assert seqs == sorted(seqs) and len(set(seqs)) == 3
+    for seq, batch in received:
+        assert (batch.device, batch.kind) == (MAC, 'ir')
+        assert len(batch.ts) == 10
+        # Same seed: sample i of the stream is sample i of a fresh simulator
+        first = round((batch.ts[0] - 1000.0) / 0.01)
+        expected = sim_frames(first + 10)[first:]
+        assert batch.ts == pytest.approx([t for t, v in expected], abs=1e-6)
+        assert batch.values == [v for t, v in expected]
+
+def test_samples_out_of_order_or_far_apart():
+    ts = [10.0, 9.999, 10.5, 10.5 + 3 * 3600, 20.0]
+    batch = SampleBatch('b', 'board', ts, [[1.0, 2.0, 3.0, 4.0]] * len(ts))
+    seqs, decoded, got, values = decode_all(encode_batch(batch, 0))
+    assert got == pytest.approx(ts, abs=1e-6)
+    assert seqs == list(range(len(seqs)))
+
+def test_device_id_cut_on_character_boundary():
+    device = "ż" * 200 # 2 bytes each: the byte limit falls inside a character
+    decoded = decode_packet(encode_batch(batch_of('ir', 5, device), 0)[0])[1].device
+    assert decoded == device[:MAX_DEVICE_ID // 2]
+
+async def _oversized_frame():
+    server = StreamServer([], rate=50.0, ws_port=0)
+    task = asyncio.ensure_future(server.serve(duration=10.0))
+    try:
+        while server._server is None: await asyncio.sleep(0.01)
+        subscriber = await WebSocketSubscriber(f"ws://127.0.0.1:{server.ws_port}/").connect()
+        # Masked binary frame declaring a 2 GiB payload
+        subscriber.writer.write(bytes([0x82, 0xFF]) + (2 ** 31).to_bytes(8, 'big') + b"\0\0\0\0")
+        return await asyncio.wait_for(subscriber.reader.read(), 5.0)
+    finally:
+        server.running = False
+        await task
+
+def test_oversized_client_frame_closes_connection():
+    assert asyncio.run(_oversized_frame()) == b""
@@ -0,0 +1,94 @@
+import pytest
+
+import wiiboard
+from wiiboard import WiiboardSupervisor
+
+ADDRESS = "00:1E:35:AA:BB:CC"
+
+class FakeBoard:
+    """Stands in for Wiiboard: connect() succeeds according to `results`."""
+    def __init__(self, results=()):
+        self.results = list(results)
+        self.attempts = []
+        self.running = False
+        self.receivesocket = None
+        self.link_lost = False
+
+    def connect(self, address, timeout=None):
+        self.attempts.append(address)
+        ok = self.results.pop(0) if self.results else False
+        if ok:
+            self.running, self.receivesocket, self.link_lost = True, object(), False
+        return ok
+
+    def drop_link(self):
+        self.running, self.receivesocket, self.link_lost = False, None, True
+
+    def close(self):
+        self.running, self.receivesocket = False, None
+
+@pytest.fixture(autouse=True)
+def no_bluetooth(monkeypatch):
+    monkeypatch.setattr(wiiboard, 'load_config', lambda: None)
+    monkeypatch.setattr(wiiboard, 'save_config', lambda address: None)
+    monkeypatch.setattr(wiiboard, 'trust_device', lambda address: None)
+    monkeypatch.setattr(wiiboard, 'discover', lambda: [])
+
+def tick_until_done(supervisor, ticks):
+    for _ in range(ticks):
+        supervisor._next_attempt = 0.0 # Skip the backoff sleep
+        supervisor.tick()
+
+def test_backoff_doubles_up_to_max(monkeypatch):
+    monkeypatch.setattr(wiiboard.random, 'uniform', lambda low, high: high)
+    supervisor = WiiboardSupervisor(FakeBoard(), ADDRESS, base_delay=0.05, max_delay=2.0)
+    delays = []
+    for failures in range(8):
+        supervisor.failures = failures
+        delays.append(supervisor._backoff())
+    assert delays == pytest.approx([0.05, 0.1, 0.2, 0.4, 0.8, 1.6, 2.0, 2.0])
+
+def test_backoff_is_jittered():
+    supervisor = WiiboardSupervisor(FakeBoard(), ADDRESS, base_delay=0.05, max_delay=2.0)
+    supervisor.failures = 10
+    delays = {supervisor._backoff() for _ in range(20)}
+    assert len(delays) > 1 and all(0.0 <= d <= 2.0 for d in delays)
+
+def test_failed_attempt_schedules_next():
+    supervisor = WiiboardSupervisor(FakeBoard(), ADDRESS, base_delay=1.0, max_delay=1.0)
+    assert not supervisor.tick()
+    assert supervisor.failures == 1
+    assert not supervisor.tick() # Not due yet: no second attempt
+    assert len(supervisor.board.attempts) == 1
+
+def test_gives_up_after_max_failures():
+    board = FakeBoard()
+    supervisor = WiiboardSupervisor(board, ADDRESS, max_failures=3)
+    tick_until_done(supervisor, 10)
+    assert board.attempts == [ADDRESS] * 3
+    assert supervisor.gave_up and supervisor.finished
+
+def test_gives_up_after_empty_scans():
+    board = FakeBoard()
+    supervisor = WiiboardSupervisor(board, max_scans=2)
+    tick_until_done(supervisor, 10)
+    assert board.attempts == [] and supervisor.empty_scans == 2
+    assert supervisor.gave_up
+
+def test_reconnects_without_limit_after_link_loss():
+    board = FakeBoard([True] + [False] * 5 + [True])
+    supervisor = WiiboardSupervisor(board, ADDRESS, max_failures=3)
+    assert supervisor.tick()
+    board.drop_link()
+    tick_until_done(supervisor, 6)
+    assert supervisor.connected and not supervisor.gave_up
+    assert supervisor.reconnects == 1 and supervisor.failures == 0
+
+def test_user_disconnect_finishes():
+    board = FakeBoard([True, True])
+    supervisor = WiiboardSupervisor(board, ADDRESS)
+    assert supervisor.tick()
+    board.close() # Button on the board, not a radio error
+    tick_until_done(supervisor, 3)
+    assert supervisor.finished and not supervisor.gave_up
+    assert len(board.attempts) == 1
@@ -0,0 +1,61 @@
+import pytest
+
+from wii_sync import (BoardGroup, center_of_pressure, combined_center_of_pressure, BOARD_WIDTH,
+                      SENSOR_SPACING_X, SENSOR_SPACING_Y)
+from helpers import sim_frames
+
+class FakeBoard:
+    timestamp = None
+
+def group_of(streams, rate=50.0, **kwargs):
+    """BoardGroup fed from (ts, sensors) lists, starting the grid at the first sample."""
+    group = BoardGroup([FakeBoard() for _ in streams], rate=rate, **kwargs)
+    for stream, samples in zip(group.streams, streams):
+        for ts, sensors in samples: stream.push(ts, sensors)
+    group.next_ts = min(samples[0][0] for samples in streams)
+    return group
+
+def ramp(start, count, period=0.01):
+    # Each sensor reads 1 kg plus 10 kg/s, linear so interpolation is exact
+    return [(start + i * period, [1.0 + 10.0 * i * period] * 4) for i in range(count)]
+
+def test_resamples_boards_onto_common_grid():
+    group = group_of([ramp(1000.0, 101), ramp(1000.004, 101)])
+    frames = group._emit(now=1000.5)
+    # Grid stops at the board that reported least far
+    assert [f.ts for f in frames] == pytest.approx([1000.0 + i * 0.02 for i in range(51)])
+    for frame in frames[1:]:
+        t = frame.ts - 1000.0
+        assert frame.weights[0] == pytest.approx(4 * (1.0 + 10.0 * t))
+        assert frame.weights[1] == pytest.approx(4 * (1.0 + 10.0 * (t - 0.004)))
+        assert frame.total == pytest.approx(sum(frame.weights))
+
+def test_silent_board_is_held_after_max_lag():
+    group = group_of([ramp(1000.0, 101), ramp(1000.0, 11)], max_lag=0.1)
+    assert len(group._emit(now=1000.15)) == 6 # 1000.00 .. 1000.10, waits for board 1
+    frames = group._emit(now=1001.0)
+    assert frames[-1].ts == pytest.approx(1000.9)
+    assert all(f.weights[1] == pytest.approx(8.0) for f in frames) # Last value held
+
+def test_single_board_center_of_pressure():
+    sx, sy = SENSOR_SPACING_X / 2, SENSOR_SPACING_Y / 2
+    assert center_of_pressure([10.0, 0.0, 0.0, 0.0]) == pytest.approx((sx, sy))
+    assert center_of_pressure([0.0, 0.0, 0.0, 10.0]) == pytest.approx((-sx, -sy))
+    assert center_of_pressure([5.0, 5.0, 5.0, 5.0]) == pytest.approx((0.0, 0.0))
+    assert center_of_pressure([0.2, 0.2, 0.2, 0.2]) is None
+
+def test_combined_center_of_pressure_is_mass_weighted():
+    positions = [(0.0, 0.0), (BOARD_WIDTH, 0.0)]
+    cop = combined_center_of_pressure([[7.5] * 4, [2.5] * 4], positions)
+    assert cop == pytest.approx((BOARD_WIDTH / 4, 0.0))
+    # An empty board adds no mass and does not drag the CoP
+    assert combined_center_of_pressure([[7.5] * 4, [0.0] * 4], positions) == pytest.approx((0.0, 0.0))
+
+def test_two_simulated_boards():
+    samples = sim_frames(200, kind='board')
+    group = group_of([samples, samples], rate=100.0)
+    frames = group._emit(now=samples[-1][0])
+    assert len(frames) == 200
+    for frame in frames:
+        assert frame.total == pytest.approx(140.0, abs=1.0)
+        assert frame.cop[0] == pytest.approx(BOARD_WIDTH / 2, abs=2.0)
@@ -0,0 +1,20 @@
+from wii_transport import IR_NONE, set_ir_axis, iter_capture
+
+def test_set_ir_axis():
+    points = [None] * 4
+    assert set_ir_axis(points, 18, 500) == 1 # ABS_HAT1X
+    assert points == [None, [500, IR_NONE], None, None]
+    set_ir_axis(points, 19, 300)
+    assert points[1] == [500, 300]
+    set_ir_axis(points, 18, IR_NONE)
+    set_ir_axis(points, 19, IR_NONE)
+    assert points == [None] * 4
+
+def test_raw_capture_frames(tmp_path):
+    path = tmp_path / "wiieye_raw_1.csv"
+    path.write_text("ts,code,val\n1.00,16,500\n1.00,17,300\n1.01,22,10\n1.01,23,20\n1.02,16,1023\n1.02,17,1023\n")
+    kind, frames = iter_capture(str(path))
+    assert kind == 'ir'
+    assert list(frames) == [(1.00, [[500, 300], None, None, None]),
+                            (1.01, [[500, 300], None, None, [10, 20]]),
+                            (1.02, [None, None, None, [10, 20]])]
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+import wii_tune
+from wii_analytics import DEFAULT_PROFILE
+from helpers import sim_frames
+
+BEACON = sim_frames(6000, pattern=[0x5A], bit_duration=0.1) # 60 s
+STEADY = sim_frames(3000)                                   # Point, no beacon
+AUTO = dict(DEFAULT_PROFILE, auto_clock=True)
+
+def evaluate(monkeypatch, captures, params=AUTO):
+    monkeypatch.setattr(wii_tune, '_CAPTURES', captures)
+    return wii_tune.evaluate(dict(params))
+
+def test_correct_decodes(monkeypatch):
+    row = evaluate(monkeypatch, [('beacon', BEACON, {0x5A}), ('steady', STEADY, set())])
+    assert row['recall'] == 1.0 and row['hits'] > 30
+    assert row['precision'] == pytest.approx(row['hits'] / (row['hits'] + row['false']), abs=1e-4)
+    assert 0 < row['latency_s'] < 5.0
+    assert row['score'] == pytest.approx(row['f1'] - wii_tune.LATENCY_WEIGHT * row['latency_s'], abs=1e-3)
+    assert row['auto_clock'] is True # Parameters are part of the row
+
+def test_wrong_label_counts_false_positives(monkeypatch):
+    row = evaluate(monkeypatch, [('beacon', BEACON, {0xC3})])
+    assert row['hits'] == 0 and row['recall'] == 0.0
+    minutes = (BEACON[-1][0] - BEACON[0][0]) / 60
+    assert row['false'] > 30 and row['false_per_min'] == pytest.approx(row['false'] / minutes, abs=1e-3)
+    assert row['score'] == 0.0 and row['latency_s'] == ''
+
+def test_nothing_expected_nothing_decoded(monkeypatch):
+    row = evaluate(monkeypatch, [('steady', STEADY, set())])
+    assert (row['precision'], row['recall'], row['f1'], row['false']) == (1.0, 1.0, 1.0, 0)
+
+def test_ranking_prefers_the_working_decoder(monkeypatch):
+    captures = [('beacon', BEACON, {0x5A})]
+    rows = [evaluate(monkeypatch, captures, dict(DEFAULT_PROFILE, auto_clock=auto)) for auto in (False, True)]
+    rows.sort(key=wii_tune._rank_key)
+    assert rows[0]['auto_clock'] is True and rows[0]['score'] > rows[1]['score']
+
+def test_grid_and_labels(tmp_path):
+    grid = wii_tune.parse_grid(["radius=40,80", "auto_clock=1,no"])
+    assert grid['radius'] == [40, 80] and grid['auto_clock'] == [True, False]
+    assert len(wii_tune.combinations(grid)) == len(wii_tune.combinations(wii_tune.DEFAULT_GRID)) * 2 // 3
+    with pytest.raises(ValueError): wii_tune.parse_grid(["speed=1"])
+    labels = tmp_path / "labels.json"
+    labels.write_text(json.dumps({"a.csv": ["5A", 195], "b.csv": []}))
+    assert wii_tune.load_labels(str(labels)) == {str(tmp_path / "a.csv"): {0x5A, 0xC3}, str(tmp_path / "b.csv"): set()}
@@ -0,0 +1,125 @@
+import socket
+import struct
+
+import pytest
+
+import wii_protocol as proto
+from wii_calibration import CalibrationStore
+from wii_demand import StreamDemand
+from wiiboard import Wiiboard, WiiboardReactor, CONTINUOUS_REPORTING, CHANGE_REPORTING
+
+CALIBRATION = [[1000] * 4, [2700] * 4, [4400] * 4] # 0 / 17 / 34 kg
+
+def mass_report(raw, buttons=0):
+    return bytes([0xA1, proto.REPORT_EXT8]) + struct.pack('>H4H', buttons, *raw)
+
+class RecordingBoard(Wiiboard):
+    """Wiiboard on a local SOCK_SEQPACKET pair (keeps report boundaries like L2CAP)."""
+    def __init__(self, tmp_path, **kwargs):
+        super().__init__(interactive=False, calibration_store=CalibrationStore(str(tmp_path / "calib.json")),
+                         **kwargs)
+        self.receivesocket, self.remote = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.controlsocket, self.commands = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.commands.setblocking(False)
+        self.calibration = CALIBRATION
+        self.running = True
+        self.samples = []
+
+    def on_sample(self, sample):
+        self.samples.append(sample.copy())
+
+    def sent(self):
+        out = []
+        try:
+            while True: out.append(self.commands.recv(64))
+        except BlockingIOError: return out
+
+@pytest.fixture
+def reactor_boards(tmp_path):
+    reactor = WiiboardReactor()
+    boards = [RecordingBoard(tmp_path), RecordingBoard(tmp_path)]
+    for board in boards: reactor.add(board)
+    yield reactor, boards
+    reactor.close()
+    for board in boards: board.remote.close()
+
+def poll_all(reactor):
+    while reactor.poll(0.05): pass
+
+def test_reactor_reads_every_board(reactor_boards):
+    reactor, (a, b) = reactor_boards
+    for raw in ([1000] * 4, [2700] * 4, [4400, 2700, 1000, 0]):
+        a.remote.send(mass_report(raw))
+    b.remote.send(mass_report([1850] * 4))
+    poll_all(reactor)
+    assert [s.total for s in a.samples] == pytest.approx([0.0, 68.0, 34.0 + 17.0])
+    assert b.samples[0].mass == pytest.approx([8.5] * 4)
+
+def test_short_and_bad_reports_keep_the_link(reactor_boards):
+    reactor, (a, b) = reactor_boards
+    a.remote.send(mass_report([2700] * 4)[:9])
+    a.remote.send(b'\xa1')
+    a.remote.send(mass_report([2700] * 4))
+    poll_all(reactor)
+    assert a.short_reports == 1 and len(a.samples) == 1
+    assert a in reactor.boards
+
+def test_link_loss_removes_only_that_board(reactor_boards):
+    reactor, (a, b) = reactor_boards
+    a.remote.close()
+    b.remote.send(mass_report([2700] * 4))
+    poll_all(reactor)
+    assert a.link_lost and a not in reactor.boards
+    assert reactor.boards == [b] and len(b.samples) == 1
+
+def test_button_ends_the_session(reactor_boards):
+    reactor, (a, b) = reactor_boards
+    b.remote.send(mass_report([2700] * 4, buttons=proto.BUTTON_A))
+    poll_all(reactor)
+    assert not b.running and not b.link_lost # Closed by the user, not the radio
+    assert reactor.boards == [a]
+
+def test_stream_demand_counts():
+    changes = []
+    demand = StreamDemand(('ir', 'accel'), lambda stream, active: changes.append((stream, active)))
+    demand.acquire('ir')
+    demand.acquire('ir')
+    with demand.using('accel'): assert demand.active('accel')
+    demand.release('ir')
+    assert demand.active('ir')
+    demand.release('ir')
+    demand.release('ir') # Unbalanced release is ignored
+    assert changes == [('ir', True), ('accel', True), ('accel', False), ('ir', False)]
+    with pytest.raises(ValueError): demand.acquire('board')
+
+def reporting(mode, report):
+    return b'\x52' + bytes([proto.OUT_REPORTING]) + mode + bytes([report])
+
+def test_on_demand_switches_report_mode(tmp_path):
+    board = RecordingBoard(tmp_path, on_demand=True, continuous=False)
+    try:
+        board.apply_reporting()
+        board.subscribe()
+        board.subscribe()
+        board.unsubscribe()
+        assert board.sent() == [reporting(CHANGE_REPORTING, proto.REPORT_BUTTONS),
+                                reporting(CHANGE_REPORTING, proto.REPORT_EXT8)]
+        board.unsubscribe()
+        assert board.sent() == [reporting(CHANGE_REPORTING, proto.REPORT_BUTTONS)]
+        # Buttons keep working while the sensor stream is off
+        board.remote.send(bytes([0xA1, proto.REPORT_BUTTONS, 0x00, 0x08]))
+        board.setblocking(False)
+        board.handle_input()
+        assert board.button_down and not board.samples
+    finally:
+        board.close()
+        board.remote.close()
+
+def test_always_on_by_default(tmp_path):
+    board = RecordingBoard(tmp_path)
+    try:
+        board.apply_reporting()
+        assert board.sent() == [reporting(CONTINUOUS_REPORTING, proto.REPORT_EXT8)]
+    finally:
+        board.close()
+        board.remote.close()
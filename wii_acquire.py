@@ -0,0 +1,229 @@
+"""
+Dedicated Acquisition: reader thread / process per evdev device.
+
+The reader only drains the device and stores the raw events (with their
+kernel timestamps) in an EventRing; analysis pulls them at its own pace, so
+a slow consumer no longer backs up the kernel buffer.
+
+- EventRing: fixed-size records in a flat buffer (bytearray for threads,
+  multiprocessing.shared_memory for a reader process). Single producer, any
+  number of independent cursors. The producer never waits: it overwrites
+  the oldest records. Like a seqlock it first announces the end of the
+  batch it is about to write (reserved sequence), then writes the records
+  and publishes the sequence number last; a lagging cursor detects the
+  overrun, and records overwritten while it copied them, from the
+  reserved sequence and skips ahead.
+- AcquiredDevice: drop-in stand-in for evdev.InputDevice (fd + read()),
+  fed from the ring. A ring overrun is delivered as SYN_DROPPED, so the
+  drivers resync exactly as after a kernel overrun. Everything else
+  (write, upload_effect, absinfo, ...) goes to the real device.
+
+Use WiiEyeNative(acquisition='thread'|'process') or
+WiiboardNative(acquisition=...). Thread mode still shares the GIL with the
+analysis; process mode keeps acquisition latency flat under any load.
+"""
+
+import os
+import time
+import fcntl
+import select
+import struct
+import logging
+import threading
+
+from evdev import InputDevice, InputEvent, ecodes
+
+logger = logging.getLogger("wii_accessories")
+
+HEADER = struct.Struct('<QQ')    # Published write sequence, reserved sequence (end of the batch being written)
+SEQ = struct.Struct('<Q')
+RESERVED_OFFSET = 8
+RECORD = struct.Struct('<qqHHi') # sec, usec, type, code, value
+DEFAULT_CAPACITY = 8192          # Events
+
+class EventRing:
+    def __init__(self, buf, capacity):
+        self.buf = buf
+        self.capacity = capacity
+        self._seq = HEADER.unpack_from(buf, 0)[0] # Producer's private sequence
+
+    @staticmethod
+    def size_for(capacity):
+        return HEADER.size + capacity * RECORD.size
+
+    @property
+    def write_seq(self):
+        return SEQ.unpack_from(self.buf, 0)[0]
+
+    @property
+    def reserved_seq(self):
+        """Records below reserved_seq - capacity may be overwritten at any moment."""
+        return SEQ.unpack_from(self.buf, RESERVED_OFFSET)[0]
+
+    def publish(self, events):
+        """Producer: appends a list of (sec, usec, type, code, value) tuples, then publishes."""
+        buf, cap, seq, size, pack = self.buf, self.capacity, self._seq, RECORD.size, RECORD.pack_into
+        SEQ.pack_into(buf, RESERVED_OFFSET, seq + len(events)) # Announce the slots about to be overwritten
+        for e in events:
+            pack(buf, HEADER.size + (seq % cap) * size, *e)
+            seq += 1
+        self._seq = seq
+        SEQ.pack_into(buf, 0, seq) # Records first, sequence last
+
+class RingCursor:
+    """One consumer's position in an EventRing."""
+    def __init__(self, ring, from_start=False):
+        self.ring = ring
+        self.seq = max(0, ring.write_seq - ring.capacity) if from_start else ring.write_seq
+        self.lost = 0 # Events overwritten before this cursor read them
+
+    def read(self, max_events=None):
+        """Returns (records, lost): records published since the last read."""
+        ring = self.ring
+        cap = ring.capacity
+        end = ring.write_seq
+        lost = 0
+        if ring.reserved_seq - self.seq > cap:
+            # Too slow: skip what was (or is being) overwritten, plus slack for the running producer
+            skip = min(end - self.seq, ring.reserved_seq - self.seq - cap + cap // 8)
+            lost += skip
+            self.seq += skip
+        if max_events is not None: end = min(end, self.seq + max_events)
+        start = self.seq
+        buf, size, unpack = ring.buf, RECORD.size, RECORD.unpack_from
+        records = [unpack(buf, HEADER.size + (s % cap) * size) for s in range(start, end)]
+        # Slots reserved by the producer while we were copying (written or not yet) are torn
+        torn = min(len(records), ring.reserved_seq - cap - start)
+        if torn > 0:
+            del records[:torn]
+            lost += torn
+        self.seq = end
+        self.lost += lost
+        return records, lost
+
+def _set_nonblocking(fd):
+    fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+def _notify(fd):
+    try: os.write(fd, b'\x01')
+    except BlockingIOError: pass # Pipe full: the consumer has a wakeup pending anyway
+
+def reader_loop(path, ring, notify_fd, stop, poll_interval=0.1):
+    """Reads `path` until stop is set: events -> ring, one byte -> notify_fd per batch."""
+    try: device = InputDevice(path)
+    except OSError as e:
+        logger.warning(f"Reader: cannot open {path}: {e}")
+        return
+    try:
+        while not stop.is_set():
+            r, w, x = select.select([device.fd], [], [], poll_interval)
+            if not r: continue
+            batch = []
+            try:
+                for event in device.read():
+                    batch.append((event.sec, event.usec, event.type, event.code, event.value))
+            except BlockingIOError: pass
+            except OSError as e:
+                logger.warning(f"Reader: {path} lost: {e}")
+                break
+            if batch:
+                ring.publish(batch)
+                _notify(notify_fd)
+    finally:
+        device.close()
+
+def _process_main(path, shm, capacity, notify_fd, stop):
+    reader_loop(path, EventRing(shm.buf, capacity), notify_fd, stop)
+
+class DeviceReader:
+    """Reader of one evdev node in a thread or a (forked) process."""
+    def __init__(self, path, mode='thread', capacity=DEFAULT_CAPACITY):
+        if mode not in ('thread', 'process'): raise ValueError(f"Unknown acquisition mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.capacity = capacity
+        self.notify_r, self.notify_w = os.pipe()
+        _set_nonblocking(self.notify_r)
+        _set_nonblocking(self.notify_w)
+        self._shm = None
+        self._worker = None
+        if mode == 'thread':
+            self.ring = EventRing(bytearray(EventRing.size_for(capacity)), capacity)
+            self._stop = threading.Event()
+        else:
+            import multiprocessing
+            from multiprocessing import shared_memory
+            self._ctx = multiprocessing.get_context('fork') # Inherits the notify pipe
+            self._shm = shared_memory.SharedMemory(create=True, size=EventRing.size_for(capacity)) # Zeroed
+            self.ring = EventRing(self._shm.buf, capacity)
+            self._stop = self._ctx.Event()
+
+    def start(self):
+        if self.mode == 'thread':
+            self._worker = threading.Thread(target=reader_loop, daemon=True, name=f"reader-{self.path}",
+                                            args=(self.path, self.ring, self.notify_w, self._stop))
+        else:
+            self._worker = self._ctx.Process(target=_process_main, daemon=True, name=f"reader-{self.path}",
+                                             args=(self.path, self._shm, self.capacity, self.notify_w, self._stop))
+        self._worker.start()
+        return self
+
+    @property
+    def alive(self):
+        return self._worker is not None and self._worker.is_alive()
+
+    def cursor(self, from_start=False):
+        return RingCursor(self.ring, from_start)
+
+    def drain_notifications(self):
+        try:
+            while os.read(self.notify_r, 4096): pass
+        except BlockingIOError: pass
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        if self._worker is not None: self._worker.join(timeout)
+        self._worker = None
+        for fd in (self.notify_r, self.notify_w):
+            try: os.close(fd)
+            except OSError: pass
+        if self._shm is not None:
+            self.ring = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+class AcquiredDevice:
+    """
+    evdev.InputDevice look-alike: `fd` becomes readable when the reader has
+    published events, read() yields them as InputEvents (BlockingIOError
+    when there are none). Other attributes come from the real device.
+    """
+    def __init__(self, device, mode='thread', capacity=DEFAULT_CAPACITY):
+        self.device = device
+        self.reader = DeviceReader(device.path, mode, capacity).start()
+        self.cursor = self.reader.cursor()
+        self.fd = self.reader.notify_r
+
+    def __getattr__(self, name):
+        return getattr(self.device, name)
+
+    def read(self):
+        self.reader.drain_notifications()
+        records, lost = self.cursor.read()
+        if not records and not lost:
+            if not self.reader.alive: raise OSError(f"Reader of {self.device.path} stopped")
+            raise BlockingIOError
+        return self._events(records, lost)
+
+    @staticmethod
+    def _events(records, lost):
+        if lost:
+            now = time.time()
+            yield InputEvent(int(now), int(now % 1 * 1e6), ecodes.EV_SYN, ecodes.SYN_DROPPED, 0)
+        for sec, usec, etype, code, value in records:
+            yield InputEvent(sec, usec, etype, code, value)
+
+    def close(self):
+        self.reader.stop()
+        self.device.close()
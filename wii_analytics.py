@@ -0,0 +1,211 @@
+"""
+Transport-independent analytics on SampleBatch streams (see wii_transport).
+
+- BoardAnalytics: tare, total weight, per-sensor weights, center of pressure.
+- IRTracker: 150 ms point persistence, stability factor, pulse monitor and
+  VLC (Morse) decoding driven by sample timestamps instead of the wall clock,
+  so live, replayed and simulated streams decode identically. The bit clock
+  is estimated from the frames (tracker.clock); auto_clock=True retunes the
+  decoder with it and feeds the decoder the estimator's debounced detection
+  instead of the 150 ms persisted point.
+
+The live drivers (Wii_accesories_bib.WiiEyeNative / WiiboardNative) feed
+their evdev reports into these same classes as SampleBatches.
+
+The IR pipeline constants (persistence, stability radius, duty threshold,
+stability gate) can be loaded from a profile written by wii_tune:
+
+    tracker = IRTracker(**load_profile("wiieye_profile.json"))
+"""
+
+import os
+import json
+import time
+import logging
+import collections
+
+from wii_signal import MorseDecoder, StabilityMonitor, PulseMonitor, BitClockEstimator
+from wii_sync import center_of_pressure
+
+logger = logging.getLogger("wii_accessories")
+
+POINT_PERSISTENCE = 0.15 # s a point stays visible after it flickers out
+MIN_DECODE_SF = 0.1      # Stability factor required to accept a decoded byte
+MAX_DECODED = 1000       # Decoded bytes IRTracker keeps (decoded_count counts all)
+PROFILE_FILE = "wiieye_profile.json"
+PROFILE_VERSION = 1
+# IRTracker / WiiEyeNative decoder parameters and their defaults
+DEFAULT_PROFILE = {
+    'bit_duration': 0.1,
+    'radius': 60,                     # StabilityMonitor radius (camera px)
+    'persistence': POINT_PERSISTENCE, # s a point stays visible after it flickers out
+    'threshold': 0.05,                # Active share for a 1 (free-running bit windows)
+    'aligned_threshold': 0.5,         # Active share for a 1 once auto_clock aligned the windows
+    'min_sf': MIN_DECODE_SF,
+    'auto_clock': False,
+}
+
+def load_profile(path):
+    """Decoder parameters from a profile file; missing keys keep their defaults."""
+    with open(path) as f: data = json.load(f)
+    if data.get('version', 1) > PROFILE_VERSION: raise ValueError(f"{path}: unsupported profile version")
+    params = dict(DEFAULT_PROFILE)
+    for key, value in data.get('params', {}).items():
+        if key not in DEFAULT_PROFILE: raise ValueError(f"{path}: unknown parameter {key}")
+        params[key] = type(DEFAULT_PROFILE[key])(value)
+    return params
+
+def save_profile(path, params, **info):
+    """Writes `params` (+ e.g. score, captures) atomically."""
+    data = {'version': PROFILE_VERSION, 'created': time.time(), 'params': params, **info}
+    tmp = path + ".tmp"
+    with open(tmp, 'w') as f: json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+class BoardAnalytics:
+    def __init__(self, tare_samples=50):
+        self.tare_samples = tare_samples
+        self.tare_sensors = [0.0] * 4
+        self._tare_acc = None
+        self.ts = 0.0
+        self.sensors = [0.0] * 4
+        self.weight = 0.0
+        self.cop = None
+        self.count = 0
+
+    def tare(self, samples=None):
+        """Averages the next `samples` (default `tare_samples`) samples as the new zero."""
+        if samples: self.tare_samples = samples
+        self._tare_acc = []
+
+    @property
+    def taring(self):
+        return self._tare_acc is not None
+
+    def feed(self, batch):
+        tare = self.tare_sensors
+        for t, values in zip(batch.ts, batch.values):
+            if self._tare_acc is not None:
+                self._tare_acc.append(values)
+                if len(self._tare_acc) >= self.tare_samples:
+                    n = len(self._tare_acc)
+                    self.tare_sensors = tare = [sum(v[i] for v in self._tare_acc) / n for i in range(4)]
+                    self._tare_acc = None
+            self.sensors = [values[i] - tare[i] for i in range(4)]
+            self.count += 1
+        if batch.ts:
+            self.ts = batch.ts[-1]
+            self.weight = sum(self.sensors)
+            self.cop = center_of_pressure(self.sensors)
+
+    def summary(self):
+        cop = f"({self.cop[0]:+5.1f}, {self.cop[1]:+5.1f}) cm" if self.cop else "-"
+        return f"{self.weight:6.2f} kg | CoP {cop}"
+
+class IRTracker:
+    """
+    Also the live pipeline of WiiEyeNative, which feeds it one SampleBatch per
+    update(). on_clock(clock) is called on every bit-clock update; verbose
+    prints the pulse monitor's HOT/COLD durations. decoded keeps the last
+    max_decoded bytes (None: all of them).
+    """
+    def __init__(self, bit_duration=0.1, radius=60, on_id_detected=None, trace=False, auto_clock=False,
+                 persistence=POINT_PERSISTENCE, threshold=0.05, aligned_threshold=0.5, min_sf=MIN_DECODE_SF,
+                 verbose=False, on_clock=None, max_decoded=MAX_DECODED):
+        self.points = [None] * 4
+        self.points_persistence = [0.0] * 4
+        self.persistence = persistence
+        self.min_sf = min_sf
+        self.decoding = True # WiiEyeNative decodes only while B is held
+        self.decoder = MorseDecoder(bit_duration=bit_duration, callback=self._on_id_found, trace=trace,
+                                    threshold=threshold, aligned_threshold=aligned_threshold)
+        self.stability = StabilityMonitor(radius=radius)
+        self.pulsemon = PulseMonitor(verbose=verbose)
+        self.clock = BitClockEstimator()
+        self.auto_clock = auto_clock
+        self.on_id_detected = on_id_detected
+        self.on_clock = on_clock
+        self.decoded = collections.deque(maxlen=max_decoded) # (ts, value)
+        self.decoded_count = 0
+        self.ts = None
+
+    def _on_id_found(self, val):
+        if self.stability.stability_factor > self.min_sf:
+            logger.info(f"DECODED: 0x{val:02X} (SF:{self.stability.stability_factor:.2f})")
+            self.decoded.append((self.ts, val))
+            self.decoded_count += 1
+            if self.on_id_detected: self.on_id_detected(val)
+
+    def _step(self, t, frame):
+        if self.ts is None:
+            # Start the decoder integrator at the stream's clock, not the wall clock
+            self.decoder.last_update_time = t
+            self.pulsemon.last_change_time = t
+        elif t < self.ts:
+            t = self.ts # Frame stamped before a tick() (live: queued while polling)
+        self.ts = t
+        if frame is not None:
+            locked = self.clock.locked
+            if self.clock.feed(frame[0] is not None, t):
+                if self.auto_clock:
+                    if not locked: self.decoder.reset(t) # Bits taken with the preset period are garbage
+                    self.decoder.retune(self.clock.bit_duration, self.clock.boundary)
+                if self.on_clock: self.on_clock(self.clock)
+            for i, p in enumerate(frame):
+                if p is not None:
+                    self.points[i] = p
+                    self.points_persistence[i] = t + self.persistence
+        for i in range(4):
+            if self.points[i] and t > self.points_persistence[i]:
+                self.points[i] = None
+
+        p0 = self.points[0]
+        is_stable = self.stability.feed(p0, now=t)
+        if self.decoding:
+            active = p0 is not None
+            detected = self.clock.state if self.auto_clock and self.clock.locked else active
+            self.decoder.feed(detected and is_stable, now=t)
+            self.pulsemon.feed(active, is_stable, now=t)
+
+    def restart(self, t, frame=None):
+        """
+        After a gap in the input (evdev overrun): partial bits are dropped and
+        no pulse is measured across it. `frame`: the resynced state at `t`.
+        """
+        self.decoder.reset(t)
+        self.clock.restart(frame[0] is not None if frame is not None else None)
+        if frame is not None:
+            self.points = [None] * 4 # Resynced state replaces the persisted points
+        self._step(t, frame)
+
+    def feed(self, batch):
+        for t, frame in zip(batch.ts, batch.values):
+            self._step(t, frame)
+
+    def replay(self, frames, on_frame=None):
+        """
+        (ts, frame) pairs, e.g. from wii_transport.iter_capture. on_frame(t, frame)
+        is called after each frame, with the tracker state updated.
+        """
+        for t, frame in frames:
+            self._step(t, frame)
+            if on_frame: on_frame(t, frame)
+        return self
+
+    def tick(self, now):
+        """Advances time without a new frame (device silent)."""
+        if self.ts is not None and now > self.ts: self._step(now, None)
+
+    @property
+    def stability_factor(self):
+        return self.stability.stability_factor
+
+    def summary(self):
+        pts = " ".join(f"P{i}:{p[0]:4d},{p[1]:4d}" if p else f"P{i}: ---,---" for i, p in enumerate(self.points))
+        last = f"0x{self.decoded[-1][1]:02X}" if self.decoded else "-"
+        return f"{pts} | SF {self.stability_factor:.2f} | last ID {last}"
+
+def analytics_for(kind, **kwargs):
+    if kind == 'board': return BoardAnalytics(**kwargs)
+    if kind == 'ir': return IRTracker(**kwargs)
+    raise ValueError(f"Unknown kind: {kind}")
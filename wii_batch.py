@@ -0,0 +1,226 @@
+"""
+Batch Capture Processor: every wiieye_*.csv under a directory tree.
+
+Each capture (raw / status / record) is replayed through the IRTracker
+pipeline (stability, pulses, bit clock, VLC decoding) and optionally
+rendered with the level-of-detail chart; the per-file results go into one summary table
+(batch_summary.csv in the output directory, default wii_batch_output/ in the
+working directory, plus a table on stdout). Captures are never written to.
+
+Files are processed by a process pool. A cache (.wiibatch_cache.json in the
+output directory) remembers size, mtime and SHA-1 of every input together
+with the options used: unchanged files are skipped without being read, a
+touched but identical file costs one hash.
+
+    python wii_batch.py captures/ -o reports/ -j 8
+    python wii_batch.py captures/ --no-charts --force
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import fnmatch
+import hashlib
+import argparse
+import statistics
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+CACHE_FILE = ".wiibatch_cache.json"
+SUMMARY_FILE = "batch_summary.csv"
+OUTPUT_DIR = "wii_batch_output" # Default output directory, kept apart from the captures
+PATTERNS = ("wiieye_raw_*.csv", "wiieye_status_*.csv", "wiieye_record_*.csv")
+VERSION = 2 # Bump when the analysis changes: invalidates every cache entry
+SUMMARY_FIELDS = ['file', 'kind', 'frames', 'duration_s', 'p0_visible', 'p1_visible', 'p2_visible',
+                  'p3_visible', 'sf_mean', 'sf_max', 'pulses', 'hot_ms_median', 'cold_ms_median',
+                  'bit_ms', 'decoded', 'decoded_values', 'chart', 'error']
+
+def find_captures(root, patterns=PATTERNS):
+    """Sorted capture paths under root (a single file is returned as is)."""
+    if os.path.isfile(root): return [root]
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        for name in filenames:
+            if any(fnmatch.fnmatch(name, p) for p in patterns): found.append(os.path.join(dirpath, name))
+    return sorted(found)
+
+def file_digest(path, chunk=1 << 20):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk), b''): h.update(block)
+    return h.hexdigest()
+
+def analyze_capture(path, bit_duration=0.1, auto_clock=False):
+    """One pass over an IR capture: visibility, stability, pulses, bit clock and decoded bytes."""
+    from wii_transport import iter_capture
+    from wii_analytics import IRTracker
+
+    kind, frames = iter_capture(path)
+    if kind != 'ir': raise ValueError(f"not an IR capture ({kind})")
+    tracker = IRTracker(bit_duration=bit_duration, auto_clock=auto_clock)
+    pulse = tracker.pulsemon
+    visible = [0] * 4
+    hot, cold = [], []
+    sf_sum = sf_max = 0.0
+    count = 0
+    t0 = t = None
+    state, since = pulse.last_state, pulse.last_change_time
+    def on_frame(frame_t, frame):
+        nonlocal sf_sum, sf_max, count, t0, t, state, since
+        t = frame_t
+        if t0 is None: t0 = t
+        for i, p in enumerate(frame):
+            if p is not None: visible[i] += 1
+        if pulse.last_state != state and count:
+            (hot if state else cold).append((t - since) * 1000)
+        state, since = pulse.last_state, pulse.last_change_time
+        sf = tracker.stability_factor
+        sf_sum += sf
+        if sf > sf_max: sf_max = sf
+        count += 1
+    tracker.replay(frames, on_frame)
+    return {
+        'kind': os.path.basename(path).split('_')[1], 'frames': count,
+        'duration_s': round(t - t0, 3) if count else 0.0,
+        **{f'p{i}_visible': round(visible[i] / count, 3) if count else 0.0 for i in range(4)},
+        'sf_mean': round(sf_sum / count, 3) if count else 0.0, 'sf_max': round(sf_max, 3),
+        'pulses': len(hot),
+        'hot_ms_median': round(statistics.median(hot), 1) if hot else '',
+        'cold_ms_median': round(statistics.median(cold), 1) if cold else '',
+        'bit_ms': round(tracker.clock.bit_duration * 1000, 1) if tracker.clock.locked else '',
+        'decoded': tracker.decoded_count,
+        'decoded_values': ("... " if tracker.decoded_count > len(tracker.decoded) else "")
+                          + " ".join(f"{v:02X}" for ts, v in tracker.decoded),
+    }
+
+def process_capture(path, chart_path, options):
+    """Pool job: analysis (+ chart). Never raises, errors end up in the row."""
+    row = {'file': path, 'chart': '', 'error': ''}
+    try:
+        row.update(analyze_capture(path, options['bit_duration'], options['auto_clock']))
+        if chart_path:
+            import generate_ir_chart
+            os.makedirs(os.path.dirname(chart_path) or '.', exist_ok=True)
+            generate_ir_chart.generate_lod_html(path, chart_path, options['px_per_second'],
+                                                bit_duration=options['bit_duration'])
+            row['chart'] = chart_path
+    except Exception as e:
+        row['error'] = f"{type(e).__name__}: {e}"
+    return row
+
+class BatchCache:
+    """Input fingerprints and result rows, keyed by input path."""
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        try:
+            with open(path) as f: data = json.load(f)
+            if data.get('version') == VERSION: self.entries = data.get('entries', {})
+        except (OSError, ValueError): pass
+
+    def lookup(self, path, options_key):
+        """Cached row if `path` and its outputs are unchanged, else None."""
+        entry = self.entries.get(path)
+        if not entry or entry['options'] != options_key: return None
+        if entry['row'].get('chart') and not os.path.exists(entry['row']['chart']): return None
+        st = os.stat(path)
+        if st.st_size != entry['size']: return None
+        if st.st_mtime_ns != entry['mtime_ns']:
+            # Touched: only the content decides
+            if file_digest(path) != entry['sha1']: return None
+            entry['mtime_ns'] = st.st_mtime_ns
+        return entry['row']
+
+    def store(self, path, options_key, row):
+        st = os.stat(path)
+        self.entries[path] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha1': file_digest(path),
+                              'options': options_key, 'row': row}
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w') as f: json.dump({'version': VERSION, 'entries': self.entries}, f)
+        os.replace(tmp, self.path)
+
+def chart_path_for(path, root, out_dir):
+    base = root if os.path.isdir(root) else os.path.dirname(root)
+    rel = os.path.relpath(path, base)
+    return os.path.join(out_dir, os.path.splitext(rel)[0] + ".html")
+
+def run_batch(root, out_dir=None, jobs=None, charts=True, force=False, bit_duration=0.1,
+              px_per_second=None, progress=True, auto_clock=False):
+    """Processes every capture under root; returns the summary rows (input order)."""
+    out_dir = out_dir or OUTPUT_DIR
+    os.makedirs(out_dir, exist_ok=True)
+    options = {'bit_duration': bit_duration, 'px_per_second': px_per_second, 'charts': charts,
+               'auto_clock': auto_clock}
+    options_key = json.dumps(options, sort_keys=True)
+    cache = BatchCache(os.path.join(out_dir, CACHE_FILE))
+    paths = find_captures(root)
+
+    rows, todo = {}, []
+    for path in paths:
+        row = None if force else cache.lookup(path, options_key)
+        if row is None: todo.append(path)
+        else: rows[path] = row
+    if progress: print(f"{len(paths)} captures, {len(paths) - len(todo)} up to date, {len(todo)} to process")
+
+    start = time.time()
+    try:
+        if todo:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                futures = {pool.submit(process_capture, p, chart_path_for(p, root, out_dir) if charts else None,
+                                       options): p for p in todo}
+                for n, future in enumerate(as_completed(futures), 1):
+                    path = futures[future]
+                    row = rows[path] = future.result()
+                    if not row['error']: cache.store(path, options_key, row)
+                    if progress:
+                        status = row['error'] or f"{row['frames']} frames, {row['decoded']} decoded"
+                        print(f"[{n}/{len(todo)}] {path}: {status}")
+    finally:
+        cache.save()
+
+    result = [rows[p] for p in paths if p in rows]
+    with open(os.path.join(out_dir, SUMMARY_FILE), 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(result)
+    if progress and todo: print(f"Processed {len(todo)} files in {time.time() - start:.1f} s")
+    return result
+
+def print_table(rows, out=sys.stdout):
+    cols = [('file', 40), ('kind', 6), ('frames', 7), ('duration_s', 9), ('p0_visible', 6),
+            ('sf_mean', 6), ('pulses', 6), ('bit_ms', 6), ('decoded', 7), ('decoded_values', 24)]
+    out.write(" ".join(f"{name[:w]:<{w}}" for name, w in cols) + "\n")
+    for row in rows:
+        if row.get('error'):
+            out.write(f"{os.path.basename(row['file'])[:40]:<40} ERROR {row['error']}\n")
+            continue
+        cells = []
+        for name, w in cols:
+            value = os.path.basename(row['file']) if name == 'file' else row.get(name, '')
+            cells.append(f"{str(value)[:w]:<{w}}")
+        out.write(" ".join(cells) + "\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch analysis / charts for directories of Wii-Eye captures")
+    parser.add_argument("root", nargs="?", default=".", help="Directory (searched recursively) or one capture")
+    parser.add_argument("-o", "--output", help=f"Output directory (charts, summary, cache; default: {OUTPUT_DIR})")
+    parser.add_argument("-j", "--jobs", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--no-charts", action="store_true", help="Analysis only")
+    parser.add_argument("--force", action="store_true", help="Ignore the cache")
+    parser.add_argument("--bit-duration", type=float, default=0.1)
+    parser.add_argument("--auto-clock", action="store_true", help="Decode with the estimated bit clock (bit_ms)")
+    parser.add_argument("--px-per-second", type=float, help="Chart scale (default: automatic)")
+    parser.add_argument("-q", "--quiet", action="store_true")
+    args = parser.parse_args()
+
+    rows = run_batch(args.root, args.output, args.jobs, not args.no_charts, args.force,
+                     args.bit_duration, args.px_per_second, not args.quiet, args.auto_clock)
+    print_table(rows)
+    sys.exit(1 if any(r.get('error') for r in rows) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite for the IR and Board hot paths.
+
+Reproducible workloads (seeded simulator, or a replayed wiieye_raw_*.csv)
+for:
+  eye_update       WiiEyeNative.update() on pre-built evdev event batches
+  morse_feed       MorseDecoder.feed
+  stability_feed   StabilityMonitor.feed
+  board_weight     WiiboardNative.sensor_weights (raw -> kg)
+  l2cap_get_mass   Wiiboard.get_mass (8-byte sensor block)
+  l2cap_report     Wiiboard.process_report (full 0x32 report, zero-copy path)
+  l2cap_ir_report  WiimoteIR.process_report (0x33 extended IR report)
+  ir_chart         generate_ir_chart.generate_html
+
+Reports events/s, ns/event, p50/p99 latency per call and, from a separate
+tracemalloc pass (so it does not skew timing), the memory allocated per
+event: peak B/ev is the traced peak above the start of each call (temporaries
+such as a dict built per report show up here even when freed again), kept
+blk/ev the blocks still alive after the pass.
+Results go to stdout and bench_output.txt; --save stores a baseline and
+--compare flags regressions against it.
+
+usage: wii_bench.py [--quick] [--only NAME ...] [--replay FILE] [--save FILE] [--compare FILE]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+
+from wii_signal import MorseDecoder, StabilityMonitor
+from wii_calibration import CalibrationStore
+from wii_transport import SimulatorTransport, load_capture, IR_NONE
+import wii_protocol as proto
+
+BASELINE_FILE = "bench_baseline.json"
+OUTPUT_FILE = "bench_output.txt"
+BOARD_CALIB = [[800, 900, 1000, 1100], [2500, 2600, 2700, 2800], [4200, 4300, 4400, 4500]]
+
+class Result:
+    __slots__ = ('name', 'events', 'seconds', 'p50', 'p99', 'peak_bytes', 'kept_blocks')
+
+    def __init__(self, name, events, seconds, p50, p99, peak_bytes=0.0, kept_blocks=0.0):
+        self.name = name
+        self.events = events
+        self.seconds = seconds
+        self.p50 = p50 # ns per call
+        self.p99 = p99
+        self.peak_bytes = peak_bytes # per event
+        self.kept_blocks = kept_blocks
+
+    @property
+    def events_per_s(self):
+        return self.events / self.seconds if self.seconds else 0.0
+
+    @property
+    def ns_per_event(self):
+        return self.seconds * 1e9 / self.events if self.events else 0.0
+
+    def as_dict(self):
+        return {"events_per_s": self.events_per_s, "ns_per_event": self.ns_per_event,
+                "p50_ns": self.p50, "p99_ns": self.p99,
+                "peak_bytes_per_event": self.peak_bytes, "kept_blocks_per_event": self.kept_blocks}
+
+def _percentile(sorted_values, q):
+    if not sorted_values: return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+def _timer_overhead():
+    clock = time.perf_counter_ns
+    samples = []
+    for _ in range(2000):
+        t0 = clock()
+        samples.append(clock() - t0)
+    samples.sort()
+    return _percentile(samples, 0.5)
+
+def _traced_peak(calls):
+    """Sum over the calls of the traced memory peak above the start of each call."""
+    peak = 0
+    for call in calls:
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        call()
+        peak += tracemalloc.get_traced_memory()[1] - start
+    return peak
+
+def measure(name, make_calls, events_per_call, min_time=1.0, warmup=100):
+    """
+    make_calls() -> list of zero-argument callables, each processing
+    `events_per_call` events. The list is cycled until min_time has passed.
+    """
+    calls = make_calls()
+    for i in range(min(warmup, len(calls))): calls[i]()
+
+    clock = time.perf_counter_ns
+    overhead = _timer_overhead()
+    latencies = []
+    n, total, deadline = 0, 0, clock() + int(min_time * 1e9)
+    while clock() < deadline:
+        calls = make_calls()
+        for call in calls:
+            t0 = clock()
+            call()
+            dt = clock() - t0 - overhead
+            latencies.append(dt if dt > 0 else 0)
+            total += dt
+            n += 1
+    latencies.sort()
+
+    # Allocation pass on fresh state
+    calls = make_calls()
+    tracemalloc.start()
+    noop = _traced_peak([lambda: None] * 100) / 100 # The measurement's own tuple and ints
+    before = tracemalloc.take_snapshot()
+    peak = _traced_peak(calls)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(max(0, s.count_diff) for s in after.compare_to(before, 'filename'))
+    events = len(calls) * events_per_call
+    peak = max(0.0, peak - noop * len(calls))
+
+    return Result(name, n * events_per_call, total / 1e9, _percentile(latencies, 0.5),
+                  _percentile(latencies, 0.99), peak / events, blocks / events)
+
+# --- Workloads ---
+
+def ir_frames(count, replay=None, seed=1):
+    """IR frames ([p0..p3], each [x, y] or None) from a capture or the simulator."""
+    if replay:
+        kind, ts, frames = load_capture(replay)
+        if kind != 'ir': raise ValueError(f"{replay} is not an IR capture")
+        return [frames[i % len(frames)] for i in range(count)]
+    sim = SimulatorTransport('ir', rate=100.0, pattern=[0xA5, 0x3C], realtime=False,
+                             chunk=count, start_time=0.0, seed=seed)
+    return sim.read().values
+
+def board_values(count, seed=1):
+    """Raw sensor values (TR, BR, TL, BL) of a swaying 70 kg person."""
+    sim = SimulatorTransport('board', rate=100.0, realtime=False, chunk=count, start_time=0.0, seed=seed)
+    return [[int(900 + kg * 100) for kg in v] for v in sim.read().values]
+
+class _FakeInput:
+    """Stand-in for evdev.InputDevice: a readable fd and pre-built event batches."""
+    def __init__(self, fd, batches=None):
+        self.fd = fd
+        self.batches = batches or []
+        self.pos = 0
+
+    def read(self):
+        if not self.batches: return iter(())
+        batch = self.batches[self.pos % len(self.batches)]
+        self.pos += 1
+        return iter(batch)
+
+def _ir_event_batches(frames):
+    from evdev import InputEvent, ecodes
+    batches = []
+    for i, frame in enumerate(frames):
+        sec, usec = divmod(i * 10000, 1000000)
+        batch = []
+        for idx, p in enumerate(frame):
+            x, y = p if p else (IR_NONE, IR_NONE)
+            batch.append(InputEvent(sec, usec, ecodes.EV_ABS, 16 + 2 * idx, x))
+            batch.append(InputEvent(sec, usec, ecodes.EV_ABS, 17 + 2 * idx, y))
+        batch.append(InputEvent(sec, usec, ecodes.EV_SYN, ecodes.SYN_REPORT, 0))
+        batches.append(batch)
+    return batches
+
+def bench_eye_update(frames, min_time):
+    from Wii_accesories_bib import WiiEyeNative
+    pipes = [os.pipe(), os.pipe()] # Separate fds: update() keys devices by fd
+    for r, w in pipes: os.write(w, b"x") # Always readable for select()
+    batches = _ir_event_batches(frames)
+    def make():
+        # Fresh driver per pass: the tracker runs on the (repeating) frame timestamps
+        eye = WiiEyeNative()
+        eye.decoder.trace = False
+        eye.pulsemon.verbose = False
+        eye.dev_buttons = _FakeInput(pipes[0][0])
+        eye.dev_ir = _FakeInput(pipes[1][0], batches)
+        eye.button_b = eye.tracker.decoding = True
+        eye.running = True
+        return [eye.update] * len(batches)
+    try:
+        return measure("eye_update", make, len(batches[0]), min_time)
+    finally:
+        for fds in pipes:
+            for fd in fds: os.close(fd)
+
+def bench_morse_feed(frames, min_time):
+    states = [f[0] is not None for f in frames]
+    def make():
+        decoder = MorseDecoder(trace=False)
+        decoder.last_update_time = 0.0
+        return [lambda s=s, t=i * 0.01: decoder.feed(s, t) for i, s in enumerate(states)]
+    return measure("morse_feed", make, 1, min_time)
+
+def bench_stability_feed(frames, min_time):
+    points = [f[0] for f in frames]
+    def make():
+        monitor = StabilityMonitor(radius=60)
+        return [lambda p=p, t=i * 0.01: monitor.feed(p, t) for i, p in enumerate(points)]
+    return measure("stability_feed", make, 1, min_time)
+
+def bench_board_weight(raws, min_time):
+    from Wii_accesories_bib import WiiboardNative
+    with tempfile.TemporaryDirectory() as tmp:
+        board = WiiboardNative(calibration_store=CalibrationStore(os.path.join(tmp, "calib.json")))
+    board.calib = [[BOARD_CALIB[0][s], BOARD_CALIB[1][s], BOARD_CALIB[2][s]] for s in range(4)]
+    weights = board.sensor_weights
+    return measure("board_weight", lambda: [lambda raw=raw: weights(raw) for raw in raws], 1, min_time)
+
+def _l2cap_board():
+    import wiiboard
+    with tempfile.TemporaryDirectory() as tmp:
+        board = wiiboard.Wiiboard(interactive=False, calibration_store=CalibrationStore(os.path.join(tmp, "c.json")))
+    board.calibration = [list(b) for b in BOARD_CALIB]
+    board.calibrated = True
+    board.on_sample = lambda sample: None
+    return board
+
+def bench_l2cap_get_mass(raws, min_time):
+    board = _l2cap_board()
+    blocks = [proto.BOARD_SENSORS.pack(*raw) for raw in raws]
+    return measure("l2cap_get_mass", lambda: [lambda b=b: board.get_mass(b) for b in blocks], 1, min_time)
+
+def bench_l2cap_report(raws, min_time):
+    board = _l2cap_board()
+    reports = [bytes([0xA1, proto.REPORT_EXT8, 0, 0]) + proto.BOARD_SENSORS.pack(*raw) + bytes(13) for raw in raws]
+    process = board.process_report
+    return measure("l2cap_report", lambda: [lambda r=r: process(r) for r in reports], 1, min_time)
+
+def bench_l2cap_ir_report(frames, min_time):
+    from wii_remote import WiimoteIR
+    remote = WiimoteIR('extended')
+    reports = []
+    for frame in frames:
+        ir = b''
+        for p in frame:
+            if p is None: ir += b'\xff\xff\xff'
+            else: ir += bytes((p[0] & 0xFF, p[1] & 0xFF, (p[1] >> 8) << 6 | (p[0] >> 8) << 4 | 3))
+        reports.append(bytes([0xA1, proto.REPORT_IR_EXTENDED, 0, 0, 0x80, 0x80, 0x80]) + ir)
+    process = remote.process_report
+    return measure("l2cap_ir_report", lambda: [lambda r=r: process(r) for r in reports], 1, min_time)
+
+def bench_ir_chart(frames, min_time):
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "wiieye_raw_bench.csv")
+    rows = 0
+    with open(path, 'w') as f:
+        f.write("ts,code,val\n")
+        for i, frame in enumerate(frames):
+            for idx, p in enumerate(frame):
+                x, y = p if p else (IR_NONE, IR_NONE)
+                f.write(f"{i * 0.01:.3f},{16 + 2 * idx},{x}\n{i * 0.01:.3f},{17 + 2 * idx},{y}\n")
+                rows += 2
+    from generate_ir_chart import generate_html
+    def run():
+        with contextlib.redirect_stdout(open(os.devnull, 'w')) as out:
+            generate_html(path)
+        out.close()
+    try:
+        return measure("ir_chart", lambda: [run], rows, min_time, warmup=1)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+BENCHMARKS = {
+    "eye_update": ('ir', bench_eye_update),
+    "morse_feed": ('ir', bench_morse_feed),
+    "stability_feed": ('ir', bench_stability_feed),
+    "board_weight": ('board', bench_board_weight),
+    "l2cap_get_mass": ('board', bench_l2cap_get_mass),
+    "l2cap_report": ('board', bench_l2cap_report),
+    "l2cap_ir_report": ('ir', bench_l2cap_ir_report),
+    "ir_chart": ('ir', bench_ir_chart),
+}
+
+# --- Reporting ---
+
+def format_table(results, baseline=None, threshold=0.10):
+    lines = [f"{'benchmark':<16} {'events/s':>12} {'ns/event':>10} {'p50 ns':>10} {'p99 ns':>10} "
+             f"{'peak B/ev':>10} {'kept blk/ev':>11}" + ("   vs baseline" if baseline else "")]
+    regressions = []
+    for r in results:
+        line = (f"{r.name:<16} {r.events_per_s:12.0f} {r.ns_per_event:10.1f} {r.p50:10.0f} {r.p99:10.0f} "
+                f"{r.peak_bytes:10.1f} {r.kept_blocks:11.2f}")
+        base = (baseline or {}).get(r.name)
+        if base:
+            change = r.ns_per_event / base["ns_per_event"] - 1.0
+            flag = "  REGRESSION" if change > threshold else ""
+            if flag: regressions.append(r.name)
+            line += f"   {change * 100:+6.1f}%{flag}"
+        lines.append(line)
+    return "\n".join(lines), regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the IR and board hot paths")
+    parser.add_argument("--only", nargs="*", choices=sorted(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--replay", help="wiieye_raw_*.csv / status / record capture for IR workloads")
+    parser.add_argument("--events", type=int, default=5000, help="Workload size (frames / samples)")
+    parser.add_argument("--time", type=float, default=1.0, help="Minimum seconds per benchmark")
+    parser.add_argument("--quick", action="store_true", help="Short run (smoke test)")
+    parser.add_argument("--save", nargs="?", const=BASELINE_FILE, help="Store results as baseline")
+    parser.add_argument("--compare", nargs="?", const=BASELINE_FILE, help="Compare with a stored baseline")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Regression threshold (ns/event)")
+    args = parser.parse_args()
+
+    if args.quick: args.events, args.time = 500, 0.1
+    logging.getLogger("wii_accessories").setLevel(logging.WARNING) # No DECODED spam
+
+    workloads = {'ir': ir_frames(args.events, args.replay), 'board': board_values(args.events)}
+    results, failed = [], []
+    for name in args.only or BENCHMARKS:
+        kind, bench = BENCHMARKS[name]
+        try:
+            results.append(bench(workloads[kind], args.time))
+        except ImportError as e:
+            print(f"{name}: skipped ({e})")
+        except Exception as e: # One broken workload must not cost the whole table
+            failed.append(name)
+            print(f"{name}: FAILED ({type(e).__name__}: {e})")
+
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.compare) as f: baseline = json.load(f)["results"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Baseline {args.compare} unreadable: {e}")
+
+    table, regressions = format_table(results, baseline, args.threshold)
+    header = (f"# {time.strftime('%Y-%m-%d %H:%M:%S')} Python {platform.python_version()} "
+              f"{platform.machine()} events={args.events} replay={args.replay or '-'}")
+    print(header)
+    print(table)
+    with open(OUTPUT_FILE, 'w') as f:
+        f.write(header + "\n" + table + "\n")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                       "events": args.events, "results": {r.name: r.as_dict() for r in results}}, f, indent=1)
+        print(f"Baseline saved: {args.save}")
+    if failed: print(f"Failed: {', '.join(failed)}")
+    if regressions:
+        print(f"Regressions (> {args.threshold * 100:.0f}%): {', '.join(regressions)}")
+    if failed or regressions: sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Local Publish/Subscribe Broker for Wii device streams.
+
+One broker process owns the hid-wiimote evdev nodes and publishes every
+event batch into a per-node multiprocessing.shared_memory segment. A node
+is open only while its channel has subscribers (an open IR or accelerometer
+node keeps the remote streaming, see Wii_accesories_bib on_demand):
+
+  [EventRing: write / reserved sequence + event records][state: 64 ABS values, key bitmap]
+
+The state block is the latest absolute value of every axis and key, so a
+subscriber that falls behind the ring resyncs from it (no device access).
+
+Subscribers (game, logger, dashboard, ...) attach over a Unix SEQPACKET
+socket: "LIST" returns the JSON directory of channels, "SUB <channel>"
+turns the connection into a wakeup fd (one byte per published batch).
+N consumers cost one device read. Requests are read when the socket becomes
+readable, so a silent client never stalls publishing; it is dropped after
+REQUEST_TIMEOUT.
+
+BrokerEye / BrokerBoard have the WiiEyeNative / WiiboardNative API and
+read through the broker instead of opening the nodes. Rumble stays with
+the device owner and is not available to subscribers.
+
+usage: wii_broker.py [--socket PATH]          run the broker
+       wii_broker.py --list | --demo eye|board  subscriber side
+"""
+
+import os
+import json
+import time
+import socket
+import struct
+import logging
+import argparse
+import selectors
+
+import evdev
+from evdev import ecodes
+
+from Wii_accesories_bib import WiiEyeNative, WiiboardNative
+from wii_acquire import EventRing, RingCursor, DEFAULT_CAPACITY
+
+logger = logging.getLogger("wii_accessories")
+
+SHM_PREFIX = "wiibroker"
+STATE_ABS = struct.Struct('<64i') # Latest ABS value per code 0..63
+KEY_BYTES = 96                     # Key bitmap, codes 0..767
+STATE_SIZE = STATE_ABS.size + KEY_BYTES
+RESCAN_INTERVAL = 2.0             # s between scans for new devices
+REQUEST_TIMEOUT = 1.0             # s a new connection has to send its request
+
+def default_socket_path():
+    runtime = os.environ.get("XDG_RUNTIME_DIR") or "/tmp"
+    return os.path.join(runtime, "wiibroker.sock")
+
+def _channel_layout(capacity):
+    ring_size = EventRing.size_for(capacity)
+    return ring_size, ring_size + STATE_SIZE
+
+# --- Broker side ---
+
+class _Channel:
+    """One published evdev node; the node itself is open only while subscribed (open())."""
+    def __init__(self, device, capacity):
+        from multiprocessing import shared_memory
+        self.device = device
+        self.path = device.path
+        self.name = os.path.basename(device.path)
+        self.device_info = {"name": device.name, "path": device.path, "phys": device.phys, "uniq": device.uniq}
+        self.capacity = capacity
+        ring_size, total = _channel_layout(capacity)
+        self.shm = shared_memory.SharedMemory(name=f"{SHM_PREFIX}_{self.name}_{os.getpid()}", create=True, size=total)
+        self.ring = EventRing(self.shm.buf[:ring_size], capacity)
+        self.state = self.shm.buf[ring_size:]
+        self.abs = [0] * 64
+        self.keys = bytearray(KEY_BYTES)
+        self.subscribers = []
+        self.dropped = [] # Subscribers whose wakeup failed, removed by the broker
+        self._init_state()
+
+    def open(self):
+        """Opens the node for the first subscriber; the state block is re-read from it."""
+        if self.device is None:
+            self.device = evdev.InputDevice(self.path)
+            self._init_state()
+        return self.device
+
+    def close_device(self):
+        if self.device is not None:
+            self.device.close()
+            self.device = None
+
+    def _init_state(self):
+        caps = self.device.capabilities()
+        for code, info in caps.get(ecodes.EV_ABS, []):
+            if code < 64: self.abs[code] = info.value
+        self.keys[:] = bytes(KEY_BYTES)
+        try:
+            for key in self.device.active_keys():
+                if key < KEY_BYTES * 8: self.keys[key >> 3] |= 1 << (key & 7)
+        except OSError: pass
+        self._write_state()
+
+    def _write_state(self):
+        STATE_ABS.pack_into(self.state, 0, *self.abs)
+        self.state[STATE_ABS.size:] = self.keys
+
+    def info(self):
+        return {"channel": self.name, "shm": self.shm.name, "capacity": self.capacity, **self.device_info}
+
+    def pump(self):
+        """Device -> ring. False when the device is gone."""
+        batch = []
+        try:
+            for event in self.device.read():
+                batch.append((event.sec, event.usec, event.type, event.code, event.value))
+                if event.type == ecodes.EV_ABS and event.code < 64:
+                    self.abs[event.code] = event.value
+                elif event.type == ecodes.EV_KEY and event.code < KEY_BYTES * 8:
+                    if event.value: self.keys[event.code >> 3] |= 1 << (event.code & 7)
+                    else: self.keys[event.code >> 3] &= ~(1 << (event.code & 7)) & 0xFF
+        except BlockingIOError: pass
+        except OSError as e:
+            logger.warning(f"Broker: {self.path} lost: {e}")
+            return False
+        if batch:
+            self._write_state()
+            self.ring.publish(batch)
+            for sub in list(self.subscribers):
+                try: sub.send(b'\x01')
+                except BlockingIOError: pass # Wakeup already pending
+                except OSError: self.dropped.append(sub)
+        return True
+
+    def close(self):
+        for sub in self.subscribers: sub.close()
+        self.subscribers = []
+        self.close_device()
+        self.ring.buf.release() # shm.close() fails while views exist
+        self.state.release()
+        self.ring = self.state = None
+        self.shm.close()
+        self.shm.unlink()
+
+def _is_wii_device(dev):
+    return "Nintendo Wii Remote" in dev.name
+
+class WiiBroker:
+    def __init__(self, socket_path=None, capacity=DEFAULT_CAPACITY):
+        self.socket_path = socket_path or default_socket_path()
+        self.capacity = capacity
+        self.channels = {}
+        self.pending = {} # New connection -> deadline for its request
+        self.selector = selectors.DefaultSelector()
+        self.running = False
+        self._last_scan = 0.0
+        if os.path.exists(self.socket_path): os.unlink(self.socket_path) # Stale socket
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.server.bind(self.socket_path)
+        self.server.listen(16)
+        self.server.setblocking(False)
+        self.selector.register(self.server, selectors.EVENT_READ, ('accept', None))
+
+    def scan(self):
+        """Publishes every hid-wiimote node not published yet, drops the ones that are gone."""
+        paths = evdev.list_devices()
+        for channel in [c for c in self.channels.values() if c.path not in paths]:
+            logger.info(f"Broker: {channel.path} gone")
+            self._remove(channel)
+        known = {c.path for c in self.channels.values()}
+        for path in paths:
+            if path in known: continue
+            try: dev = evdev.InputDevice(path)
+            except OSError: continue
+            if not _is_wii_device(dev):
+                dev.close()
+                continue
+            channel = _Channel(dev, self.capacity)
+            channel.close_device() # Until the first subscriber
+            self.channels[channel.name] = channel
+            logger.info(f"Broker: publishing {dev.name} ({channel.name})")
+        self._last_scan = time.monotonic()
+
+    def _remove(self, channel):
+        if channel.device is not None: self.selector.unregister(channel.device.fd)
+        for sub in channel.subscribers: self.selector.unregister(sub)
+        del self.channels[channel.name]
+        channel.close()
+
+    def _subscribe(self, channel, conn):
+        if channel.device is None:
+            try: dev = channel.open()
+            except OSError as e:
+                logger.warning(f"Broker: {channel.path} lost: {e}")
+                self._remove(channel)
+                return False
+            self.selector.register(dev.fd, selectors.EVENT_READ, ('device', channel))
+        channel.subscribers.append(conn)
+        self.selector.register(conn, selectors.EVENT_READ, ('subscriber', channel))
+        return True
+
+    def _unsubscribe(self, channel, conn):
+        if conn in channel.subscribers:
+            channel.subscribers.remove(conn)
+            self.selector.unregister(conn)
+        conn.close()
+        if not channel.subscribers and channel.device is not None:
+            self.selector.unregister(channel.device.fd)
+            channel.close_device() # Last subscriber gone: the node stops streaming
+
+    def _accept(self):
+        try: conn, _ = self.server.accept()
+        except BlockingIOError: return
+        conn.setblocking(False)
+        self.pending[conn] = time.monotonic() + REQUEST_TIMEOUT
+        self.selector.register(conn, selectors.EVENT_READ, ('request', None))
+
+    def _drop_pending(self, conn):
+        del self.pending[conn]
+        self.selector.unregister(conn)
+
+    def _request(self, conn):
+        self._drop_pending(conn)
+        try:
+            request = conn.recv(256).decode(errors='replace').strip()
+            if request == "LIST":
+                conn.send(json.dumps([c.info() for c in self.channels.values()]).encode())
+            elif request.startswith("SUB ") and request[4:] in self.channels:
+                if self._subscribe(self.channels[request[4:]], conn):
+                    conn.send(b"OK")
+                    return
+            conn.send(b"ERR")
+        except OSError: pass
+        conn.close()
+
+    def poll(self, timeout=0.1):
+        for key, mask in self.selector.select(timeout):
+            kind, channel = key.data
+            if kind == 'accept':
+                self._accept()
+            elif kind == 'request':
+                if key.fileobj in self.pending: self._request(key.fileobj)
+            elif kind == 'device':
+                if channel.name not in self.channels: continue # Removed earlier in this round
+                if not channel.pump(): self._remove(channel)
+                else:
+                    while channel.dropped: self._unsubscribe(channel, channel.dropped.pop())
+            elif kind == 'subscriber':
+                # Subscribers never send after SUB: readable means closed
+                if key.fileobj in channel.subscribers: self._unsubscribe(channel, key.fileobj)
+        now = time.monotonic()
+        for conn in [c for c, deadline in self.pending.items() if now > deadline]:
+            self._drop_pending(conn) # Connected but never asked for anything
+            conn.close()
+        if now - self._last_scan > RESCAN_INTERVAL: self.scan()
+
+    def run(self):
+        self.running = True
+        self.scan()
+        while self.running: self.poll()
+
+    def close(self):
+        self.running = False
+        for channel in list(self.channels.values()): self._remove(channel)
+        for conn in list(self.pending):
+            self._drop_pending(conn)
+            conn.close()
+        self.selector.close()
+        self.server.close()
+        if os.path.exists(self.socket_path): os.unlink(self.socket_path)
+
+# --- Subscriber side ---
+
+def _request(socket_path, message):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    sock.connect(socket_path)
+    sock.send(message.encode())
+    return sock
+
+def list_channels(socket_path=None):
+    """Directory of published nodes: [{'channel', 'name', 'path', 'phys', 'uniq', ...}]."""
+    sock = _request(socket_path or default_socket_path(), "LIST")
+    try: return json.loads(sock.recv(1 << 16).decode())
+    finally: sock.close()
+
+class BrokerChannel:
+    """
+    evdev.InputDevice look-alike for a published node: fd wakes up on new
+    batches, read() yields InputEvents from the shared ring, absinfo() and
+    active_keys() answer from the published state block.
+    """
+    def __init__(self, info, socket_path=None):
+        from multiprocessing import shared_memory
+        self.info = info
+        self.name, self.path, self.phys, self.uniq = info["name"], info["path"], info["phys"], info["uniq"]
+        self.sock = _request(socket_path or default_socket_path(), f"SUB {info['channel']}")
+        if self.sock.recv(16) != b"OK":
+            self.sock.close()
+            raise OSError(f"Broker refused channel {info['channel']}")
+        self.sock.setblocking(False)
+        self.fd = self.sock.fileno()
+        self.shm = shared_memory.SharedMemory(name=info["shm"])
+        if not info["shm"].endswith(f"_{os.getpid()}"): # Not our own broker (name ends in its pid)
+            # Attaching must not make this process the segment's owner
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        ring_size, _ = _channel_layout(info["capacity"])
+        self.ring = EventRing(self.shm.buf[:ring_size], info["capacity"])
+        self.state = self.shm.buf[ring_size:]
+        self.cursor = RingCursor(self.ring)
+
+    def read(self):
+        try:
+            while True:
+                if not self.sock.recv(4096): raise OSError(f"Broker closed {self.info['channel']}")
+        except BlockingIOError: pass
+        records, lost = self.cursor.read()
+        if not records and not lost: raise BlockingIOError
+        return self._events(records, lost)
+
+    @staticmethod
+    def _events(records, lost):
+        if lost:
+            now = time.time()
+            yield evdev.InputEvent(int(now), int(now % 1 * 1e6), ecodes.EV_SYN, ecodes.SYN_DROPPED, 0)
+        for sec, usec, etype, code, value in records:
+            yield evdev.InputEvent(sec, usec, etype, code, value)
+
+    def absinfo(self, code):
+        value = STATE_ABS.unpack_from(self.state, 0)[code]
+        return evdev.AbsInfo(value=value, min=0, max=0, fuzz=0, flat=0, resolution=0)
+
+    def active_keys(self):
+        keys = bytes(self.state[STATE_ABS.size:STATE_SIZE])
+        return [i for i in range(KEY_BYTES * 8) if keys[i >> 3] & (1 << (i & 7))]
+
+    def upload_effect(self, effect):
+        raise OSError("force feedback belongs to the broker")
+
+    def write(self, etype, code, value):
+        raise OSError("output belongs to the broker")
+
+    def close(self):
+        self.sock.close()
+        if self.shm is not None:
+            self.ring.buf.release()
+            self.state.release()
+            self.ring = self.state = self.cursor = None
+            self.shm.close()
+            self.shm = None
+
+class _ChannelRef:
+    """A channel not subscribed yet (IR / accelerometer until a stream needs it, see BrokerEye._reopen)."""
+    def __init__(self, info):
+        self.info = info
+        self.name, self.path, self.phys, self.uniq = info["name"], info["path"], info["phys"], info["uniq"]
+
+    def close(self):
+        pass
+
+class BrokerEye(WiiEyeNative):
+    """WiiEyeNative reading the Wiimote published by a WiiBroker."""
+    def __init__(self, *args, socket_path=None, **kwargs):
+        self.socket_path = socket_path
+        super().__init__(*args, **kwargs)
+
+    def _open_devices(self):
+        channels = []
+        for info in list_channels(self.socket_path):
+            if "Balance Board" in info["name"]: continue
+            if "IR" in info["name"] or "Accelerometer" in info["name"]:
+                channels.append(_ChannelRef(info)) # Subscribing would turn the broker's node on
+            else:
+                channels.append(BrokerChannel(info, self.socket_path))
+        return channels
+
+    def _reopen(self, node):
+        return BrokerChannel(node.info, self.socket_path)
+
+class BrokerBoard(WiiboardNative):
+    """WiiboardNative reading Balance Boards published by a WiiBroker."""
+    def __init__(self, *args, socket_path=None, **kwargs):
+        self.socket_path = socket_path
+        super().__init__(*args, **kwargs)
+
+    def _board_paths(self):
+        return [info for info in list_channels(self.socket_path) if "Balance Board" in info["name"]]
+
+    def _open_board(self, info):
+        return BrokerChannel(info, self.socket_path)
+
+def main():
+    from wiinux import setup_logging
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Shared-memory broker for Wii device streams")
+    parser.add_argument("--socket", default=None, help=f"Control socket (default {default_socket_path()})")
+    parser.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY, help="Ring size per node (events)")
+    parser.add_argument("--list", action="store_true", help="List published channels")
+    parser.add_argument("--demo", choices=["eye", "board"], help="Run a subscriber")
+    args = parser.parse_args()
+
+    if args.list:
+        for info in list_channels(args.socket):
+            print(f"{info['channel']:10s} {info['name']:40s} {info['uniq'] or info['phys']}")
+    elif args.demo == "board":
+        board = BrokerBoard(socket_path=args.socket)
+        if not board.connect(): return print("No board published.")
+        try:
+            while True: board.update(); print(f"\rWeight: {board.weight:6.2f} kg", end=""); time.sleep(0.01)
+        except KeyboardInterrupt: pass
+        finally: board.close()
+    elif args.demo == "eye":
+        eye = BrokerEye(socket_path=args.socket)
+        if not eye.connect(): return print("No Wiimote published.")
+        try:
+            while True:
+                eye.update()
+                p0 = eye.points[0]
+                print(f"\rP0: {p0 if p0 else '----':12} SF:{eye.stability.stability_factor:.2f}   ", end="")
+                time.sleep(0.01)
+        except KeyboardInterrupt: pass
+        finally: eye.close()
+    else:
+        broker = WiiBroker(args.socket, args.capacity)
+        print(f"Broker on {broker.socket_path}. CTRL+C to quit.")
+        try: broker.run()
+        except KeyboardInterrupt: pass
+        finally: broker.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Persistent Balance Board Calibration Cache.
+
+Maps each board (Bluetooth MAC, or evdev phys/uniq as fallback) to its
+factory calibration blocks (0 kg / 17 kg / 34 kg, four sensors each) and a
+short tare history. Stored as JSON next to ~/.wiiboard_config so that a
+reconnecting board can start streaming without a sysfs lookup or an L2CAP
+register read.
+
+File format (version 1):
+{
+  "version": 1,
+  "boards": {
+    "00:22:4c:aa:bb:cc": {
+      "calib": [[TR, BR, TL, BL], [..17kg..], [..34kg..]],
+      "crc": 123456789,
+      "source": "sysfs",
+      "updated": 1770524455.0,
+      "tare": [[ts, offset_kg, [tr, br, tl, bl]], ...]
+    }
+  }
+}
+"""
+
+import os
+import json
+import time
+import zlib
+import glob
+import logging
+
+logger = logging.getLogger("wii_accessories")
+
+CALIB_FILE = os.path.expanduser("~/.wiiboard_calib.json")
+CACHE_VERSION = 1
+MAX_TARE_HISTORY = 20
+SYSFS_BBOARD_CALIB = "/sys/bus/hid/drivers/wiimote/*/bboard_calib"
+
+def normalize_key(key):
+    return key.strip().lower() if key else None
+
+def calibration_crc(blocks):
+    return zlib.crc32(",".join(str(int(v)) for block in blocks for v in block).encode())
+
+def valid_calibration(blocks):
+    """Cheap sanity check: 3 blocks x 4 sensors, 16-bit, strictly increasing per sensor."""
+    try:
+        if len(blocks) != 3 or any(len(b) != 4 for b in blocks): return False
+        for s in range(4):
+            c0, c17, c34 = blocks[0][s], blocks[1][s], blocks[2][s]
+            if not (0 <= c0 < c17 < c34 <= 0xFFFF): return False
+        return True
+    except (TypeError, IndexError):
+        return False
+
+def parse_sysfs_calibration(text):
+    """'hhhh:hhhh:...' (12 hex words, block-major) -> [[4 x 0kg], [4 x 17kg], [4 x 34kg]]."""
+    vals = [int(p, 16) for p in text.strip().split(':')]
+    return [vals[0:4], vals[4:8], vals[8:12]]
+
+def read_sysfs_calibration(path):
+    with open(path, 'r') as f:
+        return parse_sysfs_calibration(f.read())
+
+def _hid_dir_for_event(event_path):
+    """/dev/input/eventN -> HID device directory of the wiimote driver (or None)."""
+    sys_path = f"/sys/class/input/{os.path.basename(event_path)}/device"
+    if not os.path.exists(sys_path): return None
+    current = os.path.realpath(sys_path)
+    for _ in range(6):
+        if os.path.exists(os.path.join(current, "bboard_calib")): return current
+        current = os.path.dirname(current)
+    return None
+
+def _hid_uniq(hid_dir):
+    try:
+        with open(os.path.join(hid_dir, "uevent")) as f:
+            for line in f:
+                if line.startswith("HID_UNIQ="): return line.split("=", 1)[1].strip() or None
+    except OSError:
+        pass
+    return None
+
+def evdev_board_key(device):
+    """
+    Cheap board key from the evdev node itself, no sysfs access:
+    uniq (board MAC), else phys (virtual boards, see wii_virtual).
+    """
+    return normalize_key(getattr(device, "uniq", None)) or normalize_key(getattr(device, "phys", None))
+
+def evdev_board_sysfs(device):
+    """
+    (key, calibration path) of an evdev Balance Board via sysfs.
+    Key is HID_UNIQ (board MAC), else evdev phys.
+    """
+    hid_dir = _hid_dir_for_event(device.path)
+    calib_path = os.path.join(hid_dir, "bboard_calib") if hid_dir else None
+    key = normalize_key(_hid_uniq(hid_dir)) if hid_dir else None
+    if not key: key = normalize_key(getattr(device, "phys", None))
+    if calib_path is None:
+        # Unknown sysfs layout: only safe when exactly one board is connected
+        paths = glob.glob(SYSFS_BBOARD_CALIB)
+        if len(paths) == 1: calib_path = paths[0]
+    return key, calib_path
+
+class CalibrationStore:
+    """JSON-backed calibration and tare cache keyed by board address."""
+    def __init__(self, path=CALIB_FILE):
+        self.path = path
+        self.boards = {}
+        self._loaded = False
+
+    def load(self):
+        self._loaded = True
+        if not os.path.exists(self.path): return self
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION:
+                self.boards = data.get("boards", {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"Calibration cache unreadable, ignoring ({e})")
+            self.boards = {}
+        return self
+
+    def save(self):
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                json.dump({"version": CACHE_VERSION, "boards": self.boards}, f)
+            os.replace(tmp, self.path) # Atomic: never leaves a half-written cache
+        except OSError as e:
+            logger.warning(f"Could not save calibration cache: {e}")
+
+    def _entry(self, key):
+        if not self._loaded: self.load()
+        return self.boards.get(normalize_key(key))
+
+    def get(self, key):
+        """Calibration blocks for the board, or None if missing or failing validation."""
+        entry = self._entry(key)
+        if not entry or "calib" not in entry: return None
+        calib = entry["calib"]
+        # Shape first: calibration_crc() assumes integer blocks
+        if not valid_calibration(calib) or entry.get("crc") != calibration_crc(calib):
+            logger.warning(f"Cached calibration for {key} is invalid, dropping it")
+            for field in ("calib", "crc"): entry.pop(field, None)
+            return None
+        return [list(b) for b in calib]
+
+    def put(self, key, blocks, source="unknown"):
+        if not key or not valid_calibration(blocks): return False
+        if not self._loaded: self.load()
+        blocks = [[int(v) for v in b] for b in blocks]
+        entry = self.boards.setdefault(normalize_key(key), {"tare": []})
+        if entry.get("calib") == blocks: return True # Unchanged, skip the write
+        entry.update(calib=blocks, crc=calibration_crc(blocks), source=source, updated=time.time())
+        self.save()
+        return True
+
+    def add_tare(self, key, offset, sensors=None):
+        if not key: return
+        if not self._loaded: self.load()
+        history = self.boards.setdefault(normalize_key(key), {}).setdefault("tare", [])
+        history.append([time.time(), float(offset), [float(s) for s in sensors] if sensors else None])
+        del history[:-MAX_TARE_HISTORY]
+        self.save()
+
+    def last_tare(self, key):
+        """(offset_kg, per-sensor offsets or None) of the latest tare, or None."""
+        entry = self._entry(key)
+        if not entry or not entry.get("tare"): return None
+        ts, offset, sensors = entry["tare"][-1]
+        return offset, sensors
+
+    def tare_history(self, key):
+        entry = self._entry(key)
+        return list(entry.get("tare", [])) if entry else []
+
+_default_store = None
+
+def default_store():
+    """Process-wide store for CALIB_FILE (loaded lazily on first use)."""
+    global _default_store
+    if _default_store is None: _default_store = CalibrationStore()
+    return _default_store
@@ -0,0 +1,369 @@
+"""
+Seekable Capture Container (.wcap) and SQLite Catalog.
+
+Container layout (little endian):
+  header   'WCAP', version, kind (0 board / 1 ir), device id
+  blocks   'WBLK' header (codec, record count, payload size, first/last ts)
+           + up to `block_records` fixed-size records
+  footer   sparse index: (offset, first ts, last ts, count) per block,
+           then the trailer (index offset, block count, 'WIDX')
+
+Records: board '<d4f' (ts, TR, BR, TL, BL kg), ir '<d8H' (ts, p0x, p0y, ..,
+0xFFFF = no point). Samples must be written in timestamp order; read(t0, t1)
+bisects the index and decodes only the blocks overlapping [t0, t1]. A file
+without footer (writer killed) is still readable: the index is rebuilt by
+walking the block headers.
+
+Catalog: one SQLite row per capture (device, kind, start, end, samples,
+blocks), so Catalog.read(device, t0, t1) opens only the captures - and in
+them only the blocks - that overlap the range.
+
+    python wii_capture.py convert wiieye_record_*.csv --device 00:1F:32:AA:BB:CC -o captures/
+    python wii_capture.py record sim-board captures/board.wcap --seconds 60
+    python wii_capture.py index captures/
+    python wii_capture.py query 00:1F:32:AA:BB:CC "2026-02-08 14:03" "2026-02-08 14:04"
+"""
+
+import os
+import time
+import bisect
+import struct
+import sqlite3
+import argparse
+import datetime
+import collections
+
+MAGIC = b'WCAP'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sBBH')      # magic, version, kind, device id length
+BLOCK_HEADER = struct.Struct('<4sBxHIdd')  # 'WBLK', codec, count, payload size, first ts, last ts
+INDEX_ENTRY = struct.Struct('<QddI')       # block offset, first ts, last ts, count
+TRAILER = struct.Struct('<QI4s')           # index offset, block count, 'WIDX'
+KINDS = ('board', 'ir')
+RECORDS = {'board': struct.Struct('<d4f'), 'ir': struct.Struct('<d8H')}
+CODEC_RAW = 0
+IR_ABSENT = 0xFFFF
+DEFAULT_BLOCK_RECORDS = 1024
+DEFAULT_CATALOG = "wii_catalog.sqlite"
+
+BlockInfo = collections.namedtuple("BlockInfo", "offset t_first t_last count")
+
+def _pack_values(kind, values):
+    if kind == 'board': return values
+    flat = []
+    for p in values:
+        flat += (p[0], p[1]) if p is not None else (IR_ABSENT, IR_ABSENT)
+    return flat
+
+def _unpack_values(kind, fields):
+    if kind == 'board': return list(fields)
+    return [None if fields[i] == IR_ABSENT else [fields[i], fields[i + 1]] for i in range(0, 8, 2)]
+
+class CaptureWriter:
+    """Appends samples of one device; close() writes the index footer."""
+    def __init__(self, path, kind, device, block_records=DEFAULT_BLOCK_RECORDS):
+        if kind not in KINDS: raise ValueError(f"Unknown kind: {kind}")
+        self.path = path
+        self.kind = kind
+        self.device = device
+        self.block_records = block_records
+        self.record = RECORDS[kind]
+        self.index = []
+        self.count = 0
+        self.last_ts = None
+        self._ts = []
+        self._payload = bytearray()
+        name = device.encode()
+        self.f = open(path, 'wb')
+        self.f.write(FILE_HEADER.pack(MAGIC, VERSION, KINDS.index(kind), len(name)) + name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, ts, values):
+        if self.last_ts is not None and ts < self.last_ts:
+            raise ValueError(f"Timestamps must not decrease ({ts} < {self.last_ts})")
+        self.last_ts = ts
+        self._payload += self.record.pack(ts, *_pack_values(self.kind, values))
+        self._ts.append(ts)
+        if len(self._ts) >= self.block_records: self.flush()
+
+    def write_batch(self, batch):
+        """Appends a wii_transport.SampleBatch."""
+        for t, v in zip(batch.ts, batch.values): self.append(t, v)
+
+    def flush(self):
+        """Writes the pending samples as one block."""
+        if not self._ts: return
+        offset = self.f.tell()
+        n, t_first, t_last = len(self._ts), self._ts[0], self._ts[-1]
+        self.f.write(BLOCK_HEADER.pack(b'WBLK', CODEC_RAW, n, len(self._payload), t_first, t_last))
+        self.f.write(self._payload)
+        self.f.flush()
+        self.index.append(BlockInfo(offset, t_first, t_last, n))
+        self.count += n
+        self._ts, self._payload = [], bytearray()
+
+    def close(self):
+        if self.f is None: return
+        self.flush()
+        index_offset = self.f.tell()
+        for entry in self.index: self.f.write(INDEX_ENTRY.pack(*entry))
+        self.f.write(TRAILER.pack(index_offset, len(self.index), b'WIDX'))
+        self.f.close()
+        self.f = None
+
+class CaptureReader:
+    def __init__(self, path):
+        self.path = path
+        self.f = open(path, 'rb')
+        magic, version, kind, name_len = FILE_HEADER.unpack(self.f.read(FILE_HEADER.size))
+        if magic != MAGIC: raise ValueError(f"Not a capture container: {path}")
+        if version > VERSION: raise ValueError(f"Unsupported container version {version}: {path}")
+        self.kind = KINDS[kind]
+        self.device = self.f.read(name_len).decode()
+        self.data_start = FILE_HEADER.size + name_len
+        self.record = RECORDS[self.kind]
+        self.recovered = False # True: no footer, index rebuilt from the blocks
+        self.blocks = self._read_index()
+        if self.blocks is None:
+            self.recovered = True
+            self.blocks = self._scan_blocks()
+        self._last = [b.t_last for b in self.blocks]
+        self.blocks_read = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.f.close()
+
+    @property
+    def count(self):
+        return sum(b.count for b in self.blocks)
+
+    @property
+    def start(self):
+        return self.blocks[0].t_first if self.blocks else None
+
+    @property
+    def end(self):
+        return self.blocks[-1].t_last if self.blocks else None
+
+    def _read_index(self):
+        size = os.fstat(self.f.fileno()).st_size
+        if size < self.data_start + TRAILER.size: return None
+        self.f.seek(size - TRAILER.size)
+        index_offset, n, magic = TRAILER.unpack(self.f.read(TRAILER.size))
+        if magic != b'WIDX' or index_offset + n * INDEX_ENTRY.size + TRAILER.size != size: return None
+        self.f.seek(index_offset)
+        data = self.f.read(n * INDEX_ENTRY.size)
+        return [BlockInfo(*INDEX_ENTRY.unpack_from(data, i * INDEX_ENTRY.size)) for i in range(n)]
+
+    def _scan_blocks(self):
+        blocks = []
+        size = os.fstat(self.f.fileno()).st_size
+        offset = self.data_start
+        while offset + BLOCK_HEADER.size <= size:
+            self.f.seek(offset)
+            magic, codec, n, length, t_first, t_last = BLOCK_HEADER.unpack(self.f.read(BLOCK_HEADER.size))
+            end = offset + BLOCK_HEADER.size + length
+            if magic != b'WBLK' or end > size: break # Footer or a block cut short
+            blocks.append(BlockInfo(offset, t_first, t_last, n))
+            offset = end
+        return blocks
+
+    def read_block(self, i):
+        """Decoded samples [(ts, values), ...] of block i."""
+        self.f.seek(self.blocks[i].offset)
+        magic, codec, n, length, t_first, t_last = BLOCK_HEADER.unpack(self.f.read(BLOCK_HEADER.size))
+        if codec != CODEC_RAW: raise ValueError(f"Unknown block codec {codec}: {self.path}")
+        payload = self.f.read(length)
+        self.blocks_read += 1
+        kind = self.kind
+        return [(r[0], _unpack_values(kind, r[1:])) for r in self.record.iter_unpack(payload)]
+
+    def read(self, t0=None, t1=None):
+        """Samples with t0 <= ts <= t1 (None: open end), reading only overlapping blocks."""
+        i = 0 if t0 is None else bisect.bisect_left(self._last, t0)
+        while i < len(self.blocks):
+            if t1 is not None and self.blocks[i].t_first > t1: break
+            for t, values in self.read_block(i):
+                if t0 is not None and t < t0: continue
+                if t1 is not None and t > t1: return
+                yield t, values
+            i += 1
+
+def convert_csv(csv_path, out_path=None, device=None, block_records=DEFAULT_BLOCK_RECORDS):
+    """
+    CSV capture (any format iter_capture reads) -> container. Returns the output
+    path. `device` is required: the CSV does not record which device it came
+    from, and the catalog keys captures by device.
+    """
+    if not device: raise ValueError(f"{csv_path}: device id required")
+    from wii_transport import iter_capture
+    kind, rows = iter_capture(csv_path)
+    out_path = out_path or os.path.splitext(csv_path)[0] + ".wcap"
+    with CaptureWriter(out_path, kind, device, block_records) as writer:
+        for t, values in rows: writer.append(t, values)
+    return out_path
+
+def record_transport(transport, path, seconds, block_records=DEFAULT_BLOCK_RECORDS):
+    """Records a (wii_transport) transport into a container for `seconds`."""
+    with transport:
+        writer = None
+        start = time.time()
+        try:
+            while time.time() - start < seconds:
+                batch = transport.read()
+                if batch and batch.ts:
+                    if writer is None:
+                        writer = CaptureWriter(path, batch.kind, batch.device, block_records)
+                    writer.write_batch(batch)
+                elif getattr(transport, 'finished', False): break
+                else: time.sleep(0.01)
+        finally:
+            if writer: writer.close()
+    return writer.count if writer else 0
+
+class Catalog:
+    """SQLite index of containers: device, kind, time range and counts per file."""
+    def __init__(self, db_path=DEFAULT_CATALOG):
+        self.db = sqlite3.connect(db_path)
+        self.db.execute("""CREATE TABLE IF NOT EXISTS captures (
+            path TEXT PRIMARY KEY, device TEXT, kind TEXT, start REAL, end REAL,
+            samples INTEGER, blocks INTEGER, size INTEGER, mtime_ns INTEGER)""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS captures_device_time ON captures (device, start, end)")
+
+    def close(self):
+        self.db.close()
+
+    def add(self, path):
+        """Indexes one container; returns False if it was already up to date."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        row = self.db.execute("SELECT size, mtime_ns FROM captures WHERE path = ?", (path,)).fetchone()
+        if row == (st.st_size, st.st_mtime_ns): return False
+        with CaptureReader(path) as reader:
+            values = (path, reader.device, reader.kind, reader.start, reader.end, reader.count,
+                      len(reader.blocks), st.st_size, st.st_mtime_ns)
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO captures VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", values)
+        return True
+
+    def scan(self, root):
+        """Indexes every .wcap under root, drops entries of deleted files. Returns (added, removed)."""
+        root = os.path.abspath(root)
+        seen, added = set(), 0
+        for dirpath, dirnames, filenames in os.walk(root):
+            for name in filenames:
+                if not name.endswith(".wcap"): continue
+                path = os.path.join(dirpath, name)
+                seen.add(path)
+                try: added += self.add(path)
+                except (OSError, ValueError, struct.error) as e: print(f"Skipping {path}: {e}")
+        stale = [p for (p,) in self.db.execute("SELECT path FROM captures WHERE path LIKE ?", (root + os.sep + '%',))
+                 if p not in seen]
+        with self.db:
+            self.db.executemany("DELETE FROM captures WHERE path = ?", [(p,) for p in stale])
+        return added, len(stale)
+
+    def devices(self):
+        """[(device, kind, captures, first ts, last ts, samples)]"""
+        return self.db.execute("""SELECT device, kind, COUNT(*), MIN(start), MAX(end), SUM(samples)
+                                  FROM captures GROUP BY device, kind ORDER BY device""").fetchall()
+
+    def captures(self, device=None, t0=None, t1=None):
+        """[(path, device, kind, start, end, samples)] overlapping [t0, t1], by start time."""
+        query = "SELECT path, device, kind, start, end, samples FROM captures WHERE samples > 0"
+        args = []
+        if device is not None:
+            query += " AND device = ?"
+            args.append(device)
+        if t0 is not None:
+            query += " AND end >= ?"
+            args.append(t0)
+        if t1 is not None:
+            query += " AND start <= ?"
+            args.append(t1)
+        return self.db.execute(query + " ORDER BY start", args).fetchall()
+
+    def read(self, device, t0=None, t1=None):
+        """Samples (ts, values) of `device` in [t0, t1] across all its captures."""
+        for path, *rest in self.captures(device, t0, t1):
+            with CaptureReader(path) as reader:
+                yield from reader.read(t0, t1)
+
+def parse_time(text):
+    """Epoch seconds or an ISO date/time (local time)."""
+    try: return float(text)
+    except ValueError: return datetime.datetime.fromisoformat(text).timestamp()
+
+def _fmt_time(t):
+    return datetime.datetime.fromtimestamp(t).isoformat(sep=' ', timespec='milliseconds') if t is not None else "-"
+
+def main():
+    parser = argparse.ArgumentParser(description="Indexed Wii capture containers")
+    parser.add_argument("--db", default=DEFAULT_CATALOG, help="Catalog database")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("convert", help="CSV captures -> .wcap")
+    p.add_argument("files", nargs="+")
+    p.add_argument("-o", "--output", help="Output directory (default: next to the CSV)")
+    p.add_argument("--device", required=True, help="Device id of the captures, e.g. the remote's MAC")
+    p.add_argument("--block-records", type=int, default=DEFAULT_BLOCK_RECORDS)
+    p = sub.add_parser("record", help="Record a transport (see wii_transport) into a .wcap")
+    p.add_argument("spec")
+    p.add_argument("file")
+    p.add_argument("--seconds", type=float, default=10.0)
+    p = sub.add_parser("index", help="Add / refresh every .wcap under a directory in the catalog")
+    p.add_argument("root")
+    sub.add_parser("list", help="Devices in the catalog")
+    p = sub.add_parser("info", help="Container header and index")
+    p.add_argument("file")
+    p = sub.add_parser("query", help="Samples of a device in a time range")
+    p.add_argument("device")
+    p.add_argument("t0", type=parse_time, help="Epoch seconds or ISO time")
+    p.add_argument("t1", type=parse_time)
+    p.add_argument("--limit", type=int, default=20, help="Samples to print (0: all)")
+    args = parser.parse_args()
+
+    if args.cmd == "convert":
+        for path in args.files:
+            out = None
+            if args.output:
+                os.makedirs(args.output, exist_ok=True)
+                out = os.path.join(args.output, os.path.splitext(os.path.basename(path))[0] + ".wcap")
+            print(f"{path} -> {convert_csv(path, out, args.device, args.block_records)}")
+    elif args.cmd == "record":
+        from wii_transport import open_transport
+        print(f"{record_transport(open_transport(args.spec), args.file, args.seconds)} samples -> {args.file}")
+    elif args.cmd == "info":
+        with CaptureReader(args.file) as r:
+            print(f"{r.device} ({r.kind}): {r.count} samples in {len(r.blocks)} blocks, "
+                  f"{_fmt_time(r.start)} .. {_fmt_time(r.end)}{' [recovered index]' if r.recovered else ''}")
+    else:
+        catalog = Catalog(args.db)
+        try:
+            if args.cmd == "index":
+                added, removed = catalog.scan(args.root)
+                print(f"{added} captures indexed, {removed} removed")
+            elif args.cmd == "list":
+                for device, kind, n, start, end, samples in catalog.devices():
+                    print(f"{device:20s} {kind:5s} {n:5d} captures {samples:10d} samples  {_fmt_time(start)} .. {_fmt_time(end)}")
+            elif args.cmd == "query":
+                count = 0
+                for t, values in catalog.read(args.device, args.t0, args.t1):
+                    if not args.limit or count < args.limit: print(f"{_fmt_time(t)}  {values}")
+                    count += 1
+                print(f"{count} samples")
+        finally:
+            catalog.close()
+
+if __name__ == "__main__":
+    main()
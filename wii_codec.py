@@ -0,0 +1,342 @@
+"""
+IR Frame Codec (.wfc): delta / run-length / varint, optional zlib or lzma.
+
+Unlike the status CSV (only empty frames folded into `dur`) every unchanged
+frame - empty or not - is folded into a run, so an idle or steady signal
+costs a few bytes per run instead of a row per frame.
+
+Stream: header 'WFC1', version, compression, tick (s), then blocks of
+varint(payload size) + payload (compressed per block when enabled). Every
+block starts with a key frame, so blocks decode independently.
+
+Records (timestamps as integer ticks, deltas zigzag varints):
+  KEY     tag 0x20|mask, varint abs ticks, absolute x, y of the points in mask
+  FRAME   tag mask, dt, per point in mask: dx, dy if the point was present in
+          the previous frame, else absolute x, y
+  RUN     tag 0x10, varint n, dt: n more frames equal to the previous one,
+          the k-th at prev + k * dt
+
+A run only grows while every frame's reconstructed time stays within
+`tolerance` of its real time (0: exact at tick resolution).
+
+    python wii_codec.py encode wiieye_record_1770523803.csv out.wfc --compress lzma
+    python wii_codec.py decode out.wfc -o frames.csv
+"""
+
+import os
+import csv
+import sys
+import zlib
+import lzma
+import struct
+import argparse
+
+MAGIC = b'WFC1'
+VERSION = 1
+HEADER = struct.Struct('<4sBBd') # magic, version, compression, tick
+COMPRESSION = {None: 0, 'zlib': 1, 'lzma': 2}
+TAG_RUN = 0x10
+TAG_KEY = 0x20
+DEFAULT_TICK = 0.0001      # s
+DEFAULT_TOLERANCE = 0.002  # s
+DEFAULT_BLOCK_FRAMES = 4096
+
+def put_varint(buf, n):
+    while n >= 0x80:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+def put_svarint(buf, n):
+    put_varint(buf, n << 1 if n >= 0 else (-n << 1) - 1) # Zigzag
+
+def get_varint(data, pos):
+    """(value, new pos)"""
+    result = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if b < 0x80: return result, pos
+        shift += 7
+
+def get_svarint(data, pos):
+    n, pos = get_varint(data, pos)
+    return (n >> 1) ^ -(n & 1), pos
+
+def _mask(frame):
+    return sum(1 << i for i, p in enumerate(frame) if p is not None)
+
+def _compress(payload, compression):
+    if compression == 1: return zlib.compress(payload, 6)
+    if compression == 2: return lzma.compress(payload, format=lzma.FORMAT_RAW, filters=[{"id": lzma.FILTER_LZMA2, "preset": 6}])
+    return bytes(payload)
+
+def _decompress(payload, compression):
+    if compression == 1: return zlib.decompress(payload)
+    if compression == 2: return lzma.decompress(payload, format=lzma.FORMAT_RAW, filters=[{"id": lzma.FILTER_LZMA2}])
+    return payload
+
+class FrameEncoder:
+    """
+    Streaming encoder: encode(ts, frame) per frame, close() at the end. With
+    flush_interval (seconds on the frame clock) a block is also written once
+    it spans that long, so a crash loses at most that much of a slow stream;
+    poll(now) applies the same limit while no frames arrive.
+    """
+    def __init__(self, out, tick=DEFAULT_TICK, tolerance=DEFAULT_TOLERANCE, compression=None,
+                 block_frames=DEFAULT_BLOCK_FRAMES, flush_interval=None):
+        if compression not in COMPRESSION: raise ValueError(f"Unknown compression: {compression}")
+        self.out = out
+        self.tick = tick
+        self.tolerance = round(tolerance / tick)
+        self.compression = COMPRESSION[compression]
+        self.block_frames = block_frames
+        self.flush_interval = flush_interval
+        self.frames = 0
+        self.runs = 0
+        self.bytes_written = HEADER.size
+        self._buf = bytearray()
+        self._block_count = 0
+        self._block_ts = None   # Time of the first frame in the current block
+        self._prev = None       # Last frame content
+        self._prev_ticks = None # Time of the last written frame / run end
+        self._run_n = 0
+        self._run_dt = 0
+        out.write(HEADER.pack(MAGIC, VERSION, self.compression, tick))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def encode(self, ts, frame):
+        self._encode(ts, frame)
+        if self._block_ts is None: self._block_ts = ts
+        self.poll(ts)
+
+    def poll(self, now):
+        """Flushes the current block once it is flush_interval old at `now`."""
+        if self.flush_interval is not None and self._block_ts is not None and now - self._block_ts >= self.flush_interval:
+            self.flush()
+
+    def _encode(self, ts, frame):
+        ticks = round(ts / self.tick)
+        frame = [tuple(p) if p is not None else None for p in frame]
+        self.frames += 1
+        if self._prev is not None and frame == self._prev:
+            if self._run_n:
+                expected = self._prev_ticks + (self._run_n + 1) * self._run_dt
+                if abs(ticks - expected) <= self.tolerance:
+                    self._run_n += 1
+                    return
+                self._end_run()
+            if self._prev is not None: # Still in the same block: start a new run
+                self._run_n, self._run_dt = 1, ticks - self._prev_ticks
+                return
+        self._end_run()
+        if self._prev is None: self._key(ticks, frame)
+        else: self._frame(ticks, frame)
+
+    def _end_run(self):
+        if not self._run_n: return
+        buf = self._buf
+        buf.append(TAG_RUN)
+        put_varint(buf, self._run_n)
+        put_svarint(buf, self._run_dt)
+        self._prev_ticks += self._run_n * self._run_dt
+        self._block_count += self._run_n
+        self._run_n = 0
+        self.runs += 1
+        if self._block_count >= self.block_frames: self._flush_block()
+
+    def _key(self, ticks, frame):
+        buf = self._buf
+        mask = _mask(frame)
+        buf.append(TAG_KEY | mask)
+        put_varint(buf, ticks)
+        for p in frame:
+            if p is not None:
+                put_varint(buf, p[0])
+                put_varint(buf, p[1])
+        self._after(ticks, frame)
+
+    def _frame(self, ticks, frame):
+        buf, prev = self._buf, self._prev
+        buf.append(_mask(frame))
+        put_svarint(buf, ticks - self._prev_ticks)
+        for p, q in zip(frame, prev):
+            if p is None: continue
+            if q is not None:
+                put_svarint(buf, p[0] - q[0])
+                put_svarint(buf, p[1] - q[1])
+            else:
+                put_varint(buf, p[0])
+                put_varint(buf, p[1])
+        self._after(ticks, frame)
+
+    def _after(self, ticks, frame):
+        self._prev, self._prev_ticks = frame, ticks
+        self._block_count += 1
+        if self._block_count >= self.block_frames: self._flush_block()
+
+    def _flush_block(self):
+        if self._buf:
+            payload = _compress(self._buf, self.compression)
+            head = bytearray()
+            put_varint(head, len(payload))
+            self.out.write(bytes(head) + payload)
+            self.bytes_written += len(head) + len(payload)
+        self._buf = bytearray()
+        self._block_count = 0
+        self._block_ts = None
+        self._prev = None # Next block starts with a key frame
+
+    def flush(self):
+        """Ends the current block (pending run included) and flushes the output."""
+        self._end_run()
+        self._flush_block()
+        self.out.flush()
+
+    def close(self):
+        if self.out is None: return
+        self.flush()
+        self.out = None
+
+def _read_header(f):
+    """(compression, tick) from the stream header."""
+    head = f.read(HEADER.size)
+    if len(head) < HEADER.size: raise ValueError("Not a frame codec stream")
+    magic, version, compression, tick = HEADER.unpack(head)
+    if magic != MAGIC: raise ValueError("Not a frame codec stream")
+    if version > VERSION: raise ValueError(f"Unsupported codec version {version}")
+    return compression, tick
+
+def decode_stream(f):
+    """Streaming decoder: yields (ts, [p0..p3]) from a binary file object."""
+    compression, tick = _read_header(f)
+    while True:
+        size = _read_varint(f)
+        if size is None: return
+        payload = f.read(size)
+        if len(payload) < size: return # Truncated last block (writer killed)
+        yield from _decode_block(_decompress(payload, compression), tick)
+
+def stream_span(f):
+    """
+    (first ts, last ts) of a seekable stream, None if it has no frames. Skips
+    over the block sizes and decodes only the first and the last block.
+    """
+    compression, tick = _read_header(f)
+    end = os.fstat(f.fileno()).st_size if hasattr(f, 'fileno') else None
+    first = last_block = None
+    while True:
+        size = _read_varint(f)
+        if size is None: break
+        offset = f.tell()
+        if end is not None and offset + size > end: break # Truncated last block
+        if first is None:
+            first = next(_decode_block(_decompress(f.read(size), compression), tick), (None,))[0]
+        last_block = offset, size
+        f.seek(offset + size)
+    if last_block is None or first is None: return None
+    f.seek(last_block[0])
+    last = first
+    for ts, frame in _decode_block(_decompress(f.read(last_block[1]), compression), tick): last = ts
+    return first, last
+
+def _read_varint(f):
+    result = shift = 0
+    while True:
+        b = f.read(1)
+        if not b: return None
+        result |= (b[0] & 0x7F) << shift
+        if b[0] < 0x80: return result
+        shift += 7
+
+def _decode_block(data, tick):
+    pos, end = 0, len(data)
+    prev, ticks = None, 0
+    while pos < end:
+        tag = data[pos]
+        pos += 1
+        if tag == TAG_RUN:
+            n, pos = get_varint(data, pos)
+            dt, pos = get_svarint(data, pos)
+            for k in range(n):
+                ticks += dt
+                yield ticks * tick, [list(p) if p else None for p in prev]
+            continue
+        mask = tag & 0x0F
+        if tag & TAG_KEY:
+            ticks, pos = get_varint(data, pos)
+        else:
+            dt, pos = get_svarint(data, pos)
+            ticks += dt
+        frame = [None] * 4
+        for i in range(4):
+            if not mask & (1 << i): continue
+            if not tag & TAG_KEY and prev[i] is not None:
+                dx, pos = get_svarint(data, pos)
+                dy, pos = get_svarint(data, pos)
+                frame[i] = (prev[i][0] + dx, prev[i][1] + dy)
+            else:
+                x, pos = get_varint(data, pos)
+                y, pos = get_varint(data, pos)
+                frame[i] = (x, y)
+        prev = frame
+        yield ticks * tick, [list(p) if p else None for p in frame]
+
+def encode_frames(frames, **kwargs):
+    """Iterable of (ts, frame) -> bytes."""
+    import io
+    out = io.BytesIO()
+    with FrameEncoder(out, **kwargs) as encoder:
+        for ts, frame in frames: encoder.encode(ts, frame)
+    return out.getvalue()
+
+def decode_bytes(data):
+    import io
+    return list(decode_stream(io.BytesIO(data)))
+
+RECORD_HEADER = ['timestamp', 'p0_x', 'p0_y', 'p1_x', 'p1_y', 'p2_x', 'p2_y', 'p3_x', 'p3_y']
+
+def main():
+    parser = argparse.ArgumentParser(description="IR frame codec (.wfc)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("encode", help="Capture (CSV / .wcap) -> .wfc")
+    p.add_argument("input")
+    p.add_argument("output")
+    p.add_argument("--compress", choices=["zlib", "lzma"])
+    p.add_argument("--tick", type=float, default=DEFAULT_TICK)
+    p.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    p = sub.add_parser("decode", help=".wfc -> record CSV (timestamp,p0_x,..)")
+    p.add_argument("input")
+    p.add_argument("-o", "--output", help="CSV file (default: stdout)")
+    args = parser.parse_args()
+
+    if args.cmd == "encode":
+        from wii_transport import iter_capture
+        kind, frames = iter_capture(args.input)
+        if kind != 'ir': sys.exit(f"{args.input}: not an IR capture")
+        with open(args.output, 'wb') as f, FrameEncoder(f, args.tick, args.tolerance, args.compress) as enc:
+            for ts, frame in frames: enc.encode(ts, frame)
+        size = os.path.getsize(args.input)
+        print(f"{enc.frames} frames ({enc.runs} runs): {size} -> {enc.bytes_written} bytes "
+              f"({enc.bytes_written / max(1, size) * 100:.1f}%)")
+    else:
+        out = open(args.output, 'w', newline='') if args.output else sys.stdout
+        try:
+            writer = csv.writer(out)
+            writer.writerow(RECORD_HEADER)
+            with open(args.input, 'rb') as f:
+                for ts, frame in decode_stream(f):
+                    row = [f"{ts:.4f}"]
+                    for p in frame: row.extend(p if p else ['', ''])
+                    writer.writerow(row)
+        finally:
+            if out is not sys.stdout: out.close()
+
+if __name__ == "__main__":
+    main()
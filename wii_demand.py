@@ -0,0 +1,42 @@
+"""
+On-demand Sub-streams: consumer reference counts per device stream.
+
+Drivers only turn a stream on (open the evdev node, enable the IR camera,
+switch the report mode) while at least one consumer holds it, so idle
+devices stop sending data nobody reads. on_change(stream, active) is called
+on every 0 <-> 1 transition.
+
+    demand = StreamDemand(('ir', 'accel'), driver._on_stream_change)
+    with demand.using('ir'):
+        ...
+"""
+
+import contextlib
+
+class StreamDemand:
+    def __init__(self, streams, on_change):
+        self.counts = dict.fromkeys(streams, 0)
+        self.on_change = on_change
+
+    def _check(self, stream):
+        if stream not in self.counts: raise ValueError(f"Unknown stream: {stream} (known: {', '.join(self.counts)})")
+
+    def acquire(self, stream):
+        self._check(stream)
+        self.counts[stream] += 1
+        if self.counts[stream] == 1: self.on_change(stream, True)
+
+    def release(self, stream):
+        self._check(stream)
+        if self.counts[stream] == 0: return
+        self.counts[stream] -= 1
+        if self.counts[stream] == 0: self.on_change(stream, False)
+
+    def active(self, stream):
+        return self.counts.get(stream, 0) > 0
+
+    @contextlib.contextmanager
+    def using(self, stream):
+        self.acquire(stream)
+        try: yield
+        finally: self.release(stream)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Per-sensor Noise Filtering for Balance Board readings (NumPy).
+
+Applied to the four sensors of every report before weight and CoP are
+computed, vectorized over the channels, O(1) per sample:
+
+1. median of the last `median` readings: single-report spikes and
+   Bluetooth glitches (up to (median - 1) / 2 reports long) are rejected,
+2. smoother ('one_pole' or 'kalman', None = median only).
+
+`latency` is the budget for the whole chain (seconds, low-frequency group
+delay): the median takes (median - 1) / 2 report periods at `rate`, the
+smoother gets the rest as its time constant. Both smoothers use the report
+timestamps, so irregular reports and gaps are handled:
+- 'one_pole': x += (1 - exp(-dt / tau)) * (z - x),
+- 'kalman': random-walk Kalman filter with the same steady-state gain; the
+  gain is higher at start and after a gap, so it settles faster.
+
+Units are the caller's (raw sensor units or kg).
+
+    f = SensorFilter(median=5, smoother='kalman', latency=0.1)
+    values = f.update(ts, raw_values) # ndarray (4,), reused between calls
+"""
+
+import math
+import numpy as np
+
+SMOOTHERS = (None, 'one_pole', 'kalman')
+DEFAULT_RATE = 100.0 # Hz, nominal board report rate
+
+class SensorFilter:
+    def __init__(self, median=5, smoother='one_pole', latency=0.1, rate=DEFAULT_RATE, channels=4):
+        if smoother not in SMOOTHERS: raise ValueError(f"Unknown smoother: {smoother}")
+        if median < 1: raise ValueError("median must be >= 1")
+        self.median = int(median)
+        self.smoother = smoother
+        self.latency = float(latency)
+        self.rate = float(rate)
+        # Smoother time constant: what the median leaves of the latency budget
+        self.tau = max(0.0, self.latency - (self.median - 1) / 2 / self.rate) if smoother else 0.0
+        if self.tau > 0:
+            alpha = 1.0 - math.exp(-1.0 / (self.rate * self.tau))
+            self._q = alpha * alpha / (1.0 - alpha) # Kalman process noise per report (measurement noise = 1)
+        self.value = np.zeros(channels)
+        self._ring = np.zeros((self.median, channels))
+        self._med = np.zeros(channels)
+        self.reset()
+
+    def reset(self):
+        self._pos = 0
+        self._last_ts = None
+        self._p = 1.0 # Kalman estimate variance (same for every channel)
+
+    @property
+    def delay(self):
+        """Approximate delay of the chain at low frequencies (s)."""
+        return (self.median - 1) / 2 / self.rate + self.tau
+
+    def update(self, ts, values):
+        """One report (ts in seconds, one value per channel) -> filtered values (self.value)."""
+        z = self._med
+        if self._last_ts is None:
+            self._ring[:] = values # Start without a transient
+            self.value[:] = self._ring[0]
+            self._last_ts = ts
+            return self.value
+        dt = ts - self._last_ts
+        if dt <= 0: dt = 1.0 / self.rate
+        self._last_ts = ts
+        if self.median > 1:
+            self._ring[self._pos] = values
+            self._pos = (self._pos + 1) % self.median
+            np.median(self._ring, axis=0, out=z)
+        else:
+            z[:] = values
+        if self.tau <= 0:
+            self.value[:] = z
+            return self.value
+        if self.smoother == 'kalman':
+            p = self._p + self._q * dt * self.rate
+            gain = p / (p + 1.0)
+            self._p = (1.0 - gain) * p
+        else:
+            gain = 1.0 - math.exp(-dt / self.tau)
+        z -= self.value
+        z *= gain
+        self.value += z
+        return self.value
+
+    def apply(self, ts, values):
+        """update() written back into `values` (list, e.g. BoardSample.mass) in place."""
+        values[:] = self.update(ts, values).tolist()
+        return values
+
+def make_filter(config):
+    """SensorFilter from an instance, a dict of arguments or None (no filter)."""
+    if config is None or isinstance(config, SensorFilter): return config
+    return SensorFilter(**config)
@@ -0,0 +1,255 @@
+"""
+Wii HID Report Protocol (raw L2CAP) - report IDs and zero-copy parsers.
+
+Reports are parsed with precompiled struct.Struct objects directly from the
+receive buffer (bytes / bytearray / memoryview), dispatching on the integer
+report ID, without slicing or building per-report dicts.
+
+Input report layout (as received on the interrupt channel, PSM 0x13):
+  data[0]   0xA1 (DATA | INPUT)
+  data[1]   report ID
+  data[2:4] core buttons (big endian)
+  data[4:]  payload
+
+Wii Remote IR camera reports (0x33 extended, 0x3e/0x3f interleaved full)
+are parsed into one reusable IRFrame the same way.
+"""
+
+import struct
+
+# --- Input report IDs ---
+REPORT_STATUS = 0x20
+REPORT_READ_DATA = 0x21
+REPORT_ACK = 0x22
+REPORT_BUTTONS = 0x30       # Core buttons only
+REPORT_BUTTONS_ACCEL = 0x31 # Core buttons + accelerometer
+REPORT_EXT8 = 0x32 # Core buttons + 8 extension bytes (Balance Board)
+REPORT_IR_EXTENDED = 0x33 # Core buttons + accelerometer + 12 IR bytes (4 x 3)
+REPORT_IR_FULL_A = 0x3e   # Interleaved full IR, objects 0-1 (2 x 9 bytes)
+REPORT_IR_FULL_B = 0x3f   # Interleaved full IR, objects 2-3
+
+# --- Output report IDs (Wii Remote) ---
+OUT_LEDS = 0x11
+OUT_REPORTING = 0x12
+OUT_IR_CLOCK = 0x13
+OUT_STATUS = 0x15
+OUT_WRITE = 0x16
+OUT_IR_LOGIC = 0x1a
+
+# --- Precompiled layouts (offsets into the received report) ---
+BUTTONS = struct.Struct('>H')             # @2
+STATUS = struct.Struct('>BxH')            # @4: LED/flags, reserved, battery
+READ_DATA_HEADER = struct.Struct('>BH')   # @4: size-1 << 4 | error, address
+BOARD_SENSORS = struct.Struct('>HHHH')    # @4 (0x32) / calibration blocks: TR, BR, TL, BL
+ACK = struct.Struct('>BB')                # @4: acknowledged report ID, error code
+ACCEL = struct.Struct('3B')               # @4 (0x31 / 0x33): X, Y, Z (upper 8 bits)
+IR_EXTENDED = struct.Struct('12B')        # @7 (0x33)
+IR_FULL = struct.Struct('18B')            # @5 (0x3e / 0x3f)
+WRITE_MEMORY = struct.Struct('>BBHB16s')  # Output 0x16: space, address (24 bit), size, data
+
+OFFSET_BUTTONS = 2
+OFFSET_PAYLOAD = 4
+OFFSET_READ_DATA = 7
+OFFSET_IR_EXTENDED = 7
+OFFSET_IR_FULL = 5
+
+# Minimum length of each input report: the parsers unpack at fixed offsets,
+# shorter (truncated) reports must be dropped before parsing (see complete())
+REPORT_SIZE = {
+    REPORT_STATUS: OFFSET_PAYLOAD + STATUS.size,
+    REPORT_READ_DATA: OFFSET_READ_DATA,  # + size bytes of payload, see parse_read_data
+    REPORT_ACK: OFFSET_PAYLOAD + ACK.size,
+    REPORT_BUTTONS: OFFSET_PAYLOAD,
+    REPORT_BUTTONS_ACCEL: OFFSET_PAYLOAD + ACCEL.size,
+    REPORT_EXT8: OFFSET_PAYLOAD + BOARD_SENSORS.size,
+    REPORT_IR_EXTENDED: OFFSET_IR_EXTENDED + IR_EXTENDED.size,
+    REPORT_IR_FULL_A: OFFSET_IR_FULL + IR_FULL.size,
+    REPORT_IR_FULL_B: OFFSET_IR_FULL + IR_FULL.size,
+}
+
+# --- Wii Remote core buttons (big endian word at @2) ---
+BUTTON_TWO = 0x0001
+BUTTON_ONE = 0x0002
+BUTTON_B = 0x0004
+BUTTON_A = 0x0008
+BUTTON_MINUS = 0x0010
+BUTTON_HOME = 0x0080
+BUTTON_PLUS = 0x1000
+
+# --- IR camera ---
+IR_REGISTER_BASE = 0xb00030   # Control: write 0x08 before and after configuration
+IR_SENSITIVITY_1 = 0xb00000   # 9 bytes
+IR_SENSITIVITY_2 = 0xb0001a   # 2 bytes
+IR_MODE_REGISTER = 0xb00033
+IR_MODE_EXTENDED = 3
+IR_MODE_FULL = 5
+IR_NONE = 1023
+# Sensitivity blocks (1 = least sensitive ... 5 = most sensitive), 'marcan': high gain, no blob limits
+IR_SENSITIVITY = {
+    1: (b'\x02\x00\x00\x71\x01\x00\x64\x00\xfe', b'\xfd\x05'),
+    2: (b'\x02\x00\x00\x71\x01\x00\x96\x00\xb4', b'\xb3\x04'),
+    3: (b'\x02\x00\x00\x71\x01\x00\xaa\x00\x64', b'\x63\x03'),
+    4: (b'\x02\x00\x00\x71\x01\x00\xc8\x00\x36', b'\x35\x03'),
+    5: (b'\x07\x00\x00\x71\x01\x00\x72\x00\x20', b'\x1f\x03'),
+    'marcan': (b'\x00\x00\x00\x00\x00\x00\x90\x00\xc0', b'\x40\x00'),
+}
+
+SENSOR_NAMES = ('top_right', 'bottom_right', 'top_left', 'bottom_left')
+
+class BoardSample:
+    """
+    One Balance Board reading. The parser owns a single instance and
+    updates it in place for every report; copy() it to keep a reading.
+    """
+    __slots__ = ('raw', 'mass', 'buttons')
+
+    def __init__(self):
+        self.raw = [0, 0, 0, 0]          # TR, BR, TL, BL (sensor units)
+        self.mass = [0.0, 0.0, 0.0, 0.0] # kg, filled by the driver
+        self.buttons = 0
+
+    @property
+    def total(self):
+        m = self.mass
+        return m[0] + m[1] + m[2] + m[3]
+
+    def as_dict(self):
+        return dict(zip(SENSOR_NAMES, self.mass))
+
+    def copy(self):
+        s = BoardSample()
+        s.raw[:] = self.raw
+        s.mass[:] = self.mass
+        s.buttons = self.buttons
+        return s
+
+    def __repr__(self):
+        return f"BoardSample(raw={self.raw}, mass={self.mass}, buttons=0x{self.buttons:04x})"
+
+class IRFrame:
+    """
+    One IR camera frame (4 objects), updated in place by the parsers; copy()
+    it to keep a frame. Invisible objects have x = y = 1023. size: 0-15
+    (extended and full modes), intensity and bounding box: full mode only.
+    """
+    __slots__ = ('x', 'y', 'size', 'intensity', 'bbox', 'buttons', 'accel', 'full')
+
+    def __init__(self):
+        self.x = [IR_NONE] * 4
+        self.y = [IR_NONE] * 4
+        self.size = [0] * 4
+        self.intensity = [0] * 4
+        self.bbox = [(0, 0, 0, 0)] * 4 # xmin, ymin, xmax, ymax (0-127)
+        self.buttons = 0
+        self.accel = (0, 0, 0)
+        self.full = False
+
+    def visible(self, i):
+        return self.x[i] != IR_NONE or self.y[i] != IR_NONE
+
+    @property
+    def points(self):
+        """[x, y] or None per object (same as the evdev IR path)."""
+        return [[self.x[i], self.y[i]] if self.visible(i) else None for i in range(4)]
+
+    def blobs(self, min_size=0, max_size=15, min_intensity=0):
+        """Visible objects within size / intensity limits: [(index, x, y, size, intensity)].
+        Small faint blobs are typically ghosts, oversized ones blooming."""
+        return [(i, self.x[i], self.y[i], self.size[i], self.intensity[i]) for i in range(4)
+                if self.visible(i) and min_size <= self.size[i] <= max_size
+                and (not self.full or self.intensity[i] >= min_intensity)]
+
+    def copy(self):
+        f = IRFrame()
+        f.x[:], f.y[:], f.size[:], f.intensity[:], f.bbox[:] = self.x, self.y, self.size, self.intensity, self.bbox
+        f.buttons, f.accel, f.full = self.buttons, self.accel, self.full
+        return f
+
+    def __repr__(self):
+        return f"IRFrame(points={self.points}, size={self.size}, intensity={self.intensity})"
+
+def report_id(data):
+    """Integer report ID (no slicing)."""
+    return data[1]
+
+def complete(data):
+    """True if `data` is long enough for its report ID's parser (unknown IDs: header only)."""
+    return len(data) >= OFFSET_BUTTONS and len(data) >= REPORT_SIZE.get(data[1], OFFSET_BUTTONS)
+
+def parse_buttons(data):
+    return BUTTONS.unpack_from(data, OFFSET_BUTTONS)[0]
+
+def parse_board_sensors(data, sample):
+    """0x32 report -> sample.raw / sample.buttons (in place)."""
+    raw = sample.raw
+    raw[0], raw[1], raw[2], raw[3] = BOARD_SENSORS.unpack_from(data, OFFSET_PAYLOAD)
+    sample.buttons = BUTTONS.unpack_from(data, OFFSET_BUTTONS)[0]
+    return sample
+
+def parse_board_sensors_into(data, out, index=0):
+    """0x32 report -> out[index:index+4] (preallocated list / array.array / NumPy row)."""
+    out[index], out[index + 1], out[index + 2], out[index + 3] = BOARD_SENSORS.unpack_from(data, OFFSET_PAYLOAD)
+
+def parse_status(data):
+    """0x20 report -> (flags, battery_raw)."""
+    return STATUS.unpack_from(data, OFFSET_PAYLOAD)
+
+def parse_read_data(data):
+    """0x21 report -> (size, error, address, payload offset)."""
+    se, address = READ_DATA_HEADER.unpack_from(data, OFFSET_PAYLOAD)
+    return (se >> 4) + 1, se & 0x0F, address, OFFSET_READ_DATA
+
+def parse_calibration_block(data, offset):
+    """One 8-byte calibration block (TR, BR, TL, BL) as a list."""
+    return list(BOARD_SENSORS.unpack_from(data, offset))
+
+def parse_ack(data):
+    """0x22 report -> (acknowledged report ID, error code)."""
+    return ACK.unpack_from(data, OFFSET_PAYLOAD)
+
+def parse_ir_extended(data, frame):
+    """0x33 report -> frame (in place): 4 objects of x, y, size."""
+    b = IR_EXTENDED.unpack_from(data, OFFSET_IR_EXTENDED)
+    x, y, size = frame.x, frame.y, frame.size
+    for i in range(4):
+        b0, b1, b2 = b[3 * i], b[3 * i + 1], b[3 * i + 2]
+        if b0 == b1 == b2 == 0xFF:
+            x[i] = y[i] = IR_NONE
+            size[i] = 0
+        else:
+            x[i] = b0 | (b2 & 0x30) << 4
+            y[i] = b1 | (b2 & 0xC0) << 2
+            size[i] = b2 & 0x0F
+    frame.buttons = BUTTONS.unpack_from(data, OFFSET_BUTTONS)[0]
+    frame.accel = ACCEL.unpack_from(data, OFFSET_PAYLOAD)
+    frame.full = False
+    return frame
+
+def parse_ir_full(data, frame):
+    """
+    0x3e / 0x3f report -> objects 0-1 / 2-3 of frame (in place): x, y, size,
+    bounding box, intensity. Returns True after 0x3f (frame complete).
+    """
+    second = data[1] == REPORT_IR_FULL_B
+    b = IR_FULL.unpack_from(data, OFFSET_IR_FULL)
+    x, y, size = frame.x, frame.y, frame.size
+    for k in range(2):
+        i, o = k + 2 * second, 9 * k
+        b0, b1, b2 = b[o], b[o + 1], b[o + 2]
+        if b0 == b1 == b2 == 0xFF:
+            x[i] = y[i] = IR_NONE
+            size[i] = frame.intensity[i] = 0
+        else:
+            x[i] = b0 | (b2 & 0x30) << 4
+            y[i] = b1 | (b2 & 0xC0) << 2
+            size[i] = b2 & 0x0F
+            frame.bbox[i] = (b[o + 3] & 0x7F, b[o + 4] & 0x7F, b[o + 5] & 0x7F, b[o + 6] & 0x7F)
+            frame.intensity[i] = b[o + 8]
+    frame.buttons = BUTTONS.unpack_from(data, OFFSET_BUTTONS)[0]
+    frame.full = True
+    return second
+
+def write_memory(address, payload, space=0x04):
+    """Output report 0x16 body: write up to 16 bytes to a register (space 0x04) or EEPROM (0x00)."""
+    if len(payload) > 16: raise ValueError("At most 16 bytes per write")
+    return WRITE_MEMORY.pack(space, address >> 16, address & 0xFFFF, len(payload), payload)
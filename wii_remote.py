@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Wii Remote IR Camera over raw L2CAP (no hid-wiimote).
+
+The evdev path only exposes X/Y per point. Talking the HID report protocol
+directly (like wiiboard.py does for the Balance Board) gives the camera's
+own blob data:
+- 'extended' (report 0x33): x, y, size (0-15) for 4 objects + buttons + accel,
+- 'full' (interleaved 0x3e / 0x3f): x, y, size, bounding box and intensity;
+  one frame every two reports.
+
+The camera is configured with one of the sensitivity blocks in
+wii_protocol.IR_SENSITIVITY (1-5, 'marcan') or a custom (block1, block2)
+pair. Reports are parsed in place into one IRFrame (wii_protocol) from a
+preallocated receive buffer. Output reports go to the interrupt channel
+(0xA2), which works for the original and the -TR (MotionPlus) remotes.
+
+Streams are switched on demand (wii_demand): the camera is powered and the
+IR report selected only while 'ir' has a consumer, accelerometer-only
+reporting (0x31) for 'accel', otherwise buttons-only change reporting
+(0x30) - an idle remote then sends nothing. on_demand=False keeps IR on
+from connect() on.
+
+Samples are stamped with time.time() on receipt (no kernel timestamps on
+this path). The remote must not be bound by hid-wiimote at the same time.
+
+usage: wii_remote.py ADDRESS [--mode extended|full] [--sensitivity 1-5|marcan]
+"""
+
+import sys
+import time
+import logging
+import argparse
+
+import wii_protocol as proto
+from wii_protocol import IRFrame
+from wiiboard import l2cap_socket
+from wii_demand import StreamDemand
+
+logger = logging.getLogger("wii_accessories")
+
+CONTROL_PSM = 0x11
+INTERRUPT_PSM = 0x13
+CONFIG_DELAY = 0.05 # s between camera configuration writes
+MODES = {'extended': (proto.IR_MODE_EXTENDED, proto.REPORT_IR_EXTENDED),
+         'full': (proto.IR_MODE_FULL, proto.REPORT_IR_FULL_A)}
+
+class WiimoteIR:
+    def __init__(self, mode='extended', sensitivity=3, on_frame=None, on_demand=False, continuous=True):
+        if mode not in MODES: raise ValueError(f"Unknown IR mode: {mode}")
+        self.mode = mode
+        self.sensitivity = sensitivity
+        self.on_frame = on_frame # Called with the (reused) IRFrame per complete frame
+        self.on_buttons = None   # Called with the button word when it changes
+        self.on_demand = on_demand
+        self.continuous = continuous # False: IR / accel reports only when the data changes
+        self.streams = StreamDemand(('ir', 'accel', 'buttons'), self._on_stream_change)
+        self.buttons = 0
+        self.accel = (0, 0, 0)
+        self.controlsocket = None
+        self.receivesocket = None
+        self.address = None
+        self.running = False
+        self.frame = IRFrame()
+        self.timestamp = 0.0 # Receipt time of the last complete frame
+        self.frames = 0
+        self.short_reports = 0 # Truncated reports dropped
+        self.battery = 0.0
+        self._buffer = bytearray(32)
+        self._view = memoryview(self._buffer)
+        self._handlers = {
+            proto.REPORT_STATUS: self._on_status_report,
+            proto.REPORT_ACK: self._on_ack_report,
+            proto.REPORT_BUTTONS: self._on_buttons_report,
+            proto.REPORT_BUTTONS_ACCEL: self._on_buttons_report,
+            proto.REPORT_IR_EXTENDED: self._on_extended_report,
+            proto.REPORT_IR_FULL_A: self._on_full_report,
+            proto.REPORT_IR_FULL_B: self._on_full_report,
+        }
+
+    def connect(self, address, timeout=5.0):
+        logger.info(f"Wiimote: connecting to {address}...")
+        try:
+            self.controlsocket = l2cap_socket()
+            self.receivesocket = l2cap_socket()
+            for sock in (self.controlsocket, self.receivesocket): sock.settimeout(timeout)
+            self.controlsocket.connect((address, CONTROL_PSM))
+            self.receivesocket.connect((address, INTERRUPT_PSM))
+            for sock in (self.controlsocket, self.receivesocket): sock.settimeout(None)
+        except OSError as e:
+            logger.error(f"Wiimote: connection failed (paired? not bound by hid-wiimote?): {e}")
+            self.close()
+            return False
+        self.address = address
+        self.running = True
+        self.set_leds(0x1)
+        if self.streams.active('ir'): self.enable_ir() # Reconnect with subscribers
+        elif not self.on_demand: self.streams.acquire('ir')
+        else: self.set_reporting()
+        return True
+
+    def subscribe(self, stream):
+        """Consumer of 'ir', 'accel' or 'buttons'; pair with unsubscribe()."""
+        self.streams.acquire(stream)
+
+    def unsubscribe(self, stream):
+        self.streams.release(stream)
+
+    def _on_stream_change(self, stream, active):
+        if not self.running: return # Applied on connect()
+        if stream == 'ir' and active:
+            self.enable_ir() # Selects the IR report when done
+            return
+        self.set_reporting()
+        if stream == 'ir': self.disable_ir()
+
+    # --- Output reports ---
+
+    def send(self, report, payload=b''):
+        """Output report on the interrupt channel (rumble bit always off)."""
+        if self.receivesocket: self.receivesocket.send(bytes((0xA2, report)) + payload)
+
+    def write_register(self, address, data):
+        self.send(proto.OUT_WRITE, proto.write_memory(address, data))
+
+    def set_leds(self, mask):
+        self.send(proto.OUT_LEDS, bytes(((mask & 0x0F) << 4,)))
+
+    def request_status(self):
+        self.send(proto.OUT_STATUS, b'\x00')
+
+    def set_reporting(self):
+        """Report mode for the active streams: IR, accelerometer or buttons only (on change)."""
+        flag = 0x04 if self.continuous else 0x00
+        if self.streams.active('ir'): mode = (flag, MODES[self.mode][1])
+        elif self.streams.active('accel'): mode = (flag, proto.REPORT_BUTTONS_ACCEL)
+        else: mode = (0x00, proto.REPORT_BUTTONS)
+        self.send(proto.OUT_REPORTING, bytes(mode))
+
+    def disable_ir(self):
+        """Camera off (pixel clock and logic); enable_ir() runs the full setup again."""
+        self.send(proto.OUT_IR_CLOCK, b'\x00')
+        self.send(proto.OUT_IR_LOGIC, b'\x00')
+        self.frame.x[:] = self.frame.y[:] = [proto.IR_NONE] * 4
+        logger.info("Wiimote: IR camera off")
+
+    def enable_ir(self):
+        """Camera power-up and configuration sequence, then IR reporting."""
+        block1, block2 = (proto.IR_SENSITIVITY[self.sensitivity] if self.sensitivity in proto.IR_SENSITIVITY
+                          else self.sensitivity)
+        ir_mode = MODES[self.mode][0]
+        steps = [lambda: self.send(proto.OUT_IR_CLOCK, b'\x04'),
+                 lambda: self.send(proto.OUT_IR_LOGIC, b'\x04'),
+                 lambda: self.write_register(proto.IR_REGISTER_BASE, b'\x08'),
+                 lambda: self.write_register(proto.IR_SENSITIVITY_1, block1),
+                 lambda: self.write_register(proto.IR_SENSITIVITY_2, block2),
+                 lambda: self.write_register(proto.IR_MODE_REGISTER, bytes((ir_mode,))),
+                 lambda: self.write_register(proto.IR_REGISTER_BASE, b'\x08')]
+        for step in steps:
+            step()
+            time.sleep(CONFIG_DELAY) # The camera drops writes sent back to back
+        self.set_reporting()
+        logger.info(f"Wiimote: IR camera on ({self.mode}, sensitivity {self.sensitivity if isinstance(self.sensitivity, (int, str)) else 'custom'})")
+
+    # --- Input ---
+
+    def fileno(self):
+        return self.receivesocket.fileno()
+
+    def setblocking(self, flag):
+        if self.receivesocket: self.receivesocket.setblocking(flag)
+
+    def _recv(self):
+        sock = self.receivesocket
+        if hasattr(sock, 'recv_into'):
+            n = sock.recv_into(self._buffer)
+        else: # pybluez has no recv_into
+            data = sock.recv(len(self._buffer))
+            n = len(data)
+            self._buffer[:n] = data
+        return self._view[:n]
+
+    def handle_input(self):
+        """Handles every pending report (non-blocking socket). Never blocks."""
+        while self.running and self.receivesocket:
+            try:
+                data = self._recv()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                logger.warning(f"Wiimote: disconnected: {e}")
+                self.close()
+                return
+            if not data:
+                logger.warning("Wiimote: disconnected.")
+                self.close()
+                return
+            if len(data) >= 4: self.process_report(data)
+
+    def loop(self):
+        """Blocking loop until close() / disconnect."""
+        self.setblocking(True)
+        while self.running and self.receivesocket:
+            try: data = self._recv()
+            except OSError as e:
+                logger.warning(f"Wiimote: disconnected: {e}")
+                break
+            if not data: break
+            if len(data) >= 4: self.process_report(data)
+        self.close()
+
+    def process_report(self, data):
+        handler = self._handlers.get(data[1])
+        if not handler: return
+        if not proto.complete(data):
+            self.short_reports += 1 # Truncated: the parsers read at fixed offsets
+            return
+        handler(data)
+
+    def _on_status_report(self, data):
+        flags, battery_raw = proto.parse_status(data)
+        self.battery = min(1.0, battery_raw / 200.0)
+        # A status report (e.g. extension plugged in) resets the reporting mode
+        self.set_reporting()
+
+    def _on_ack_report(self, data):
+        report, error = proto.parse_ack(data)
+        if error: logger.warning(f"Wiimote: output report 0x{report:02x} failed (error {error})")
+
+    def _on_buttons_report(self, data):
+        if data[1] == proto.REPORT_BUTTONS_ACCEL: self.accel = proto.ACCEL.unpack_from(data, proto.OFFSET_PAYLOAD)
+        self._set_buttons(proto.parse_buttons(data))
+
+    def _set_buttons(self, buttons):
+        if buttons != self.buttons:
+            self.buttons = buttons
+            if self.on_buttons: self.on_buttons(buttons)
+
+    def _on_extended_report(self, data):
+        proto.parse_ir_extended(data, self.frame)
+        self.accel = self.frame.accel
+        self._set_buttons(self.frame.buttons)
+        self._frame_done()
+
+    def _on_full_report(self, data):
+        complete = proto.parse_ir_full(data, self.frame)
+        self._set_buttons(self.frame.buttons)
+        if complete: self._frame_done()
+
+    def _frame_done(self):
+        self.timestamp = time.time()
+        self.frames += 1
+        if self.on_frame: self.on_frame(self.frame)
+
+    def close(self):
+        self.running = False
+        for sock in (self.receivesocket, self.controlsocket):
+            if sock:
+                try: sock.close()
+                except OSError: pass
+        self.receivesocket = self.controlsocket = None
+
+    def __enter__(self): return self
+    def __exit__(self, exc_type, exc_val, exc_tb): self.close()
+
+def _sensitivity(text):
+    return text if text == 'marcan' else int(text)
+
+def main():
+    from wiinux import setup_logging
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Wii Remote IR camera over raw L2CAP")
+    parser.add_argument("address")
+    parser.add_argument("--mode", choices=list(MODES), default="extended")
+    parser.add_argument("--sensitivity", type=_sensitivity, default=3, help="1-5 or marcan")
+    args = parser.parse_args()
+
+    state = {'last': 0.0, 'count': 0, 'start': time.time()}
+
+    def show(frame):
+        state['count'] += 1
+        now = time.time()
+        if now - state['last'] < 0.05: return
+        state['last'] = now
+        rate = state['count'] / max(1e-6, now - state['start'])
+        blobs = " ".join(f"P{i}:({x:4d},{y:4d}) s{s:2d}" + (f" i{n:3d}" if frame.full else "")
+                         for i, x, y, s, n in frame.blobs()) or "no blobs"
+        sys.stdout.write(f"\r{rate:5.1f} fps | {blobs}        ")
+        sys.stdout.flush()
+
+    remote = WiimoteIR(args.mode, args.sensitivity, on_frame=show)
+    if not remote.connect(args.address): sys.exit(1)
+    try: remote.loop()
+    except KeyboardInterrupt: print()
+    finally: remote.close()
+
+if __name__ == "__main__":
+    main()
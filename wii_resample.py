@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Streaming Resampler / Decimator for Wii device streams (NumPy).
+
+Wii devices report at irregular intervals over Bluetooth and evdev only
+emits changed values. This module turns timestamped chunks (board samples,
+IR frames) into a fixed-rate stream:
+
+- StreamResampler(method='linear'): linear interpolation at the output grid.
+- StreamResampler(method='polyphase'): interpolation onto an oversampled
+  grid, then windowed-sinc anti-alias FIR + decimation (only every M-th
+  output is computed).
+- Decimator: anti-alias decimation of an already uniform stream.
+
+All work is vectorized per chunk. Missing values (NaN, e.g. an IR point
+that is not visible) are handled by normalized convolution in the FIR stage.
+Output grids are aligned to absolute multiples of the output period, so
+streams resampled at the same rate share timestamps.
+"""
+
+import math
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+IR_CHANNELS = 8 # p0x, p0y, ... p3x, p3y
+
+def lowpass_taps(factor, width=8, window=np.hamming):
+    """Windowed-sinc low-pass for decimation by `factor` (cutoff = Nyquist / factor)."""
+    half = width * factor // 2
+    n = np.arange(-half, half + 1)
+    taps = np.sinc(n / factor) * window(2 * half + 1)
+    return taps / taps.sum()
+
+class Decimator:
+    """
+    Streaming anti-alias decimator for uniform (n, channels) chunks.
+
+    feed() returns (index, values): `index` is the global input index at the
+    centre of each output (group delay already removed).
+    """
+    def __init__(self, factor, taps=None):
+        if factor < 1: raise ValueError("factor must be >= 1")
+        self.factor = int(factor)
+        self.taps = lowpass_taps(self.factor) if taps is None else np.asarray(taps, dtype=float)
+        if len(self.taps) % 2 == 0: raise ValueError("taps must have odd length")
+        self.delay = (len(self.taps) - 1) // 2
+        self._kernel = self.taps[::-1].copy()
+        self._hist = None
+        self._count = 0 # Input samples seen so far
+        self._phase = self.delay # First window producing output (centre at index 0)
+
+    def reset(self):
+        self._hist = None
+        self._count = 0
+        self._phase = self.delay
+
+    def feed(self, x):
+        x = np.asarray(x, dtype=float)
+        if x.ndim == 1: x = x[:, None]
+        n = len(x)
+        if n == 0:
+            return np.empty(0), np.empty((0, x.shape[1]))
+        if self._hist is None:
+            # Pad start with the first sample to avoid a startup transient
+            self._hist = np.repeat(x[:1], len(self.taps) - 1, axis=0)
+        buf = np.concatenate([self._hist, x])
+        start = self._phase
+        windows = sliding_window_view(buf, len(self.taps), axis=0)[start::self.factor]
+
+        if np.isnan(windows).any():
+            # Normalized convolution: weight only the valid samples
+            valid = ~np.isnan(windows)
+            num = np.einsum('kcl,l->kc', np.where(valid, windows, 0.0), self._kernel)
+            den = np.einsum('kcl,l->kc', valid.astype(float), self._kernel)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                y = np.where(den > 0.5, num / den, np.nan)
+        else:
+            y = np.einsum('kcl,l->kc', windows, self._kernel)
+
+        index = self._count + np.arange(start, n, self.factor) - self.delay
+        # Chunks shorter than the delay produce nothing yet, keep counting down
+        self._phase = start - n if start >= n else (start - n) % self.factor
+        self._count += n
+        self._hist = buf[-(len(self.taps) - 1):] if len(self.taps) > 1 else buf[:0]
+        return index, y
+
+class StreamResampler:
+    """
+    Resamples irregular timestamped chunks to a fixed `rate` (Hz).
+
+    hold_gap: intervals longer than this (s) are treated as "value held"
+    (zero-order hold) instead of interpolated, matching evdev semantics
+    where an unchanged value produces no event.
+    """
+    def __init__(self, rate, channels, method='linear', oversample=8, taps=None, hold_gap=0.05):
+        if method not in ('linear', 'polyphase'):
+            raise ValueError(f"Unknown method: {method}")
+        self.rate = float(rate)
+        self.channels = channels
+        self.method = method
+        self.hold_gap = hold_gap
+        self.oversample = oversample if method == 'polyphase' else 1
+        self._grid_period = 1.0 / (self.rate * self.oversample)
+        self._decimator = Decimator(self.oversample, taps) if method == 'polyphase' else None
+        self._origin = None # Time of fine grid index 0
+        self._next = None   # Next fine grid index to interpolate
+        self._last_t = None
+        self._last_v = None
+
+    def reset(self):
+        self._origin = self._next = self._last_t = self._last_v = None
+        if self._decimator: self._decimator.reset()
+
+    def _empty(self):
+        return np.empty(0), np.empty((0, self.channels))
+
+    def _interpolate(self, ts, values):
+        if self._last_t is not None:
+            ts = np.concatenate([[self._last_t], ts])
+            values = np.concatenate([self._last_v[None, :], values])
+        if self._origin is None:
+            # Align output to absolute multiples of the output period
+            out_period = 1.0 / self.rate
+            self._origin = math.ceil(ts[0] / out_period) * out_period
+            self._next = 0
+        self._last_t, self._last_v = ts[-1], values[-1].copy()
+        if len(ts) < 2: return self._empty()
+
+        last_index = math.floor((ts[-1] - self._origin) / self._grid_period + 1e-9)
+        if last_index < self._next: return self._empty()
+        index = np.arange(self._next, last_index + 1)
+        self._next = last_index + 1
+        grid = self._origin + index * self._grid_period
+
+        i = np.clip(np.searchsorted(ts, grid, side='right') - 1, 0, len(ts) - 2)
+        t0, t1 = ts[i], ts[i + 1]
+        dt = t1 - t0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            w = np.where(dt > 0, (grid - t0) / dt, 0.0)
+        if self.hold_gap is not None:
+            w = np.where((dt > self.hold_gap) & (w < 1.0), 0.0, w)
+        w = np.clip(w, 0.0, 1.0)[:, None]
+        v0, v1 = values[i], values[i + 1]
+        # Where the next sample is missing, hold instead of propagating NaN
+        out = np.where(np.isnan(v1) & (w < 1.0), v0, v0 + (v1 - v0) * w)
+        out = np.where(w >= 1.0, v1, out)
+        return index, out
+
+    def feed(self, ts, values):
+        """
+        Feeds a chunk: ts shape (n,), values shape (n, channels) or (n,).
+        Returns (out_ts, out_values) for every output instant now covered.
+        """
+        ts = np.asarray(ts, dtype=float)
+        values = np.asarray(values, dtype=float).reshape(len(ts), self.channels)
+        if self._last_t is not None:
+            # Late samples (older than what was already consumed) are dropped
+            keep = ts > self._last_t
+            if not keep.all(): ts, values = ts[keep], values[keep]
+        if len(ts) == 0: return self._empty()
+        index, fine = self._interpolate(ts, values)
+        if self._decimator is None:
+            return self._origin + index * self._grid_period, fine
+        if len(fine) == 0: return self._empty()
+        index, out = self._decimator.feed(fine)
+        return self._origin + index * self._grid_period, out
+
+    def hold_until(self, t):
+        """Extends the last value up to time t (idle device, no new events)."""
+        if self._last_t is None or t <= self._last_t: return self._empty()
+        return self.feed([t], self._last_v[None, :])
+
+# --- Adapters for library data ---
+
+def board_chunk(samples):
+    """[(ts, [TR, BR, TL, BL]), ...] from WiiboardNative.read_samples() -> (ts, values)."""
+    if not samples: return np.empty(0), np.empty((0, 4))
+    ts = np.fromiter((s[0] for s in samples), dtype=float, count=len(samples))
+    values = np.array([s[1] for s in samples], dtype=float)
+    return ts, values
+
+def ir_frame_row(points):
+    """WiiEyeNative.points -> 8 values, NaN for points that are not visible."""
+    row = []
+    for p in points:
+        row.extend(p if p else (math.nan, math.nan))
+    return row
+
+def ir_row_points(row):
+    """Inverse of ir_frame_row (rounded to sensor pixels)."""
+    points = []
+    for i in range(0, IR_CHANNELS, 2):
+        x, y = row[i], row[i + 1]
+        points.append(None if math.isnan(x) or math.isnan(y) else [int(round(x)), int(round(y))])
+    return points
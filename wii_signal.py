@@ -0,0 +1,369 @@
+"""
+IR signal processing shared by the live drivers and the offline tools:
+VLC (Morse) decoding, bit-clock estimation, point stability and pulse
+monitoring.
+
+Pure Python (no evdev / Bluetooth), so analysis, replay and chart tools
+import it on any machine.
+"""
+
+import os
+import sys
+import math
+import time
+import argparse
+import threading
+import collections
+
+# --- Utility: Morse Decoder with Integrator ---
+
+class MorseDecoder:
+    def __init__(self, bit_duration=0.1, callback=None, trace=True, threshold=0.05, aligned_threshold=0.5):
+        self.bit_duration = bit_duration
+        self.callback = callback
+        self.trace = trace # Print the live bit trace to stdout
+        # Active share for a 1: sensitive (5%) to catch fast remotes with free-running
+        # windows, aligned_threshold (majority) once retune() aligned the windows to the bit clock
+        self.threshold = threshold
+        self.aligned_threshold = aligned_threshold
+        self.buffer = []
+        self.lock = threading.Lock()
+        
+        self.last_update_time = time.time()
+        self.accumulated_active_time = 0.0
+        self.current_bit_progress = 0.0
+        self.is_currently_active = False
+
+    def feed(self, detected, now=None):
+        # `now` lets replays drive the decoder with capture timestamps
+        if now is None: now = time.time()
+        dt = now - self.last_update_time
+        self.last_update_time = now
+
+        was_active = self.is_currently_active
+        if was_active:
+            self.accumulated_active_time += dt
+        
+        self.current_bit_progress += dt
+        self.is_currently_active = detected
+
+        if self.current_bit_progress >= self.bit_duration:
+            # The part of this step past the bit end belongs to the next bit
+            # (dropping it made the windows drift by up to a frame per bit)
+            over = self.current_bit_progress - self.bit_duration
+            if over >= self.bit_duration: over = 0.0 # Long gap: restart the clock
+            carry = min(over, dt) if was_active else 0.0
+            self.current_bit_progress -= over
+            self.accumulated_active_time -= carry
+            self._emit()
+            self.current_bit_progress, self.accumulated_active_time = over, carry
+
+    def _emit(self):
+        bit = 1 if (self.accumulated_active_time / self.current_bit_progress) > self.threshold else 0
+
+        with self.lock:
+            self.buffer.append(bit)
+            self._check_buffer()
+
+        self.current_bit_progress = 0
+        self.accumulated_active_time = 0
+
+    def retune(self, bit_duration, boundary=None):
+        """
+        New bit period (e.g. from BitClockEstimator). `boundary`: a bit start
+        time on the feed clock; the bit windows are shifted onto it.
+        """
+        self.bit_duration = bit_duration
+        if boundary is None: return
+        self.threshold = self.aligned_threshold
+        # Shortest shift onto the boundary grid: negative = the last bit ended early
+        progress = (self.last_update_time - boundary) % bit_duration
+        shift = (progress - self.current_bit_progress + bit_duration / 2) % bit_duration - bit_duration / 2
+        self.current_bit_progress += shift
+        if self.current_bit_progress >= bit_duration:
+            over = self.current_bit_progress - bit_duration
+            self.current_bit_progress = bit_duration
+            self._emit()
+            self.current_bit_progress = over
+        self.accumulated_active_time = min(self.accumulated_active_time, max(0.0, self.current_bit_progress))
+
+    def reset(self, now=None):
+        """Drops partial bits, e.g. after a gap in the input stream."""
+        with self.lock:
+            self.buffer = []
+        self.last_update_time = time.time() if now is None else now
+        self.accumulated_active_time = 0.0
+        self.current_bit_progress = 0.0
+        self.is_currently_active = False
+
+    def _check_buffer(self):
+        if self.trace and len(self.buffer) > 0:
+            stream = "".join(map(str, self.buffer[-20:]))
+            sys.stdout.write(f"\r[VLC Trace: ...{stream}]    ")
+            sys.stdout.flush()
+
+        if len(self.buffer) >= 10:
+            while len(self.buffer) >= 10:
+                if self.buffer[0] == 1 and self.buffer[9] == 0:
+                    data_bits = self.buffer[1:9]
+                    val = 0
+                    for i, b in enumerate(data_bits):
+                        val |= (b << (7 - i))
+                    if self.callback: self.callback(val)
+                    self.buffer = self.buffer[10:]
+                    break
+                else:
+                    self.buffer.pop(0)
+
+# --- Utility: Signal Stability Monitor ---
+
+class StabilityMonitor:
+    """
+    Tracks if coordinates are stable or jumping wildly.
+    Jumping points = Noise/Movement. Stable points = Signal.
+    """
+    def __init__(self, radius=50):
+        self.radius = radius
+        self.anchor_point = None
+        self.last_seen_time = 0
+        self.stability_factor = 0.0 # 0.0 to 1.0
+        self._history = [] # Bool: was it stable?
+
+    def feed(self, p, now=None):
+        if now is None: now = time.time()
+        is_stable = False
+        
+        if p is None:
+            if now - self.last_seen_time > 0.5:
+                self.anchor_point = None
+        else:
+            if self.anchor_point is None:
+                self.anchor_point = p
+                is_stable = True
+            else:
+                dist = math.sqrt((p[0]-self.anchor_point[0])**2 + (p[1]-self.anchor_point[1])**2)
+                if dist < self.radius:
+                    is_stable = True
+                else:
+                    # Point jumped! Update anchor but mark as jitter
+                    self.anchor_point = p
+            self.last_seen_time = now
+
+        self._history.append(is_stable)
+        if len(self._history) > 100: self._history.pop(0)
+        self.stability_factor = sum(self._history) / len(self._history)
+        return is_stable
+
+# --- Utility: IR Pulse Monitor ---
+
+class PulseMonitor:
+    def __init__(self, verbose=True):
+        self.last_state = False
+        self.last_change_time = time.time()
+        self.is_valid = False # Only print if SF is high
+        self.verbose = verbose
+
+    def feed(self, detected, is_stable, now=None):
+        if now is None: now = time.time()
+        trigger = detected and is_stable
+        if trigger != self.last_state:
+            duration_ms = (now - self.last_change_time) * 1000
+            label = "HOT " if self.last_state else "COLD"
+            if self.verbose and duration_ms > 2: 
+                # Print only pulses, avoid status line mess
+                sys.stdout.write(f"\n[Pulse: {label} {duration_ms:4.0f}ms]\n")
+            self.last_state = trigger
+            self.last_change_time = now
+
+# --- Utility: VLC Bit-Clock Estimator ---
+
+RANDOM_FIT = 0.6 / math.sqrt(12) # Residual / T limit: 60% of what random durations give
+
+class BitClockEstimator:
+    """
+    Infers an emitter's bit period and phase from HOT/COLD transitions, so the
+    MorseDecoder needs no hand-set bit duration.
+
+    Every run and every edge-to-edge interval (rising to rising, falling to
+    falling) is close to a whole number of bits. Runs carry a constant skew
+    (HOT longer, COLD shorter by the same amount: exposure, frame
+    quantisation), edge intervals do not. Per candidate period (frequent and
+    short run lengths divided by 1..10) d = k * T +- skew is fitted by least
+    squares; any T / n fits as well as T, so the longest period with a small
+    residual wins (GCD). The residual allowed grows with the frame period
+    (edges are quantised to frames) and the skew is bounded by `max_skew`, else
+    patterns with few distinct run lengths fit skewed periods exactly. A fit
+    must also clearly beat random durations (residual T / sqrt(12)), so
+    irregular pulses (hand movement) never lock. The phase is the mean of the recent rising edges modulo T.
+
+    Feed it the raw detection with the frame timestamps (kernel time on the
+    evdev path); flicker shorter than `glitch` s is ignored. `state` is that
+    debounced detection, `latency` its mean delay behind the edges: a decoder
+    fed with `state` aligns to `boundary`.
+    """
+    def __init__(self, min_bit=0.02, max_bit=1.0, glitch=0.015, tolerance=0.08, max_skew=0.015,
+                 history=48, min_runs=6, resolution=0.005):
+        self.min_bit = min_bit
+        self.max_bit = max_bit
+        self.glitch = glitch
+        self.tolerance = tolerance   # Max. residual RMS relative to T (+ half a frame)
+        self.max_skew = max_skew     # s
+        self.min_runs = min_runs
+        self.resolution = resolution # Histogram bin (s)
+        self.state = False
+        self.runs = collections.deque(maxlen=history)  # (duration, +1 HOT / -1 COLD / 0 edge interval)
+        self.rising = collections.deque(maxlen=16)
+        self.histogram = {True: collections.Counter(), False: collections.Counter()} # bin -> count
+        self.bit_duration = None
+        self.phase = None  # Time of a bit boundary (a rising edge)
+        self.skew = 0.0    # HOT runs are longer by this much, COLD runs shorter
+        self.jitter = 0.0  # RMS of the rising edges around the phase
+        self.error = None  # Residual RMS / T of the current estimate
+        self.frame_period = 0.0 # Smoothed feed interval
+        self.latency = 0.0      # Smoothed delay of `state` behind the edges
+        self._now = None
+        self._pending = None
+        self._edge = None
+        self._last = {True: None, False: None}
+
+    @property
+    def locked(self):
+        return self.bit_duration is not None
+
+    @property
+    def boundary(self):
+        """Bit start for a MorseDecoder fed with `state` (skew centred on the windows)."""
+        return self.phase + self.latency + self.skew / 2
+
+    def feed(self, detected, now):
+        """One frame. True when the estimate was updated (on an accepted edge)."""
+        if self._now is not None and now > self._now:
+            dt = now - self._now
+            self.frame_period = dt if not self.frame_period else 0.9 * self.frame_period + 0.1 * dt
+        self._now = now
+        if detected == self.state:
+            self._pending = None
+            return False
+        if self._pending is None:
+            self._pending = now
+            return False
+        if now - self._pending < self.glitch: return False
+        t, self._pending = self._pending, None
+        self.state = detected
+        self.latency = 0.9 * self.latency + 0.1 * (now - t) if self.latency else now - t
+        return self._on_edge(detected, t)
+
+    def restart(self, state=None):
+        """After a gap in the input (e.g. evdev overrun): runs spanning it are not measured."""
+        if state is not None: self.state = state
+        self._pending = self._edge = None
+        self._last = {True: None, False: None}
+
+    def _on_edge(self, rising, t):
+        if self._edge is not None:
+            self._add(t - self._edge, -1 if rising else 1)
+        if self._last[rising] is not None:
+            self._add(t - self._last[rising], 0)
+        self._edge = self._last[rising] = t
+        if rising: self.rising.append(t)
+        return self._estimate()
+
+    def _add(self, d, sign):
+        if d > 16 * self.max_bit: return # Idle gap, no bit information
+        self.runs.append((d, sign))
+        if sign: self.histogram[sign > 0][round(d / self.resolution)] += 1
+
+    def _candidates(self):
+        lengths = sorted(d for d, sign in self.runs)[:3]
+        for hist in self.histogram.values():
+            lengths += [b * self.resolution for b, n in hist.most_common(3)]
+        if self.bit_duration: lengths.append(self.bit_duration)
+        found = set()
+        for d in lengths:
+            for k in range(1, 11):
+                if self.min_bit <= d / k <= self.max_bit: found.add(round(d / k, 3))
+        return sorted(found, reverse=True)
+
+    def _fit(self, period):
+        """(T, skew, relative residual) for the runs rounded to multiples of `period`."""
+        T, skew = period, 0.0
+        for _ in range(2):
+            rows = [(max(1, round((d - sign * skew) / T)), sign, d) for d, sign in self.runs]
+            skk = sum(k * k for k, s, d in rows)
+            sks = sum(k * s for k, s, d in rows)
+            sss = sum(s * s for k, s, d in rows)
+            skd = sum(k * d for k, s, d in rows)
+            ssd = sum(s * d for k, s, d in rows)
+            det = skk * sss - sks * sks
+            if det > 1e-12:
+                T, skew = (skd * sss - ssd * sks) / det, (skk * ssd - sks * skd) / det
+            else:
+                T, skew = skd / skk, 0.0
+            if T <= 0: return T, skew, float('inf')
+        rms = math.sqrt(sum((d - k * T - s * skew) ** 2 for k, s, d in rows) / len(rows))
+        return T, skew, rms / T
+
+    def _estimate(self):
+        if len(self.runs) < self.min_runs: return False
+        for candidate in self._candidates():
+            T, skew, error = self._fit(candidate)
+            if not self.min_bit <= T <= self.max_bit or abs(skew) > min(self.max_skew, T / 4): continue
+            if error <= min(self.tolerance + 0.5 * self.frame_period / T, RANDOM_FIT):
+                self.bit_duration, self.skew, self.error = T, skew, error
+                self._update_phase()
+                return True
+        return False
+
+    def _update_phase(self):
+        T, ref = self.bit_duration, self.rising[-1]
+        # Rising edges span many bits: their slope refines T beyond the run fit
+        ns = [round((t - ref) / T) for t in self.rising]
+        if len(set(ns)) > 2:
+            mn, mt = sum(ns) / len(ns), sum(self.rising) / len(ns)
+            slope = (sum((n - mn) * (t - mt) for n, t in zip(ns, self.rising))
+                     / sum((n - mn) ** 2 for n in ns))
+            if abs(slope - T) < 0.02 * T: self.bit_duration = T = slope
+        offsets = [(t - ref + T / 2) % T - T / 2 for t in self.rising]
+        mean = sum(offsets) / len(offsets)
+        self.phase = ref + mean
+        self.jitter = math.sqrt(sum((o - mean) ** 2 for o in offsets) / len(offsets))
+
+    def histogram_ms(self, hot=True):
+        """[(run length ms, count)] sorted by length."""
+        return [(b * self.resolution * 1000, n) for b, n in sorted(self.histogram[hot].items())]
+
+    def summary(self):
+        if not self.locked: return f"no lock ({len(self.runs)} runs)"
+        return (f"bit {self.bit_duration * 1000:.1f} ms, skew {self.skew * 1000:+.1f} ms, "
+                f"jitter {self.jitter * 1000:.1f} ms, residual {self.error * 100:.1f}% ({len(self.runs)} runs)")
+
+def estimate_bit_clock(frames, point=0, **kwargs):
+    """Offline: BitClockEstimator fed with (ts, frame) pairs (e.g. wii_transport.iter_capture)."""
+    clock = BitClockEstimator(**kwargs)
+    for t, frame in frames:
+        clock.feed(frame[point] is not None, t)
+    return clock
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate the VLC bit clock of IR captures")
+    parser.add_argument("captures", nargs="+", help="Capture files (CSV / .wcap / .wfc)")
+    parser.add_argument("--point", type=int, default=0, choices=range(4))
+    parser.add_argument("--min-bit", type=float, default=0.02, help="s")
+    parser.add_argument("--max-bit", type=float, default=1.0, help="s")
+    parser.add_argument("--histogram", action="store_true", help="Print the HOT/COLD run histograms")
+    args = parser.parse_args()
+
+    from wii_transport import iter_capture
+    for path in args.captures:
+        kind, frames = iter_capture(path)
+        if kind != 'ir':
+            print(f"{os.path.basename(path)}: not an IR capture")
+            continue
+        clock = estimate_bit_clock(frames, args.point, min_bit=args.min_bit, max_bit=args.max_bit)
+        print(f"{os.path.basename(path)}: {clock.summary()}")
+        if args.histogram:
+            for hot in (True, False):
+                print(f"  {'HOT ' if hot else 'COLD'}: " + " ".join(f"{ms:.0f}ms x{n}" for ms, n in clock.histogram_ms(hot)))
+
+if __name__ == "__main__":
+    main()
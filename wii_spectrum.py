@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Streaming Spectral Analysis of Balance Board sway (NumPy).
+
+Board samples (irregular, kg per sensor) are resampled to a fixed rate
+(wii_resample.StreamResampler) and turned into channels: centre of pressure
+X / Y (cm, wii_sync geometry), total weight and the four sensors. Each board
+keeps a sliding-window Welch PSD:
+
+- every `hop` new samples the last `segment` samples are detrended,
+  Hann-windowed and transformed (rfft) - one periodogram per hop, the
+  history is never reprocessed,
+- the PSD is the mean of the last `segments` periodograms (ring buffer and
+  running sum, all preallocated),
+- segments with an empty board (CoP undefined) are not averaged.
+
+Band powers (integrated PSD: cm^2 for the CoP, kg^2 for weights) and peak /
+mean / median frequency are available after every hop. Default bands: slow
+and fast sway, rest (3-7 Hz), physiological (8-12 Hz) and orthostatic
+(13-18 Hz) tremor; the default 50 Hz rate resolves up to 25 Hz.
+
+    spectra = BoardSpectra()
+    spectra.feed(batch)                    # SampleBatch from any board transport
+    spectra.boards[device].features()      # {'cop_x_tremor_rest': ..., ...}
+
+    python wii_spectrum.py sim-board --seconds 60
+    python wii_spectrum.py replay:board_capture.csv -o features.csv
+"""
+
+import csv
+import sys
+import time
+import argparse
+import numpy as np
+
+from wii_resample import StreamResampler
+from wii_sync import SENSOR_SPACING_X, SENSOR_SPACING_Y, MIN_COP_MASS
+
+CHANNELS = ('cop_x', 'cop_y', 'total', 'top_right', 'bottom_right', 'top_left', 'bottom_left')
+DEFAULT_RATE = 50.0 # Hz
+DEFAULT_SEGMENT = 512 # samples: 10.24 s, 0.1 Hz resolution at 50 Hz
+DEFAULT_BANDS = (
+    ('sway_slow', 0.05, 0.5),
+    ('sway_fast', 0.5, 2.0),
+    ('tremor_rest', 3.0, 7.0),
+    ('tremor_physiological', 8.0, 12.0),
+    ('tremor_orthostatic', 13.0, 18.0),
+)
+FEATURE_RANGE = (0.05, 20.0) # Hz, total power and peak / mean / median frequency
+
+def board_channels(sensors):
+    """(n, 4) kg TR, BR, TL, BL -> (n, len(CHANNELS)) and the occupied mask (CoP defined)."""
+    tr, br, tl, bl = sensors.T
+    total = tr + br + tl + bl
+    occupied = total >= MIN_COP_MASS
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x = np.where(occupied, ((tr + br) - (tl + bl)) / total * (SENSOR_SPACING_X / 2), 0.0)
+        y = np.where(occupied, ((tr + tl) - (br + bl)) / total * (SENSOR_SPACING_Y / 2), 0.0)
+    return np.column_stack((x, y, total, sensors)), occupied
+
+class SwaySpectrum:
+    """Sliding-window Welch PSD of one board (see module doc)."""
+    def __init__(self, rate=DEFAULT_RATE, segment=DEFAULT_SEGMENT, overlap=0.5, segments=6,
+                 bands=DEFAULT_BANDS, window=np.hanning):
+        if not 0.0 <= overlap < 1.0: raise ValueError("overlap must be in [0, 1)")
+        self.rate = float(rate)
+        self.segment = int(segment)
+        self.hop = max(1, int(round(self.segment * (1.0 - overlap))))
+        self.segments = int(segments)
+        self.bands = tuple(bands)
+        self.freqs = np.fft.rfftfreq(self.segment, 1.0 / self.rate)
+        self.df = self.freqs[1]
+        self.on_update = None # Called with this spectrum after every PSD update
+        self.ts = None        # Time of the last sample of the last segment
+        self.updates = 0
+        self.skipped = 0      # Segments not averaged (empty board)
+        w = window(self.segment)
+        self._window = w[:, None]
+        # One-sided density: x2 except DC (and Nyquist for even lengths)
+        scale = np.full(len(self.freqs), 2.0 / (self.rate * np.sum(w * w)))
+        scale[0] /= 2
+        if self.segment % 2 == 0: scale[-1] /= 2
+        self._scale = scale[:, None]
+        self._bands = np.array([(self.freqs >= lo) & (self.freqs < hi) for name, lo, hi in self.bands], dtype=float)
+        lo, hi = FEATURE_RANGE
+        self._range = (self.freqs >= lo) & (self.freqs <= hi)
+        n, nf = len(CHANNELS), len(self.freqs)
+        self._resampler = StreamResampler(self.rate, 4)
+        # Doubled ring: buf[pos:pos + segment] always holds the last `segment` samples in order
+        self._buf = np.zeros((2 * self.segment, n))
+        self._occupied = np.zeros(2 * self.segment, dtype=bool)
+        self._work = np.empty((self.segment, n))
+        self._pos = 0
+        self._filled = 0
+        self._since_hop = 0
+        self._ring = np.zeros((self.segments, nf, n)) # Periodograms
+        self._sum = np.zeros((nf, n))
+        self._slot = 0
+        self._count = 0
+        self.band_power = np.zeros((len(self.bands), n))
+
+    def feed(self, batch):
+        """SampleBatch of this board; returns the number of PSD updates."""
+        if not batch.ts: return 0
+        return self.feed_samples(batch.ts, batch.values)
+
+    def feed_samples(self, ts, values):
+        out_ts, sensors = self._resampler.feed(ts, values)
+        if not len(out_ts): return 0
+        rows, occupied = board_channels(sensors)
+        updates, i, m = 0, 0, len(rows)
+        while i < m:
+            k = min(m - i, self.hop - self._since_hop)
+            self._write(rows[i:i + k], occupied[i:i + k])
+            i += k
+            self._since_hop += k
+            if self._since_hop == self.hop:
+                self._since_hop = 0
+                if self._filled >= self.segment and self._update(out_ts[i - 1]): updates += 1
+        return updates
+
+    def _write(self, rows, occupied):
+        seg, pos = self.segment, self._pos
+        self._filled = min(seg, self._filled + len(rows))
+        while len(rows):
+            k = min(len(rows), seg - pos)
+            self._buf[pos:pos + k] = self._buf[pos + seg:pos + seg + k] = rows[:k]
+            self._occupied[pos:pos + k] = self._occupied[pos + seg:pos + seg + k] = occupied[:k]
+            rows, occupied, pos = rows[k:], occupied[k:], (pos + k) % seg
+        self._pos = pos
+
+    def _update(self, ts):
+        seg = self._buf[self._pos:self._pos + self.segment]
+        if not self._occupied[self._pos:self._pos + self.segment].all():
+            self.skipped += 1
+            return False
+        work = self._work
+        np.subtract(seg, seg.mean(axis=0), out=work)
+        work *= self._window
+        spectrum = np.fft.rfft(work, axis=0)
+        slot = self._ring[self._slot]
+        self._sum -= slot
+        np.multiply(spectrum.real ** 2 + spectrum.imag ** 2, self._scale, out=slot)
+        self._sum += slot
+        self._slot = (self._slot + 1) % self.segments
+        self._count = min(self._count + 1, self.segments)
+        if self._slot == 0: np.sum(self._ring, axis=0, out=self._sum) # No drift from the running sum
+        np.dot(self._bands, self._sum, out=self.band_power)
+        self.band_power *= self.df / self._count
+        self.ts = ts
+        self.updates += 1
+        if self.on_update: self.on_update(self)
+        return True
+
+    @property
+    def ready(self):
+        return self._count > 0
+
+    @property
+    def psd(self):
+        """(len(freqs), len(CHANNELS)) mean periodogram; units^2 / Hz."""
+        return self._sum / max(1, self._count)
+
+    def features(self, channels=('cop_x', 'cop_y')):
+        """Flat dict per channel: band powers, total power, peak / mean / median frequency."""
+        if not self.ready: return {}
+        psd = self.psd[self._range]
+        freqs = self.freqs[self._range]
+        out = {}
+        for name in channels:
+            c = CHANNELS.index(name)
+            p = psd[:, c]
+            total = p.sum()
+            for b, (band, lo, hi) in enumerate(self.bands):
+                out[f"{name}_{band}"] = float(self.band_power[b, c])
+            out[f"{name}_power"] = float(total * self.df)
+            out[f"{name}_peak_hz"] = float(freqs[np.argmax(p)])
+            out[f"{name}_mean_hz"] = float((freqs * p).sum() / total) if total > 0 else 0.0
+            out[f"{name}_median_hz"] = float(freqs[np.searchsorted(np.cumsum(p), total / 2)]) if total > 0 else 0.0
+        return out
+
+class BoardSpectra:
+    """SwaySpectrum per board (device id) of a SampleBatch stream."""
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.boards = {}
+
+    def feed(self, batch):
+        if batch.kind != 'board': return 0
+        spectrum = self.boards.get(batch.device)
+        if spectrum is None: spectrum = self.boards[batch.device] = SwaySpectrum(**self.kwargs)
+        return spectrum.feed(batch)
+
+def main():
+    from wiinux import setup_logging
+    from wii_transport import open_transport, ReplayTransport
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Streaming sway spectrum (Welch PSD, band powers) per board")
+    parser.add_argument("spec", help="Board transport: evdev-board | l2cap:ADDR | replay:FILE | sim-board")
+    parser.add_argument("--seconds", type=float, default=60.0, help="Live sources: duration")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE)
+    parser.add_argument("--segment", type=int, default=DEFAULT_SEGMENT, help="Samples per segment")
+    parser.add_argument("--overlap", type=float, default=0.5)
+    parser.add_argument("--segments", type=int, default=6, help="Periodograms averaged")
+    parser.add_argument("-o", "--output", help="CSV of the features after every update")
+    args = parser.parse_args()
+
+    kwargs = {'speed': None} if args.spec.startswith('replay:') else {}
+    if args.spec == 'sim-board': kwargs['realtime'] = False
+    spectra = BoardSpectra(rate=args.rate, segment=args.segment, overlap=args.overlap, segments=args.segments)
+    out = open(args.output, 'w', newline='') if args.output else None
+    writer = None
+
+    def report(device, spectrum):
+        nonlocal writer
+        features = spectrum.features(('cop_x', 'cop_y', 'total'))
+        print(f"{device} t={spectrum.ts:.1f}: peak {features['cop_x_peak_hz']:.2f} / {features['cop_y_peak_hz']:.2f} Hz | "
+              + " ".join(f"{band} {features[f'cop_x_{band}'] + features[f'cop_y_{band}']:.3g}" for band, lo, hi in spectrum.bands)
+              + " cm^2")
+        if out:
+            if writer is None:
+                writer = csv.DictWriter(out, fieldnames=['device', 'ts'] + list(features))
+                writer.writeheader()
+            writer.writerow({'device': device, 'ts': f"{spectrum.ts:.3f}", **features})
+
+    transport = open_transport(args.spec, **kwargs)
+    replay = isinstance(transport, ReplayTransport)
+    try:
+        with transport:
+            if transport.kind != 'board': sys.exit(f"{args.spec}: not a board source")
+            first = None
+            while True:
+                batch = transport.read()
+                if batch:
+                    if spectra.feed(batch): report(batch.device, spectra.boards[batch.device])
+                    if first is None: first = batch.ts[0]
+                    # Sample time, so the virtual-clock simulator stops as well
+                    if not replay and batch.ts[-1] - first >= args.seconds: break
+                elif replay and transport.finished: break
+                else: time.sleep(0.01)
+    except KeyboardInterrupt: pass
+    finally:
+        if out: out.close()
+
+if __name__ == "__main__":
+    main()
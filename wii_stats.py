@@ -0,0 +1,186 @@
+"""
+Opt-in Latency / Throughput Instrumentation.
+
+WiiEyeNative(stats=...) and WiiboardNative(stats=...) record into a
+StatsRegistry; without one the drivers skip all bookkeeping (a single
+`is None` test per report).
+
+Per device:
+- latency histograms: kernel event timestamp -> frame handled ("frame"),
+  kernel timestamp -> decode callback ("callback"),
+- update() loop iteration time ("loop") and the interval between update()
+  calls ("cadence"),
+- events / frames (SYN_REPORT) totals and per-second rates,
+- coalesced frames (several reports drained in one update(), only the last
+  one reaches the display state), dropped frames and SYN_DROPPED overruns.
+
+snapshot() returns plain dicts; prometheus_text() / serve_prometheus()
+expose the same data in the Prometheus text format.
+"""
+
+import time
+import bisect
+import threading
+
+# Histogram bucket upper bounds (s)
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1) # Last bucket: +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max: self.max = value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding quantile q (coarse, no interpolation)."""
+        if not self.count: return 0.0
+        rank, acc = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= rank: return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def snapshot(self):
+        return {"count": self.count, "sum": self.sum, "max": self.max,
+                "mean": self.sum / self.count if self.count else 0.0,
+                "p50": self.quantile(0.5), "p99": self.quantile(0.99),
+                "buckets": list(zip(self.bounds + (float('inf'),), self.counts))}
+
+class DeviceStats:
+    COUNTERS = ('events', 'frames', 'coalesced', 'dropped', 'syn_dropped', 'callbacks')
+    HISTOGRAMS = ('frame', 'callback', 'loop', 'cadence')
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        self.histograms = {h: Histogram() for h in self.HISTOGRAMS}
+        self.rates = dict.fromkeys(('events', 'frames'), 0.0) # Per second, last full window
+        self._window_start = time.monotonic()
+        self._window_base = dict.fromkeys(('events', 'frames'), 0)
+        self._last_loop = None
+
+    def add(self, counter, n=1):
+        self.counters[counter] += n
+
+    def observe(self, histogram, value):
+        self.histograms[histogram].observe(value)
+
+    def frame(self, kernel_ts, events, now=None):
+        """One complete report (SYN_REPORT) handled; kernel_ts from event.timestamp()."""
+        if now is None: now = time.time()
+        c = self.counters
+        c['frames'] += 1
+        c['events'] += events
+        self.histograms['frame'].observe(max(0.0, now - kernel_ts))
+
+    def callback(self, kernel_ts, now=None):
+        if now is None: now = time.time()
+        self.counters['callbacks'] += 1
+        self.histograms['callback'].observe(max(0.0, now - kernel_ts))
+
+    def loop_start(self):
+        t = time.perf_counter()
+        if self._last_loop is not None: self.histograms['cadence'].observe(t - self._last_loop)
+        self._last_loop = t
+        return t
+
+    def loop_end(self, start, frames):
+        """End of one update(): loop time, coalesced reports, per-second rates."""
+        t = time.perf_counter()
+        self.histograms['loop'].observe(t - start)
+        if frames > 1: self.counters['coalesced'] += frames - 1
+        now = time.monotonic()
+        dt = now - self._window_start
+        if dt >= 1.0:
+            for k in self.rates:
+                self.rates[k] = (self.counters[k] - self._window_base[k]) / dt
+                self._window_base[k] = self.counters[k]
+            self._window_start = now
+
+    def snapshot(self):
+        return {"device": self.name, "uptime": time.time() - self.started,
+                "counters": dict(self.counters), "rates": dict(self.rates),
+                "histograms": {k: h.snapshot() for k, h in self.histograms.items()}}
+
+class StatsRegistry:
+    def __init__(self):
+        self.devices = {}
+        self.lock = threading.Lock()
+
+    def device(self, name):
+        with self.lock:
+            stats = self.devices.get(name)
+            if stats is None: stats = self.devices[name] = DeviceStats(name)
+            return stats
+
+    def snapshot(self):
+        with self.lock: devices = list(self.devices.values())
+        return {d.name: d.snapshot() for d in devices}
+
+def resolve_registry(stats):
+    """Driver argument: None/False (off), True (private registry) or a StatsRegistry."""
+    if stats is True: return StatsRegistry()
+    return stats or None
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+def prometheus_text(registry, prefix="wii"):
+    lines = []
+    snap = registry.snapshot()
+    for counter in DeviceStats.COUNTERS:
+        lines.append(f"# TYPE {prefix}_{counter}_total counter")
+        for name, d in snap.items():
+            lines.append(f'{prefix}_{counter}_total{{device="{_label(name)}"}} {d["counters"][counter]}')
+    for rate in ('events', 'frames'):
+        lines.append(f"# TYPE {prefix}_{rate}_per_second gauge")
+        for name, d in snap.items():
+            lines.append(f'{prefix}_{rate}_per_second{{device="{_label(name)}"}} {d["rates"][rate]:.3f}')
+    for hist in DeviceStats.HISTOGRAMS:
+        metric = f"{prefix}_{hist}_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        for name, d in snap.items():
+            h, dev = d["histograms"][hist], _label(name)
+            acc = 0
+            for bound, count in h["buckets"]:
+                acc += count
+                le = "+Inf" if bound == float('inf') else repr(bound)
+                lines.append(f'{metric}_bucket{{device="{dev}",le="{le}"}} {acc}')
+            lines.append(f'{metric}_sum{{device="{dev}"}} {h["sum"]:.9f}')
+            lines.append(f'{metric}_count{{device="{dev}"}} {h["count"]}')
+    return "\n".join(lines) + "\n"
+
+def serve_prometheus(registry, port=9464, host="127.0.0.1"):
+    """Serves /metrics from a daemon thread. Returns the server (call shutdown() to stop)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = prometheus_text(registry).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="wii-metrics").start()
+    return server
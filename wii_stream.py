@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Network Streaming of board samples and IR frames (UDP multicast + WebSocket).
+
+The server reads every transport (wii_transport) once per tick and fans the
+batch out to all subscribers, so clients never cause extra device reads.
+
+Wire format (little endian), one packet per device and tick (split to stay
+below MAX_PACKET bytes):
+  header  '<4sBBHIdB'    magic b'WIIS', version, kind (0 board, 1 IR),
+                         sample count, sequence, base time t0 (s), length
+                         of the device id (bytes, at most 255)
+  device id              UTF-8, e.g. a board MAC '00:1f:32:aa:bb:c1'
+  board   '<i4f'         dt from t0 (us, signed), TR, BR, TL, BL (kg)
+  IR      '<i8H'         dt from t0 (us, signed), p0x, p0y .. p3x, p3y (0xFFFF = no point)
+
+A sample whose dt does not fit (out of order by more than 35 minutes, or a
+batch spanning longer) starts a new packet with its own t0.
+
+UDP: multicast group (or a unicast host for testing), fire-and-forget;
+receivers detect gaps from the sequence numbers.
+WebSocket: same binary packets, or JSON text when the URL ends in ?json.
+Every client has a bounded queue; when it is full the oldest tick is
+dropped (counted), so a slow browser never stalls the others.
+
+usage: wii_stream.py serve SPEC [SPEC ...] [--rate HZ] [--udp GROUP:PORT] [--ws PORT]
+       wii_stream.py listen-udp [GROUP:PORT]
+       wii_stream.py listen-ws [ws://127.0.0.1:8765/]
+"""
+
+import json
+import time
+import base64
+import socket
+import struct
+import asyncio
+import hashlib
+import logging
+import argparse
+import ipaddress
+import collections
+
+from wii_transport import SampleBatch, open_transport
+
+logger = logging.getLogger("wii_accessories")
+
+MAGIC = b'WIIS'
+VERSION = 3 # 2: length-prefixed device id (1 cut it to 16 bytes, merging board MACs), 3: signed dt
+KIND_CODES = {'board': 0, 'ir': 1}
+KIND_NAMES = {v: k for k, v in KIND_CODES.items()}
+HEADER = struct.Struct('<4sBBHIdB')
+MAX_DEVICE_ID = 255
+BOARD_SAMPLE = struct.Struct('<i4f')
+IR_SAMPLE = struct.Struct('<i8H')
+DT_RANGE = (-2 ** 31, 2 ** 31 - 1) # us
+NO_POINT = 0xFFFF
+MAX_PACKET = 1400 # Below a typical MTU
+
+DEFAULT_UDP = ("239.255.42.99", 5007)
+DEFAULT_WS_PORT = 8765
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MAX_WS_FRAME = 1 << 20   # Bytes, larger frames close the connection
+MAX_CLIENT_FRAME = 4096  # Clients only send control frames
+
+# --- Encoding ---
+
+def _ir_fields(frame):
+    out = []
+    for p in frame:
+        out.extend(p if p else (NO_POINT, NO_POINT))
+    return out
+
+def encode_batch(batch, seq):
+    """SampleBatch -> list of packets (bytes). Uses sequence numbers seq, seq+1, ..."""
+    kind = KIND_CODES[batch.kind]
+    sample = BOARD_SAMPLE if kind == 0 else IR_SAMPLE
+    # Cut on a character boundary: a split UTF-8 sequence would not decode
+    device = str(batch.device).encode()[:MAX_DEVICE_ID].decode('utf-8', 'ignore').encode()
+    head = HEADER.size + len(device)
+    per_packet = (MAX_PACKET - head) // sample.size
+    lo, hi = DT_RANGE
+    all_ts, packets = batch.ts, []
+    start, n = 0, len(all_ts)
+    while start < n:
+        t0 = all_ts[start]
+        dts = []
+        for t in all_ts[start:start + per_packet]:
+            dt = int(round((t - t0) * 1e6))
+            if not lo <= dt <= hi: break
+            dts.append(dt)
+        values = batch.values[start:start + len(dts)]
+        buf = bytearray(head + sample.size * len(dts))
+        HEADER.pack_into(buf, 0, MAGIC, VERSION, kind, len(dts), seq & 0xFFFFFFFF, t0, len(device))
+        buf[HEADER.size:head] = device
+        offset = head
+        for dt, v in zip(dts, values):
+            if kind == 0: sample.pack_into(buf, offset, dt, *v)
+            else: sample.pack_into(buf, offset, dt, *_ir_fields(v))
+            offset += sample.size
+        packets.append(bytes(buf))
+        start += len(dts)
+        seq += 1
+    return packets
+
+def decode_packet(data):
+    """Packet -> (seq, SampleBatch). ValueError on foreign or damaged packets."""
+    if len(data) < HEADER.size: raise ValueError("short packet")
+    magic, version, kind, count, seq, t0, id_len = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION or kind not in KIND_NAMES: raise ValueError("not a WIIS packet")
+    sample = BOARD_SAMPLE if kind == 0 else IR_SAMPLE
+    head = HEADER.size + id_len
+    if len(data) < head + count * sample.size: raise ValueError("truncated packet")
+    device = bytes(data[HEADER.size:head])
+    ts, values = [], []
+    for i in range(count):
+        fields = sample.unpack_from(data, head + i * sample.size)
+        ts.append(t0 + fields[0] / 1e6)
+        if kind == 0:
+            values.append(list(fields[1:]))
+        else:
+            xy = fields[1:]
+            values.append([None if xy[j] == NO_POINT else [xy[j], xy[j + 1]] for j in range(0, 8, 2)])
+    return seq, SampleBatch(device.decode(errors='replace'), KIND_NAMES[kind], ts, values)
+
+def batch_json(batch, seq):
+    return json.dumps({"seq": seq, "device": str(batch.device), "kind": batch.kind,
+                       "ts": batch.ts, "values": batch.values}, separators=(',', ':'))
+
+# --- UDP ---
+
+def _parse_hostport(text, default):
+    if not text: return default
+    host, _, port = text.rpartition(':')
+    return (host or default[0], int(port))
+
+def _is_multicast(host):
+    try: return ipaddress.ip_address(host).is_multicast
+    except ValueError: return False
+
+class UdpPublisher:
+    def __init__(self, address=DEFAULT_UDP, ttl=1):
+        self.address = address
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        if _is_multicast(address[0]):
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        self.sent = 0
+        self.dropped = 0 # Packets the kernel refused (send buffer full)
+
+    def send(self, packets):
+        for p in packets:
+            try:
+                self.sock.sendto(p, self.address)
+                self.sent += 1
+            except (BlockingIOError, OSError):
+                self.dropped += 1
+
+    def close(self):
+        self.sock.close()
+
+class UdpSubscriber:
+    """Receives WIIS packets; `lost` counts sequence gaps per device."""
+    def __init__(self, address=DEFAULT_UDP, timeout=1.0):
+        group, port = address
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if _is_multicast(group):
+            self.sock.bind(('', port))
+            mreq = struct.pack('4s4s', socket.inet_aton(group), socket.inet_aton('0.0.0.0'))
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        else:
+            self.sock.bind((group, port))
+        self.sock.settimeout(timeout)
+        self.next_seq = {}
+        self.lost = 0
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def recv(self):
+        """Next SampleBatch, or None on timeout / foreign packet."""
+        try: data = self.sock.recv(65536)
+        except socket.timeout: return None
+        try: seq, batch = decode_packet(data)
+        except ValueError: return None
+        expected = self.next_seq.get(batch.device)
+        if expected is not None and seq != expected:
+            self.lost += (seq - expected) & 0xFFFFFFFF
+        self.next_seq[batch.device] = (seq + 1) & 0xFFFFFFFF
+        return batch
+
+    def close(self):
+        self.sock.close()
+
+# --- WebSocket (RFC 6455, server push only) ---
+
+def _ws_frame(payload, opcode):
+    n = len(payload)
+    if n < 126: head = struct.pack('!BB', 0x80 | opcode, n)
+    elif n < 1 << 16: head = struct.pack('!BBH', 0x80 | opcode, 126, n)
+    else: head = struct.pack('!BBQ', 0x80 | opcode, 127, n)
+    return head + payload
+
+async def _ws_read_frame(reader, limit=MAX_WS_FRAME):
+    """(opcode, payload) of one frame (client frames are masked). ValueError above `limit` bytes."""
+    b0, b1 = await reader.readexactly(2)
+    n = b1 & 0x7F
+    if n == 126: n = struct.unpack('!H', await reader.readexactly(2))[0]
+    elif n == 127: n = struct.unpack('!Q', await reader.readexactly(8))[0]
+    if n > limit: raise ValueError(f"WebSocket frame too large ({n} bytes)")
+    mask = await reader.readexactly(4) if b1 & 0x80 else None
+    payload = await reader.readexactly(n)
+    if mask: payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return b0 & 0x0F, payload
+
+async def _read_http_head(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode(errors='replace').split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            k, v = line.split(':', 1)
+            headers[k.strip().lower()] = v.strip()
+    return lines[0], headers
+
+VIEWER_HTML = """<!doctype html><html><body style="font-family:monospace;background:#111;color:#eee">
+<pre id="out">connecting...</pre><script>
+const ws = new WebSocket(`ws://${location.host}/?json`), last = {};
+ws.onmessage = m => { const d = JSON.parse(m.data); last[d.device] = d;
+  document.getElementById('out').textContent = Object.values(last).map(b =>
+    `${b.device} ${b.kind} seq ${b.seq} ${JSON.stringify(b.values[b.values.length - 1])}`).join('\\n'); };
+</script></body></html>"""
+
+class _WsClient:
+    def __init__(self, writer, as_json, queue_size):
+        self.writer = writer
+        self.as_json = as_json
+        self.queue = collections.deque(maxlen=queue_size) # Ticks; full -> oldest dropped
+        self.event = asyncio.Event()
+        self.dropped = 0
+
+    def push(self, frames):
+        if len(self.queue) == self.queue.maxlen: self.dropped += 1
+        self.queue.append(frames)
+        self.event.set()
+
+class StreamServer:
+    """
+    Reads `transports` once per tick and publishes to UDP and WebSocket
+    subscribers. max_samples: per device and tick, older samples beyond this
+    are dropped (backpressure on bursty sources).
+    """
+    def __init__(self, transports, rate=30.0, udp=None, ws_port=None, ws_host="127.0.0.1",
+                 max_samples=256, queue_size=8, write_limit=1 << 20):
+        self.transports = transports
+        self.period = 1.0 / rate
+        self.udp = UdpPublisher(udp) if udp else None
+        self.ws_port = ws_port
+        self.ws_host = ws_host
+        self.max_samples = max_samples
+        self.queue_size = queue_size
+        self.write_limit = write_limit # Bytes buffered per client before ticks are skipped
+        self.clients = set()
+        self.seq = collections.defaultdict(int)
+        self.ticks = 0
+        self.trimmed = 0 # Samples dropped by max_samples
+        self._server = None
+        self.running = False
+
+    def tick(self):
+        """One read of every transport; returns the published batches."""
+        batches = []
+        for transport in self.transports:
+            batch = transport.read()
+            if not batch: continue
+            if len(batch.ts) > self.max_samples:
+                self.trimmed += len(batch.ts) - self.max_samples
+                batch = batch._replace(ts=batch.ts[-self.max_samples:], values=batch.values[-self.max_samples:])
+            batches.append(batch)
+        for batch in batches:
+            seq = self.seq[batch.device]
+            packets = encode_batch(batch, seq)
+            self.seq[batch.device] = seq + len(packets)
+            if self.udp: self.udp.send(packets)
+            if self.clients:
+                binary = [_ws_frame(p, 0x2) for p in packets]
+                text = None
+                for client in self.clients:
+                    if client.as_json:
+                        if text is None: text = [_ws_frame(batch_json(batch, seq).encode(), 0x1)]
+                        client.push(text)
+                    else:
+                        client.push(binary)
+        self.ticks += 1
+        return batches
+
+    async def _handle(self, reader, writer):
+        try:
+            request, headers = await _read_http_head(reader)
+            path = request.split(' ')[1] if ' ' in request else '/'
+            if headers.get('upgrade', '').lower() != 'websocket':
+                body = VIEWER_HTML.encode()
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Length: "
+                             + str(len(body)).encode() + b"\r\nConnection: close\r\n\r\n" + body)
+                await writer.drain()
+                return
+            accept = base64.b64encode(hashlib.sha1((headers['sec-websocket-key'] + WS_GUID).encode()).digest())
+            writer.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                         b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+            client = _WsClient(writer, path.endswith('?json'), self.queue_size)
+            self.clients.add(client)
+            sender = asyncio.ensure_future(self._send_loop(client))
+            try:
+                while True:
+                    opcode, payload = await _ws_read_frame(reader, MAX_CLIENT_FRAME)
+                    if opcode == 0x8: break
+                    if opcode == 0x9: writer.write(_ws_frame(payload, 0xA))
+            finally:
+                self.clients.discard(client)
+                sender.cancel()
+        except (asyncio.IncompleteReadError, ConnectionError, KeyError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _send_loop(self, client):
+        writer = client.writer
+        while True:
+            await client.event.wait()
+            client.event.clear()
+            while client.queue:
+                frames = client.queue.popleft()
+                if writer.transport.get_write_buffer_size() > self.write_limit:
+                    client.dropped += 1 # Client not keeping up: skip this tick
+                    continue
+                for frame in frames: writer.write(frame)
+            await writer.drain()
+
+    async def serve(self, duration=None):
+        self.running = True
+        if self.ws_port is not None:
+            self._server = await asyncio.start_server(self._handle, self.ws_host, self.ws_port)
+            self.ws_port = self._server.sockets[0].getsockname()[1] # Port 0 -> actual port
+        loop = asyncio.get_running_loop()
+        start = next_tick = loop.time()
+        try:
+            while self.running and (duration is None or loop.time() - start < duration):
+                self.tick()
+                next_tick += self.period
+                await asyncio.sleep(max(0.0, next_tick - loop.time()))
+        finally:
+            self.running = False
+            for client in list(self.clients): client.writer.close() # Lets the handlers finish
+            if self._server:
+                self._server.close()
+                await self._server.wait_closed()
+            await asyncio.sleep(0.05)
+
+    def close(self):
+        if self.udp: self.udp.close()
+
+# --- WebSocket client (tests, Python dashboards) ---
+
+class WebSocketSubscriber:
+    def __init__(self, url=f"ws://127.0.0.1:{DEFAULT_WS_PORT}/"):
+        self.url = url
+        self.reader = self.writer = None
+
+    async def connect(self):
+        rest = self.url.split("://", 1)[1]
+        hostport, _, path = rest.partition('/')
+        host, _, port = hostport.partition(':')
+        self.reader, self.writer = await asyncio.open_connection(host, int(port or 80))
+        key = base64.b64encode(hashlib.sha1(str(time.time()).encode()).digest()[:16]).decode()
+        self.writer.write(f"GET /{path} HTTP/1.1\r\nHost: {hostport}\r\nUpgrade: websocket\r\n"
+                          f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+                          f"Sec-WebSocket-Version: 13\r\n\r\n".encode())
+        status, headers = await _read_http_head(self.reader)
+        if " 101 " not in status: raise ConnectionError(f"WebSocket upgrade refused: {status}")
+        return self
+
+    async def recv(self):
+        """Next (seq, SampleBatch), from binary or JSON feeds."""
+        while True:
+            opcode, payload = await _ws_read_frame(self.reader)
+            if opcode == 0x2: return decode_packet(payload)
+            if opcode == 0x1:
+                d = json.loads(payload)
+                return d["seq"], SampleBatch(d["device"], d["kind"], d["ts"], d["values"])
+            if opcode == 0x8: raise ConnectionError("closed by server")
+
+    async def close(self):
+        if self.writer:
+            self.writer.write(bytes([0x88, 0x80]) + b"\0\0\0\0") # Masked close frame
+            self.writer.close()
+
+def main():
+    from wiinux import setup_logging
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Stream Wii board / IR data over UDP and WebSocket")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    serve = sub.add_parser("serve")
+    serve.add_argument("specs", nargs="+", help="Transports: evdev-board, evdev-ir, l2cap:ADDR, replay:FILE, sim-board, sim-ir")
+    serve.add_argument("--rate", type=float, default=30.0, help="Ticks per second")
+    serve.add_argument("--udp", nargs="?", const=f"{DEFAULT_UDP[0]}:{DEFAULT_UDP[1]}", help="GROUP:PORT (multicast) or HOST:PORT")
+    serve.add_argument("--ws", type=int, nargs="?", const=DEFAULT_WS_PORT, help="WebSocket port")
+    serve.add_argument("--ws-host", default="127.0.0.1")
+    serve.add_argument("--max-samples", type=int, default=256)
+    udp = sub.add_parser("listen-udp")
+    udp.add_argument("address", nargs="?", default=None)
+    ws = sub.add_parser("listen-ws")
+    ws.add_argument("url", nargs="?", default=f"ws://127.0.0.1:{DEFAULT_WS_PORT}/")
+    args = parser.parse_args()
+
+    if args.cmd == "serve":
+        transports = [open_transport(spec) for spec in args.specs]
+        for t in transports:
+            if not t.open(): return print(f"{t.device_id or 'transport'}: device not available")
+        server = StreamServer(transports, args.rate, _parse_hostport(args.udp, DEFAULT_UDP) if args.udp else None,
+                              args.ws, args.ws_host, args.max_samples)
+        print(f"Streaming {len(transports)} source(s) @ {args.rate:.0f} Hz"
+              f"{' | UDP ' + args.udp if args.udp else ''}{f' | ws://{args.ws_host}:{args.ws}/' if args.ws else ''}")
+        try: asyncio.run(server.serve())
+        except KeyboardInterrupt: pass
+        finally:
+            server.close()
+            for t in transports: t.close()
+    elif args.cmd == "listen-udp":
+        sub = UdpSubscriber(_parse_hostport(args.address, DEFAULT_UDP))
+        try:
+            while True:
+                batch = sub.recv()
+                if batch: print(f"\r{batch.device} {batch.kind} {len(batch.ts)} samples | last {batch.values[-1]} | lost {sub.lost}   ", end="")
+        except KeyboardInterrupt: pass
+    else:
+        async def listen():
+            client = await WebSocketSubscriber(args.url).connect()
+            try:
+                while True:
+                    seq, batch = await client.recv()
+                    print(f"\r#{seq} {batch.device} {batch.kind} {len(batch.ts)} samples   ", end="")
+            finally: await client.close()
+        try: asyncio.run(listen())
+        except KeyboardInterrupt: pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Multi-Board Synchronized Acquisition (Native Linux Version)
+
+Reads several Wii Balance Boards on one selector, resamples every board onto
+a common timebase using kernel event timestamps and emits aligned frames
+with a combined Center of Pressure (CoP).
+
+usage: wii_sync.py [--rate HZ] [--spacing CM]
+"""
+
+import time
+import selectors
+import collections
+import argparse
+import logging
+
+logger = logging.getLogger("wii_accessories")
+
+# --- Board geometry (cm) ---
+SENSOR_SPACING_X = 43.3 # Left <-> Right sensor centres
+SENSOR_SPACING_Y = 23.8 # Front <-> Back sensor centres
+BOARD_WIDTH = 51.1
+
+MIN_COP_MASS = 1.0 # kg, below this CoP is undefined
+
+GroupFrame = collections.namedtuple("GroupFrame", "ts sensors weights total cop")
+GroupFrame.__doc__ = """
+One aligned multi-board frame.
+ts: common timebase (kernel clock), sensors: per-board [TR, BR, TL, BL] kg,
+weights: per-board total kg, total: sum of all boards, cop: (x, y) cm or None.
+"""
+
+def center_of_pressure(sensors):
+    """
+    CoP of a single board in cm, relative to the board centre.
+    Sensors order: TR, BR, TL, BL. +X = right, +Y = front (top).
+    """
+    tr, br, tl, bl = sensors
+    total = tr + br + tl + bl
+    if total < MIN_COP_MASS: return None
+    x = ((tr + br) - (tl + bl)) / total * (SENSOR_SPACING_X / 2)
+    y = ((tr + tl) - (br + bl)) / total * (SENSOR_SPACING_Y / 2)
+    return (x, y)
+
+def combined_center_of_pressure(sensors_per_board, positions):
+    """Mass-weighted CoP across boards placed at `positions` (board centres, cm)."""
+    sx = sy = total = 0.0
+    for sensors, (ox, oy) in zip(sensors_per_board, positions):
+        mass = sum(sensors)
+        cop = center_of_pressure(sensors)
+        if cop is None: continue
+        sx += (ox + cop[0]) * mass
+        sy += (oy + cop[1]) * mass
+        total += mass
+    if total < MIN_COP_MASS: return None
+    return (sx / total, sy / total)
+
+class _BoardStream:
+    """Timestamped per-sensor history of one board with linear interpolation."""
+    def __init__(self, board):
+        self.board = board
+        self.history = collections.deque()
+
+    @property
+    def last_ts(self):
+        return self.history[-1][0] if self.history else None
+
+    def push(self, ts, sensors):
+        # Kernel timestamps are monotonic per device, drop anything out of order
+        if self.history and ts <= self.history[-1][0]: return
+        self.history.append((ts, sensors))
+
+    def sample(self, t):
+        h = self.history
+        # Keep one sample at or before t, older ones are never needed again
+        while len(h) > 1 and h[1][0] <= t:
+            h.popleft()
+        t0, s0 = h[0]
+        if t <= t0 or len(h) == 1:
+            return list(s0) # Before first / after last sample: hold
+        t1, s1 = h[1]
+        k = (t - t0) / (t1 - t0)
+        return [a + (b - a) * k for a, b in zip(s0, s1)]
+
+class BoardGroup:
+    """
+    Synchronized acquisition group for N Balance Boards.
+
+    Frames are emitted on a fixed grid (`rate` Hz). A frame at time t is
+    produced once every board has reported past t, or when `max_lag` seconds
+    have elapsed (evdev sends nothing for an unchanged board, so its last
+    value is held).
+    """
+    def __init__(self, boards, rate=100.0, positions=None, max_lag=0.1):
+        self.boards = list(boards)
+        self.period = 1.0 / rate
+        self.max_lag = max_lag
+        if positions is None:
+            positions = [(i * BOARD_WIDTH, 0.0) for i in range(len(self.boards))]
+        if len(positions) != len(self.boards):
+            raise ValueError("positions must match number of boards")
+        self.positions = list(positions)
+        self.streams = [_BoardStream(b) for b in self.boards]
+        self.selector = None
+        self.next_ts = None
+        self.on_frame = None
+
+    @classmethod
+    def discover(cls, **kwargs):
+        """Connects every Balance Board found and returns a group for them."""
+        from Wii_accesories_bib import WiiboardNative, list_board_paths # evdev only when used
+        boards = []
+        for path in list_board_paths():
+            board = WiiboardNative()
+            if board.connect(path): boards.append(board)
+            else: logger.warning(f"Board at {path} skipped (no calibration)")
+        return cls(boards, **kwargs)
+
+    def start(self):
+        self.selector = selectors.DefaultSelector()
+        now = time.time()
+        for stream in self.streams:
+            self.selector.register(stream.board.fileno(), selectors.EVENT_READ, stream)
+            # Seed with the current state so idle boards have a value to hold
+            stream.push(stream.board.timestamp or now, stream.board.sensor_weights())
+        self.next_ts = now
+
+    def close(self):
+        if self.selector:
+            self.selector.close()
+            self.selector = None
+
+    def poll(self, timeout=0.0):
+        """Reads ready boards and returns the list of newly aligned GroupFrames."""
+        if self.selector is None: self.start()
+        for key, _ in self.selector.select(timeout):
+            stream = key.data
+            board = stream.board
+            for ts, raw in board.read_samples():
+                stream.push(ts, board.sensor_weights(raw))
+        return self._emit(time.time())
+
+    def _emit(self, now):
+        horizon = min(s.last_ts for s in self.streams)
+        horizon = max(horizon, now - self.max_lag)
+        frames = []
+        while self.next_ts <= horizon:
+            t = self.next_ts
+            sensors = [s.sample(t) for s in self.streams]
+            weights = [sum(s) for s in sensors]
+            frame = GroupFrame(t, sensors, weights, sum(weights),
+                               combined_center_of_pressure(sensors, self.positions))
+            frames.append(frame)
+            if self.on_frame: self.on_frame(frame)
+            self.next_ts += self.period
+        return frames
+
+    def run(self):
+        """Blocking acquisition loop, frames are delivered through `on_frame`."""
+        try:
+            while True:
+                self.poll(self.period)
+        finally:
+            self.close()
+
+    def __enter__(self): return self
+    def __exit__(self, exc_type, exc_val, exc_tb): self.close()
+
+# --- Interactive Diagnostic ---
+
+def main():
+    from wiinux import setup_logging
+    setup_logging()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=float, default=50.0, help="Output frame rate (Hz)")
+    parser.add_argument("--spacing", type=float, default=BOARD_WIDTH, help="Board centre spacing (cm)")
+    args = parser.parse_args()
+
+    group = BoardGroup.discover(rate=args.rate)
+    if not group.boards:
+        print("No Balance Boards found. Press POWER on each board and retry.")
+        return
+    group.positions = [(i * args.spacing, 0.0) for i in range(len(group.boards))]
+    print(f"Synchronized {len(group.boards)} board(s) at {args.rate:.0f} Hz. CTRL+C to quit.")
+
+    def show(frame):
+        cop = f"({frame.cop[0]:6.1f},{frame.cop[1]:6.1f}) cm" if frame.cop else "(----,----)"
+        per_board = " ".join(f"{w:6.2f}" for w in frame.weights)
+        print(f"\rTotal: {frame.total:6.2f} kg | Boards: {per_board} | CoP: {cop}   ", end="")
+
+    group.on_frame = show
+    try: group.run()
+    except KeyboardInterrupt: pass
+
+if __name__ == "__main__":
+    main()
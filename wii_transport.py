@@ -0,0 +1,520 @@
+#!/usr/bin/env python3
+"""
+Pluggable Transports for Wii devices.
+
+Every transport produces normalized, timestamped SampleBatch objects so the
+analytics (wii_analytics: weight, CoP, IR tracking) are written once and run
+on any of them:
+
+- EvdevBoardTransport / EvdevIRTransport: hid-wiimote kernel driver (evdev).
+- L2capBoardTransport: raw Bluetooth HID (wiiboard.Wiiboard, non-blocking).
+- L2capIRTransport: raw Bluetooth HID IR camera (wii_remote.WiimoteIR).
+- ReplayTransport: wiieye_* / board CSV captures, .wcap containers and .wfc
+  frame streams, real-time or as fast as possible.
+- SimulatorTransport: in-process synthetic board sway / blinking IR emitter.
+
+Batch values:
+  'board': one [TR, BR, TL, BL] list per sample, kg (calibrated, NOT tared).
+  'ir':    one [p0, p1, p2, p3] list per frame, each [x, y] or None.
+
+usage: wii_transport.py SPEC [--seconds N]  (see open_transport)
+"""
+
+import os
+import csv
+import math
+import time
+import random
+import argparse
+import logging
+import collections
+
+from wii_sync import SENSOR_SPACING_X, SENSOR_SPACING_Y
+
+logger = logging.getLogger("wii_accessories")
+
+SampleBatch = collections.namedtuple("SampleBatch", "device kind ts values")
+SampleBatch.__doc__ = "Samples of one device: ts and values are parallel lists."
+
+IR_CODES = range(16, 24) # ABS_HAT0X .. ABS_HAT3Y
+IR_NONE = 1023           # Coordinate reported for an invisible point
+BOARD_CSV_HEADER = ['ts', 'tr', 'br', 'tl', 'bl']
+
+def set_ir_axis(points, code, value):
+    """One IR axis event (ABS_HAT0X .. ABS_HAT3Y) applied to points [p0..p3]; returns the point index."""
+    idx, axis = (code - 16) // 2, (code - 16) % 2
+    cur = list(points[idx] or [IR_NONE, IR_NONE])
+    cur[axis] = value
+    points[idx] = None if cur == [IR_NONE, IR_NONE] else cur
+    return idx
+
+class Transport:
+    """
+    Base transport. read() never blocks: it drains what is available and
+    returns a SampleBatch, or None when there is nothing new. fileno() is
+    the descriptor to register in a selector, or None for transports that
+    must be polled (replay, simulator).
+    """
+    kind = None
+
+    def __init__(self, device_id=None):
+        self.device_id = device_id
+        self.is_open = False
+
+    def open(self):
+        self.is_open = True
+        return True
+
+    def close(self):
+        self.is_open = False
+
+    def fileno(self):
+        return None
+
+    def read(self):
+        raise NotImplementedError
+
+    def _batch(self, ts, values):
+        return SampleBatch(self.device_id, self.kind, ts, values) if ts else None
+
+    def __enter__(self):
+        if not self.open(): raise OSError(f"{type(self).__name__}: device not available")
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb): self.close()
+
+# --- hid-wiimote (evdev) ---
+
+class EvdevBoardTransport(Transport):
+    kind = 'board'
+
+    def __init__(self, path=None, device_id=None, sensor_filter=None):
+        super().__init__(device_id)
+        self.path = path
+        self.sensor_filter = sensor_filter # wii_filter arguments (dict) or SensorFilter
+        self.board = None
+
+    def open(self):
+        from Wii_accesories_bib import WiiboardNative
+        self.board = WiiboardNative(sensor_filter=self.sensor_filter)
+        if not self.board.connect(self.path): return False
+        if self.device_id is None: self.device_id = self.board.board_id or self.board.device.path
+        return super().open()
+
+    def close(self):
+        if self.board and self.board.device: self.board.device.close()
+        super().close()
+
+    def fileno(self):
+        return self.board.fileno()
+
+    def read(self):
+        batch = self.board.read_batch()
+        return self._batch(batch.ts, batch.values) if batch else None
+
+class EvdevIRTransport(Transport):
+    """IR frames straight from the "Nintendo Wii Remote IR" node, one per SYN_REPORT."""
+    kind = 'ir'
+
+    def __init__(self, path=None, device_id=None):
+        super().__init__(device_id)
+        self.path = path
+        self.device = None
+        self.points = [None] * 4
+        self.dropping = False
+        self.overruns = 0
+        self.lost = False
+
+    def open(self):
+        import evdev
+        paths = [self.path] if self.path else evdev.list_devices()
+        for p in paths:
+            dev = evdev.InputDevice(p)
+            if "Nintendo Wii Remote" in dev.name and "IR" in dev.name:
+                self.device = dev
+                if self.device_id is None: self.device_id = dev.uniq or dev.phys or dev.path
+                return super().open()
+            dev.close()
+        return False
+
+    def close(self):
+        if self.device: self.device.close()
+        super().close()
+
+    def fileno(self):
+        return self.device.fd
+
+    def read(self):
+        from evdev import ecodes
+        ts, values = [], []
+        points = self.points
+        while not self.lost:
+            try:
+                for event in self.device.read():
+                    if self.dropping:
+                        # Overrun: skip to the next SYN_REPORT, then re-read the axes (EVIOCGABS)
+                        if event.type == ecodes.EV_SYN and event.code == ecodes.SYN_REPORT:
+                            self.dropping = False
+                            self._resync()
+                            ts.append(event.timestamp())
+                            values.append([list(p) if p else None for p in points])
+                    elif event.type == ecodes.EV_ABS and event.code in IR_CODES:
+                        set_ir_axis(points, event.code, event.value)
+                    elif event.type == ecodes.EV_SYN and event.code == ecodes.SYN_REPORT:
+                        ts.append(event.timestamp())
+                        values.append([list(p) if p else None for p in points])
+                    elif event.type == ecodes.EV_SYN and event.code == ecodes.SYN_DROPPED:
+                        self.dropping = True
+                        self.overruns += 1
+            except BlockingIOError: break
+            except OSError as e:
+                logger.warning(f"IR read failed: {e}")
+                self.lost = True # Device gone: reads return None from now on
+        return self._batch(ts, values)
+
+    def _resync(self):
+        from Wii_accesories_bib import read_abs_state
+        state = read_abs_state(self.device, IR_CODES)
+        if state is None: return
+        self.points[:] = [None] * 4 # In place: read() holds a reference
+        for code in IR_CODES: set_ir_axis(self.points, code, state[code])
+
+# --- Raw Bluetooth (L2CAP) ---
+
+class L2capBoardTransport(Transport):
+    """
+    wiiboard.Wiiboard in non-blocking mode. There are no kernel timestamps
+    on this path, samples are stamped with time.time() on receipt.
+    """
+    kind = 'board'
+
+    def __init__(self, address, device_id=None, timeout=5.0, sensor_filter=None):
+        super().__init__(device_id or address)
+        self.address = address
+        self.timeout = timeout
+        self.sensor_filter = sensor_filter
+        self.board = None
+        self._ts = []
+        self._values = []
+
+    def open(self):
+        import wiiboard # Bluetooth sockets only needed for this backend
+        transport = self
+
+        class _Board(wiiboard.Wiiboard):
+            def on_sample(self, sample):
+                transport._ts.append(time.time())
+                transport._values.append(list(sample.mass))
+
+        self.board = _Board(interactive=False, sensor_filter=self.sensor_filter)
+        if not self.board.connect(self.address, timeout=self.timeout): return False
+        self.board.setblocking(False)
+        return super().open()
+
+    def close(self):
+        if self.board: self.board.close()
+        super().close()
+
+    def fileno(self):
+        return self.board.fileno()
+
+    def read(self):
+        self.board.handle_input()
+        if not self._ts: return None
+        batch = self._batch(self._ts, self._values)
+        self._ts, self._values = [], []
+        return batch
+
+class L2capIRTransport(Transport):
+    """
+    wii_remote.WiimoteIR (raw L2CAP, camera in 'extended' or 'full' mode).
+    Batches carry the points only; blob size / intensity are on
+    transport.remote.frame. Stamped with time.time() on receipt.
+    """
+    kind = 'ir'
+
+    def __init__(self, address, device_id=None, mode='extended', sensitivity=3, timeout=5.0):
+        super().__init__(device_id or address)
+        self.address = address
+        self.mode = mode
+        self.sensitivity = sensitivity
+        self.timeout = timeout
+        self.remote = None
+        self._ts = []
+        self._values = []
+
+    def open(self):
+        from wii_remote import WiimoteIR
+
+        def on_frame(frame):
+            self._ts.append(self.remote.timestamp)
+            self._values.append(frame.points)
+
+        self.remote = WiimoteIR(self.mode, self.sensitivity, on_frame=on_frame)
+        if not self.remote.connect(self.address, timeout=self.timeout): return False
+        self.remote.setblocking(False)
+        return super().open()
+
+    def close(self):
+        if self.remote: self.remote.close()
+        super().close()
+
+    def fileno(self):
+        return self.remote.fileno()
+
+    def read(self):
+        self.remote.handle_input()
+        if not self._ts: return None
+        batch = self._batch(self._ts, self._values)
+        self._ts, self._values = [], []
+        return batch
+
+# --- File replay ---
+
+def _points_from_row(row, keys):
+    points = []
+    for kx, ky in keys:
+        x, y = row.get(kx), row.get(ky)
+        points.append([int(float(x)), int(float(y))] if x not in (None, '') and y not in (None, '') else None)
+    return points
+
+def capture_kind(fields):
+    """'raw', 'ir' (status / record) or 'board' from a capture CSV header, else None."""
+    if 'code' in fields or 'abs_code' in fields: return 'raw'
+    if 'p0x' in fields or 'p0_x' in fields: return 'ir'
+    if fields[:len(BOARD_CSV_HEADER)] == BOARD_CSV_HEADER: return 'board'
+    return None
+
+def _iter_rows(f, reader, kind):
+    fields = reader.fieldnames
+    with f:
+        if kind == 'raw':
+            # Raw evdev events: events sharing a timestamp belong to one frame
+            tkey = 'ts' if 'ts' in fields else 'timestamp'
+            ckey = 'code' if 'code' in fields else 'abs_code'
+            vkey = 'val' if 'val' in fields else 'value'
+            points = [None] * 4
+            frame_t = None
+            for row in reader:
+                t, code, val = float(row[tkey]), int(row[ckey]), int(row[vkey])
+                if frame_t is not None and t != frame_t:
+                    yield frame_t, [list(p) if p else None for p in points]
+                frame_t = t
+                if code in IR_CODES: set_ir_axis(points, code, val)
+            if frame_t is not None:
+                yield frame_t, [list(p) if p else None for p in points]
+        elif kind == 'ir':
+            tkey = 'ts' if 'ts' in fields else 'timestamp'
+            sep = '_' if 'p0_x' in fields else ''
+            keys = [(f"p{i}{sep}x", f"p{i}{sep}y") for i in range(4)]
+            for row in reader:
+                yield float(row[tkey]), _points_from_row(row, keys)
+        else:
+            for row in reader:
+                yield float(row['ts']), [float(row[k]) for k in BOARD_CSV_HEADER[1:]]
+
+def _iter_container(reader):
+    with reader:
+        yield from reader.read()
+
+def _iter_frames(path):
+    from wii_codec import decode_stream
+    with open(path, 'rb') as f:
+        yield from decode_stream(f)
+
+def iter_capture(path):
+    """
+    Streams a capture CSV: returns (kind, iterator of (ts, values)) with kind
+    'ir' or 'board'; rows are read lazily (constant memory).
+    Supported: wiieye_raw_* (ts,code,val), wiieye_status_* (ts,dur,p0x..),
+    wiieye_record_* (timestamp,p0_x..), board CSV (ts,tr,br,tl,bl), .wcap
+    containers (wii_capture) and .wfc frame streams (wii_codec).
+    """
+    if path.endswith('.wcap'):
+        from wii_capture import CaptureReader
+        reader = CaptureReader(path)
+        return reader.kind, _iter_container(reader)
+    if path.endswith('.wfc'):
+        return 'ir', _iter_frames(path)
+    f = open(path, 'r', newline='')
+    reader = csv.DictReader(f)
+    kind = capture_kind(reader.fieldnames or [])
+    if kind is None:
+        f.close()
+        raise ValueError(f"Unknown capture format: {path} ({reader.fieldnames})")
+    return ('board' if kind == 'board' else 'ir'), _iter_rows(f, reader, kind)
+
+def load_capture(path):
+    """Reads a whole capture CSV into (kind, ts list, values list), see iter_capture."""
+    kind, rows = iter_capture(path)
+    ts, values = [], []
+    for t, v in rows:
+        ts.append(t)
+        values.append(v)
+    return kind, ts, values
+
+def write_board_csv(path, batches):
+    """Writes board SampleBatches in the format ReplayTransport reads back."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(BOARD_CSV_HEADER)
+        for batch in batches:
+            for t, v in zip(batch.ts, batch.values):
+                writer.writerow([t] + list(v))
+
+class ReplayTransport(Transport):
+    """
+    Replays a capture file. speed=None: as fast as possible (`chunk` samples
+    per read), speed=1.0: real time, 2.0: twice as fast, ...
+    Original capture timestamps are kept.
+    """
+    def __init__(self, path, speed=None, chunk=256, loop=False, device_id=None):
+        super().__init__(device_id or os.path.basename(path))
+        self.path = path
+        self.speed = speed
+        self.chunk = chunk
+        self.loop = loop
+        self.ts = []
+        self.values = []
+        self.pos = 0
+        self._t0 = None
+        self._wall0 = None
+
+    def open(self):
+        self.kind, self.ts, self.values = load_capture(self.path)
+        self.pos = 0
+        self._t0 = self.ts[0] if self.ts else 0.0
+        self._wall0 = time.monotonic()
+        return super().open()
+
+    @property
+    def finished(self):
+        return self.pos >= len(self.ts) and not self.loop
+
+    def read(self):
+        if self.pos >= len(self.ts):
+            if not self.loop or not self.ts: return None
+            # Restart, keep timestamps increasing across loops
+            shift = self.ts[-1] - self.ts[0] + (self.ts[1] - self.ts[0] if len(self.ts) > 1 else 0.01)
+            self.ts = [t + shift for t in self.ts]
+            self._t0 += shift
+            self._wall0 += shift / (self.speed or 1.0)
+            self.pos = 0
+        if self.speed is None:
+            end = min(len(self.ts), self.pos + self.chunk)
+        else:
+            horizon = self._t0 + (time.monotonic() - self._wall0) * self.speed
+            end = self.pos
+            while end < len(self.ts) and self.ts[end] <= horizon: end += 1
+        batch = self._batch(self.ts[self.pos:end], self.values[self.pos:end])
+        self.pos = end
+        return batch
+
+# --- In-process simulator ---
+
+class SimulatorTransport(Transport):
+    """
+    Synthetic device. 'board': a person of `mass` kg swaying (sway cm) with
+    sensor noise. 'ir': one emitter at `position` blinking VLC `pattern`
+    (bytes framed as 1 + 8 data bits + 0, `bit_duration` s per bit).
+
+    realtime=True paces samples by the wall clock; realtime=False produces
+    `chunk` samples per read on a virtual clock (benchmarks, tests).
+    """
+    def __init__(self, kind='board', rate=100.0, device_id=None, mass=70.0, sway=1.5,
+                 noise=0.05, pattern=None, bit_duration=0.1, position=(512, 384),
+                 jitter=2.0, realtime=True, chunk=256, start_time=None, seed=None):
+        if kind not in ('board', 'ir'): raise ValueError(f"Unknown kind: {kind}")
+        super().__init__(device_id or f"sim-{kind}")
+        self.kind = kind
+        self.period = 1.0 / rate
+        self.mass = mass
+        self.sway = sway
+        self.noise = noise
+        self.bit_duration = bit_duration
+        self.position = position
+        self.jitter = jitter
+        self.realtime = realtime
+        self.chunk = chunk
+        self.rng = random.Random(seed)
+        self.bits = self._frame_bits(pattern) if pattern is not None else None
+        self.t0 = time.time() if start_time is None else start_time
+        self.n = 0
+
+    @staticmethod
+    def _frame_bits(pattern):
+        if isinstance(pattern, int): pattern = [pattern]
+        bits = []
+        for byte in pattern:
+            bits += [1] + [(byte >> (7 - i)) & 1 for i in range(8)] + [0]
+        return bits + [0] * 4 # Idle gap between repetitions
+
+    def board_sample(self, t):
+        x = self.sway * math.sin(2 * math.pi * 0.3 * t)
+        y = self.sway * math.cos(2 * math.pi * 0.2 * t)
+        fx = min(1.0, max(0.0, 0.5 + x / SENSOR_SPACING_X))
+        fy = min(1.0, max(0.0, 0.5 + y / SENSOR_SPACING_Y))
+        m, g = self.mass, self.rng.gauss
+        return [m * fx * fy + g(0, self.noise), m * fx * (1 - fy) + g(0, self.noise),
+                m * (1 - fx) * fy + g(0, self.noise), m * (1 - fx) * (1 - fy) + g(0, self.noise)]
+
+    def ir_frame(self, t):
+        if self.bits is not None:
+            bit = self.bits[int((t - self.t0) / self.bit_duration) % len(self.bits)]
+            if not bit: return [None] * 4
+        x = int(self.position[0] + self.rng.gauss(0, self.jitter))
+        y = int(self.position[1] + self.rng.gauss(0, self.jitter))
+        return [[min(1022, max(0, x)), min(1022, max(0, y))], None, None, None]
+
+    def read(self):
+        if self.realtime:
+            end = int((time.time() - self.t0) / self.period) + 1
+        else:
+            end = self.n + self.chunk
+        make = self.board_sample if self.kind == 'board' else self.ir_frame
+        ts = [self.t0 + i * self.period for i in range(self.n, end)]
+        values = [make(t) for t in ts]
+        self.n = max(self.n, end)
+        return self._batch(ts, values)
+
+# --- Helpers ---
+
+def open_transport(spec, **kwargs):
+    """
+    Transport from a short spec: 'evdev-board', 'evdev-ir', 'l2cap:AA:BB:..',
+    'l2cap-ir:AA:BB:..', 'replay:FILE', 'sim-board', 'sim-ir'.
+    """
+    if spec == 'evdev-board': return EvdevBoardTransport(**kwargs)
+    if spec == 'evdev-ir': return EvdevIRTransport(**kwargs)
+    if spec.startswith('l2cap:'): return L2capBoardTransport(spec[6:], **kwargs)
+    if spec.startswith('l2cap-ir:'): return L2capIRTransport(spec[9:], **kwargs)
+    if spec.startswith('replay:'): return ReplayTransport(spec[7:], **kwargs)
+    if spec == 'sim-board': return SimulatorTransport('board', **kwargs)
+    if spec == 'sim-ir': return SimulatorTransport('ir', **kwargs)
+    raise ValueError(f"Unknown transport: {spec}")
+
+def main():
+    from wiinux import setup_logging
+    setup_logging()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("spec", help="evdev-board | evdev-ir | l2cap:ADDR | l2cap-ir:ADDR | replay:FILE | sim-board | sim-ir")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    from wii_analytics import analytics_for
+    transport = open_transport(args.spec)
+    with transport:
+        analytics = analytics_for(transport.kind)
+        count, start = 0, time.time()
+        while time.time() - start < args.seconds:
+            batch = transport.read()
+            if batch:
+                count += len(batch.ts)
+                analytics.feed(batch)
+                print(f"\r{transport.device_id}: {count} samples | {analytics.summary()}    ", end="")
+            elif isinstance(transport, ReplayTransport) and transport.finished: break
+            time.sleep(0.01)
+        print(f"\n{count} samples in {time.time() - start:.2f} s")
+
+if __name__ == "__main__":
+    main()
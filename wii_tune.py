@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Decoder Parameter Tuning: grid search over labelled IR captures.
+
+Every parameter combination (point persistence, stability radius, duty
+thresholds, stability gate, bit duration, auto clock) replays all captures
+through IRTracker - the WiiEyeNative pipeline on capture timestamps - and
+is scored on decode accuracy, false positives and latency. Combinations run
+in a process pool; each worker loads the captures once. The best one is
+written as a profile (wii_analytics.load_profile, `Wii_accesories_bib.py
+--profile`), the full ranking optionally as CSV.
+
+Labels (JSON, default labels.json next to the captures): capture file name
+-> IDs the beacon sends. An empty list marks a capture without a beacon,
+every byte decoded there is a false positive.
+
+    {"wiieye_raw_1770525404.csv": ["5A"], "wiieye_raw_1770524455.csv": []}
+
+Score: F1 of precision (correct decodes / all decodes) and recall (labelled
+IDs found), minus LATENCY_WEIGHT per second until the first correct decode.
+
+    python wii_tune.py captures/ -j 8 -o kitchen_profile.json
+    python wii_tune.py captures/ --grid radius=40,60,80 --grid auto_clock=1 --results ranking.csv
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+from wii_analytics import DEFAULT_PROFILE, PROFILE_FILE, IRTracker, save_profile
+
+LABELS_FILE = "labels.json"
+LATENCY_WEIGHT = 0.01 # Score per second of mean time to the first correct decode
+DEFAULT_GRID = {
+    'bit_duration': [0.1],
+    'radius': [30, 60, 100],
+    'persistence': [0.05, 0.1, 0.15, 0.25],
+    'threshold': [0.05, 0.2, 0.5],
+    'aligned_threshold': [0.5], # Only used with auto_clock
+    'min_sf': [0.05, 0.1, 0.3],
+    'auto_clock': [False, True],
+}
+RESULT_FIELDS = ['score', 'f1', 'precision', 'recall', 'hits', 'false', 'false_per_min', 'latency_s']
+
+def parse_id(value):
+    return value if isinstance(value, int) else int(str(value), 16)
+
+def load_labels(path):
+    """{capture path: set of expected IDs}, paths relative to the labels file."""
+    with open(path) as f: data = json.load(f)
+    base = os.path.dirname(path)
+    return {os.path.join(base, name): {parse_id(v) for v in ids} for name, ids in data.items()}
+
+def parse_grid(specs):
+    """['radius=40,60', ...] -> DEFAULT_GRID with those axes replaced."""
+    grid = dict(DEFAULT_GRID)
+    for spec in specs:
+        name, _, values = spec.partition('=')
+        if name not in DEFAULT_PROFILE: raise ValueError(f"Unknown parameter: {name} (known: {', '.join(DEFAULT_PROFILE)})")
+        kind = type(DEFAULT_PROFILE[name])
+        if kind is bool: grid[name] = [v.strip().lower() in ('1', 'true', 'yes', 'on') for v in values.split(',')]
+        else: grid[name] = [kind(v) for v in values.split(',')]
+    return grid
+
+def combinations(grid):
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+# --- Worker side ---
+
+_CAPTURES = [] # (name, frames, expected IDs), loaded once per worker
+
+def _load_captures(labels):
+    from wii_transport import iter_capture
+    global _CAPTURES
+    _CAPTURES = []
+    for path, expected in sorted(labels.items()):
+        kind, frames = iter_capture(path)
+        if kind != 'ir': raise ValueError(f"{path}: not an IR capture")
+        _CAPTURES.append((os.path.basename(path), list(frames), expected))
+
+def evaluate(params):
+    """Replays every capture with `params`; aggregated metrics (see RESULT_FIELDS)."""
+    hits = false = expected_total = found_total = 0
+    latencies = []
+    minutes = 0.0
+    for name, frames, expected in _CAPTURES:
+        if not frames: continue
+        tracker = IRTracker(**params, max_decoded=None).replay(frames)
+        t0 = frames[0][0]
+        minutes += (frames[-1][0] - t0) / 60
+        found = set()
+        for ts, value in tracker.decoded:
+            if value in expected:
+                hits += 1
+                if not found: latencies.append(ts - t0)
+                found.add(value)
+            else:
+                false += 1
+        expected_total += len(expected)
+        found_total += len(found)
+    decoded = hits + false
+    precision = hits / decoded if decoded else (1.0 if not expected_total else 0.0)
+    recall = found_total / expected_total if expected_total else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    latency = sum(latencies) / len(latencies) if latencies else None
+    return {**params, 'score': round(f1 - LATENCY_WEIGHT * (latency or 0.0), 4), 'f1': round(f1, 4),
+            'precision': round(precision, 4), 'recall': round(recall, 4), 'hits': hits, 'false': false,
+            'false_per_min': round(false / minutes, 3) if minutes else 0.0,
+            'latency_s': round(latency, 3) if latency is not None else ''}
+
+def _rank_key(row):
+    # Best score, then fewer false positives, then faster
+    return (-row['score'], row['false'], row['latency_s'] if row['latency_s'] != '' else float('inf'))
+
+def tune(labels, grid=None, jobs=None, progress=True):
+    """Evaluates every combination of `grid` on the labelled captures; rows best first."""
+    combos = combinations(grid or DEFAULT_GRID)
+    if progress: print(f"{len(combos)} combinations x {len(labels)} captures")
+    start = time.time()
+    rows = []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_load_captures, initargs=(labels,)) as pool:
+        chunk = max(1, len(combos) // (4 * (jobs or os.cpu_count() or 1)))
+        for n, row in enumerate(pool.map(evaluate, combos, chunksize=chunk), 1):
+            rows.append(row)
+            if progress and (n % 50 == 0 or n == len(combos)):
+                print(f"[{n}/{len(combos)}] {time.time() - start:.1f} s")
+    rows.sort(key=_rank_key)
+    return rows
+
+def print_ranking(rows, top=10, out=sys.stdout):
+    names = list(DEFAULT_PROFILE) + RESULT_FIELDS
+    out.write(" ".join(f"{n[:12]:>12}" for n in names) + "\n")
+    for row in rows[:top]:
+        out.write(" ".join(f"{str(row[n])[:12]:>12}" for n in names) + "\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Grid-search IR decoder parameters over labelled captures")
+    parser.add_argument("root", nargs="?", default=".", help="Capture directory (with labels.json)")
+    parser.add_argument("--labels", help=f"Labels file (default: ROOT/{LABELS_FILE})")
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=V1,V2",
+                        help=f"Replace one axis of the grid ({', '.join(DEFAULT_PROFILE)})")
+    parser.add_argument("-j", "--jobs", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("-o", "--output", default=PROFILE_FILE, help="Best profile (JSON)")
+    parser.add_argument("--results", help="Full ranking (CSV)")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    try:
+        labels = load_labels(args.labels or os.path.join(args.root, LABELS_FILE))
+        grid = parse_grid(args.grid)
+    except (OSError, ValueError) as e:
+        sys.exit(f"wii_tune: {e}")
+    if not labels: sys.exit("wii_tune: no labelled captures")
+    missing = [p for p in labels if not os.path.exists(p)]
+    if missing: sys.exit(f"wii_tune: missing captures: {', '.join(missing)}")
+
+    rows = tune(labels, grid, args.jobs)
+    print_ranking(rows, args.top)
+    if args.results:
+        with open(args.results, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(DEFAULT_PROFILE) + RESULT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+    best = rows[0]
+    save_profile(args.output, {k: best[k] for k in DEFAULT_PROFILE},
+                 score={k: best[k] for k in RESULT_FIELDS},
+                 captures=sorted(os.path.basename(p) for p in labels))
+    print(f"Best profile -> {args.output} (score {best['score']}, {best['false']} false positives)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Virtual Wiimotes / Balance Boards on uinput (load testing without hardware).
+
+Creates evdev devices with the names and ABS capabilities of the hid-wiimote
+kernel driver, so WiiEyeNative.connect() and WiiboardNative.connect() find
+them unchanged, and drives them from wii_transport sources (simulator or
+recorded captures) at a configurable rate.
+
+Virtual boards have no sysfs bboard_calib node: their calibration is written
+to the calibration cache under the device phys (wiisim/boardN), with
+0/17/34 kg blocks chosen so that one raw unit is 10 g, like hid-wiimote.
+Rumble (EV_FF) is not emulated; WiiEyeNative logs "Rumble init failed".
+
+Requires write access to /dev/uinput (root, or the uinput group).
+
+usage: wii_virtual.py [--remotes N] [--boards N] [--rate HZ] [--source sim|FILE] [--seconds S]
+"""
+
+import time
+import argparse
+import logging
+
+import evdev
+from evdev import ecodes
+
+from wii_transport import SimulatorTransport, ReplayTransport, IR_NONE
+from wii_calibration import default_store
+
+logger = logging.getLogger("wii_accessories")
+
+WII_VENDOR = 0x057e
+WII_PRODUCT = 0x0306
+BUS_BLUETOOTH = 0x05
+
+NAME_REMOTE = "Nintendo Wii Remote"
+NAME_ACCEL = "Nintendo Wii Remote Accelerometer"
+NAME_IR = "Nintendo Wii Remote IR"
+NAME_BOARD = "Nintendo Wii Remote Balance Board"
+
+VIRTUAL_CALIBRATION = [[0] * 4, [1700] * 4, [3400] * 4] # 1 raw unit = 10 g
+
+REMOTE_KEYS = [ecodes.KEY_LEFT, ecodes.KEY_RIGHT, ecodes.KEY_UP, ecodes.KEY_DOWN,
+               ecodes.KEY_NEXT, ecodes.KEY_PREVIOUS, ecodes.BTN_1, ecodes.BTN_2,
+               ecodes.BTN_A, ecodes.BTN_B, ecodes.BTN_MODE]
+
+def _abs(code, lo, hi, fuzz=2, flat=4):
+    return (code, evdev.AbsInfo(value=0, min=lo, max=hi, fuzz=fuzz, flat=flat, resolution=0))
+
+def _uinput(name, events, phys):
+    return evdev.UInput(events, name=name, vendor=WII_VENDOR, product=WII_PRODUCT,
+                        version=0x8001, bustype=BUS_BLUETOOTH, phys=phys)
+
+def _source(kind, source, rate, seed, **kwargs):
+    """Endless iterator of sample values from the simulator or a capture file."""
+    if source == 'sim':
+        transport = SimulatorTransport(kind, rate=rate, realtime=False, seed=seed, **kwargs)
+    else:
+        transport = ReplayTransport(source, loop=True)
+    transport.open()
+    if transport.kind != kind: raise ValueError(f"{source}: {transport.kind} capture, {kind} expected")
+    while True:
+        batch = transport.read()
+        if batch is None: return
+        yield from batch.values
+
+class VirtualRemote:
+    """Buttons + accelerometer + IR nodes of one Wiimote."""
+    kind = 'ir'
+
+    def __init__(self, index, source='sim', rate=100.0, hold_b=False, seed=None, **kwargs):
+        phys = f"wiisim/remote{index}"
+        self.buttons = _uinput(NAME_REMOTE, {ecodes.EV_KEY: REMOTE_KEYS}, phys)
+        self.accel = _uinput(NAME_ACCEL, {ecodes.EV_ABS: [_abs(c, -500, 500) for c in
+                             (ecodes.ABS_RX, ecodes.ABS_RY, ecodes.ABS_RZ)]}, phys)
+        caps = []
+        for i in range(4):
+            caps += [_abs(ecodes.ABS_HAT0X + 2 * i, 0, 1023), _abs(ecodes.ABS_HAT0Y + 2 * i, 0, 767)]
+        self.ir = _uinput(NAME_IR, {ecodes.EV_ABS: caps}, phys)
+        self.samples = _source('ir', source, rate, seed, **kwargs)
+        self.hold_b = hold_b
+
+    def start(self):
+        if self.hold_b: # WiiEyeNative only decodes while B is held
+            self.buttons.write(ecodes.EV_KEY, ecodes.BTN_B, 1)
+            self.buttons.syn()
+
+    def emit(self):
+        """Writes the next IR frame. Returns the number of input events written."""
+        frame = next(self.samples)
+        n = 0
+        for i, p in enumerate(frame):
+            x, y = p if p else (IR_NONE, IR_NONE)
+            self.ir.write(ecodes.EV_ABS, ecodes.ABS_HAT0X + 2 * i, x)
+            self.ir.write(ecodes.EV_ABS, ecodes.ABS_HAT0Y + 2 * i, y)
+            n += 2
+        self.ir.syn()
+        return n + 1
+
+    def close(self):
+        if self.hold_b:
+            self.buttons.write(ecodes.EV_KEY, ecodes.BTN_B, 0)
+            self.buttons.syn()
+        for dev in (self.buttons, self.accel, self.ir): dev.close()
+
+class VirtualBoard:
+    kind = 'board'
+
+    def __init__(self, index, source='sim', rate=100.0, seed=None, calibration_store=None, **kwargs):
+        self.phys = f"wiisim/board{index}"
+        caps = [_abs(ecodes.ABS_HAT0X + i, 0, 65535) for i in range(4)] # TR, BR, TL, BL
+        self.device = _uinput(NAME_BOARD, {ecodes.EV_KEY: [ecodes.BTN_A], ecodes.EV_ABS: caps}, self.phys)
+        store = calibration_store if calibration_store is not None else default_store()
+        store.put(self.phys, VIRTUAL_CALIBRATION, source="virtual")
+        self.samples = _source('board', source, rate, seed, **kwargs)
+
+    def start(self):
+        pass
+
+    def emit(self):
+        values = next(self.samples)
+        for i, kg in enumerate(values):
+            self.device.write(ecodes.EV_ABS, ecodes.ABS_HAT0X + i, max(0, int(round(kg * 100))))
+        self.device.syn()
+        return 5
+
+    def close(self):
+        self.device.close()
+
+class VirtualFleet:
+    """
+    Drives all virtual devices from one loop on a fixed-rate schedule and
+    measures how far the loop falls behind (saturation).
+    """
+    def __init__(self, devices, rate=100.0):
+        self.devices = devices
+        self.period = 1.0 / rate
+        self.frames = 0
+        self.events = 0
+        self.late = 0       # Ticks that started more than one period late
+        self.max_lag = 0.0  # s
+
+    def run(self, seconds=None, report=None, report_interval=1.0):
+        for dev in self.devices: dev.start()
+        start = next_tick = time.monotonic()
+        last_report, frames0, events0 = start, 0, 0
+        while seconds is None or time.monotonic() - start < seconds:
+            now = time.monotonic()
+            if now < next_tick:
+                time.sleep(next_tick - now)
+                continue
+            lag = now - next_tick
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.period: self.late += 1
+            for dev in self.devices:
+                self.events += dev.emit()
+                self.frames += 1
+            next_tick += self.period
+            if report and now - last_report >= report_interval:
+                dt = now - last_report
+                report((self.frames - frames0) / dt, (self.events - events0) / dt, lag)
+                last_report, frames0, events0 = now, self.frames, self.events
+
+    def close(self):
+        for dev in self.devices: dev.close()
+
+def main():
+    from wiinux import setup_logging
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Virtual hid-wiimote devices on uinput")
+    parser.add_argument("--remotes", type=int, default=1)
+    parser.add_argument("--boards", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=100.0, help="Frames per second per device")
+    parser.add_argument("--source", default="sim", help="'sim' or a capture CSV (looped)")
+    parser.add_argument("--board-source", default="sim", help="'sim' or a board CSV (looped)")
+    parser.add_argument("--pattern", type=lambda v: int(v, 0), nargs="*", default=[0xA5], help="VLC bytes to blink")
+    parser.add_argument("--bit-duration", type=float, default=0.1)
+    parser.add_argument("--mass", type=float, default=70.0)
+    parser.add_argument("--hold-b", action="store_true", help="Hold B on every remote (decoding on)")
+    parser.add_argument("--seconds", type=float, default=None)
+    args = parser.parse_args()
+
+    devices = []
+    try:
+        for i in range(args.remotes):
+            kw = dict(pattern=args.pattern, bit_duration=args.bit_duration) if args.source == 'sim' else {}
+            devices.append(VirtualRemote(i, args.source, args.rate, hold_b=args.hold_b, seed=i, **kw))
+        for i in range(args.boards):
+            kw = dict(mass=args.mass) if args.board_source == 'sim' else {}
+            devices.append(VirtualBoard(i, args.board_source, args.rate, seed=1000 + i, **kw))
+    except OSError as e:
+        for dev in devices: dev.close()
+        print(f"Cannot create uinput devices: {e}")
+        return
+
+    fleet = VirtualFleet(devices, args.rate)
+    print(f"{args.remotes} remote(s), {args.boards} board(s) @ {args.rate:.0f} Hz. CTRL+C to quit.")
+    target = len(devices) * args.rate
+    def report(fps, eps, lag):
+        print(f"\rframes/s {fps:8.0f} / {target:.0f} | events/s {eps:9.0f} | lag {lag*1000:6.2f} ms | late ticks {fleet.late}   ", end="")
+    try: fleet.run(args.seconds, report)
+    except KeyboardInterrupt: pass
+    finally:
+        fleet.close()
+        print(f"\n{fleet.frames} frames, {fleet.events} events, max lag {fleet.max_lag*1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
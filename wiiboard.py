@@ -3,7 +3,10 @@
 
 Wersja z manualnym wyzwalaczem kalibracji.
 
-usage: wiiboard_refactored.py [-d] [address]
+usage: wiiboard_refactored.py [-d] [-n] [-f] [address]
+  -d  debug, -n  kalibracja bez czekania na klawisz 't'
+  -f  filtr czujników: mediana z 5 odczytów + Kalman, opóźnienie 0.1 s (wii_filter, NumPy)
+  Po zerwaniu łącza waga jest łączona ponownie automatycznie (WiiboardSupervisor).
 tip: use `bluetoothctl scan on` to get a list of devices addresses
 
 Requires `pybluez` installed via `apt-get install python3-bluez` and a
@@ -14,15 +17,24 @@ LICENSE LGPL <http://www.gnu.org/licenses/lgpl.html>
         Refactored for Python 3 by Logos/Sławek 2025
 """
 import time
+import random
 import logging
 import collections
-import bluetooth
+import socket
+import selectors
 import sys
 import os
 import subprocess
+import concurrent.futures
+
+import wii_protocol as proto
+from wii_protocol import BoardSample
+from wii_calibration import default_store
+from wii_demand import StreamDemand
 
 # --- Stałe Wiiboard ---
 CONTINUOUS_REPORTING = b'\x04'
+CHANGE_REPORTING = b'\x00' # Raport tylko przy zmianie danych
 COMMAND_LIGHT = b'\x11'
 COMMAND_REPORTING = b'\x12'
 COMMAND_REQUEST_STATUS = b'\x15'
@@ -31,6 +43,7 @@ COMMAND_READ_REGISTER = b'\x17'
 INPUT_STATUS = b'\x20'
 INPUT_READ_DATA = b'\x21'
 EXTENSION_8BYTES = b'\x32'
+BUTTONS_ONLY = b'\x30'
 BUTTON_DOWN_MASK = 0x08
 LED1_MASK = 0x10
 BATTERY_MAX = 200.0
@@ -40,20 +53,28 @@ TOP_LEFT = 2
 BOTTOM_LEFT = 3
 BLUETOOTH_NAME = "Nintendo RVL-WBC-01"
 
-# --- Konfiguracja logowania ---
+# --- Logowanie ---
+# Biblioteka tylko loguje; handler konfiguruje program (patrz __main__)
 logger = logging.getLogger(__name__)
-handler = logging.StreamHandler()
-handler.setFormatter(logging.Formatter('[%(asctime)s][%(levelname)s] %(message)s'))
-logger.addHandler(handler)
-logger.setLevel(logging.INFO)
 
 # --- Funkcja pomocnicza ---
 def bytes_to_int(b):
     """Konwertuje ciąg bajtów (bytes) na liczbę całkowitą (int)."""
     return int.from_bytes(b, 'big')
 
+def l2cap_socket():
+    """
+    Tworzy gniazdo L2CAP. Preferuje natywne gniazdo z biblioteki standardowej
+    (Linux: recv_into, tryb nieblokujący, selektory), w razie braku - pybluez.
+    """
+    if hasattr(socket, 'AF_BLUETOOTH') and hasattr(socket, 'BTPROTO_L2CAP'):
+        return socket.socket(socket.AF_BLUETOOTH, socket.SOCK_SEQPACKET, socket.BTPROTO_L2CAP)
+    import bluetooth # pybluez ładowany dopiero, gdy jest potrzebny
+    return bluetooth.BluetoothSocket(bluetooth.L2CAP)
+
 def discover(duration=6, prefix=BLUETOOTH_NAME):
     """Wyszukuje urządzenia Bluetooth."""
+    import bluetooth
     logger.info(f"Skanowanie urządzeń Bluetooth przez {duration} sekund...")
     devices = bluetooth.discover_devices(duration=duration, lookup_names=True)
     logger.debug(f"Znaleziono urządzenia: {devices}")
@@ -61,58 +82,187 @@ def discover(duration=6, prefix=BLUETOOTH_NAME):
 
 class Wiiboard:
     """Główna klasa do obsługi Wii Balance Board."""
-    def __init__(self, address=None):
+    def __init__(self, address=None, interactive=True, calibration_store=None, continuous=True, on_demand=False,
+                 sensor_filter=None):
         self.controlsocket = None
         self.receivesocket = None
+        self.address = None
+        # Pamięć podręczna kalibracji (~/.wiiboard_calib.json), klucz: adres MAC
+        self.calibration_store = calibration_store if calibration_store is not None else default_store()
         self.calibration = [[10000.0] * 4] * 3
         self.calibration_requested = False
         self.light_state = False
         self.button_down = False
         self.battery = 0.0
         self.running = True
+        self.calibrated = False
+        self.link_lost = False # True gdy połączenie zerwał błąd radiowy, a nie użytkownik
+        self.bad_reports = 0 # Raporty pominięte przez błąd w obsłudze
+        self.short_reports = 0 # Raporty krótsze niż ich format (pominięte)
+        # interactive=False: kalibracja bez input(), wywoływana programowo
+        self.interactive = interactive
+        # continuous=False: waga wysyła raport tylko przy zmianie odczytu.
+        # on_demand=True: dane czujników tylko gdy ktoś subskrybuje strumień 'board',
+        # w przeciwnym razie same przyciski (raport 0x30) - radio i host odpoczywają.
+        self.continuous = continuous
+        self.streams = StreamDemand(('board',), self._on_stream_change)
+        if not on_demand: self.streams.acquire('board')
+        # Bufor odbiorczy alokowany raz (recv_into)
+        self._buffer = bytearray(32)
+        self._view = memoryview(self._buffer)
+        # Ostatni odczyt - jeden obiekt aktualizowany w miejscu (bez alokacji na raport)
+        self.sample = BoardSample()
+        # Opcjonalny filtr czujników (wii_filter, NumPy): mediana + wygładzanie sample.mass
+        if sensor_filter is not None:
+            from wii_filter import make_filter
+            sensor_filter = make_filter(sensor_filter)
+        self.sensor_filter = sensor_filter
+        # Dyspozycja po całkowitym ID raportu (data[1]), bez wycinków bajtów
+        self._handlers = {
+            proto.REPORT_STATUS: self._on_status_report,
+            proto.REPORT_READ_DATA: self._on_read_data_report,
+            proto.REPORT_EXT8: self._on_mass_report,
+            proto.REPORT_BUTTONS: self._on_buttons_report,
+        }
         if address:
             self.connect(address)
 
-    def connect(self, address):
-        """Łączy się z podanym adresem MAC i czeka na sygnał do kalibracji."""
+    def connect(self, address, timeout=None):
+        """
+        Łączy się z podanym adresem MAC i (w trybie interaktywnym) czeka na sygnał do kalibracji.
+        Jeśli waga jest już skalibrowana (ponowne połączenie), od razu wznawia pomiary.
+        """
         logger.info(f"Łączenie z {address}...")
         try:
-            self.controlsocket = bluetooth.BluetoothSocket(bluetooth.L2CAP)
-            self.receivesocket = bluetooth.BluetoothSocket(bluetooth.L2CAP)
+            self.controlsocket = l2cap_socket()
+            self.receivesocket = l2cap_socket()
+            if timeout is not None:
+                self.controlsocket.settimeout(timeout)
+                self.receivesocket.settimeout(timeout)
             self.controlsocket.connect((address, 0x11))
             self.receivesocket.connect((address, 0x13))
+            if timeout is not None:
+                self.controlsocket.settimeout(None)
+                self.receivesocket.settimeout(None)
+            self.running = True
+            self.link_lost = False
+            self.address = address
             logger.info("Połączenie udane!")
 
-            # <<< NOWA ZMIANA TUTAJ
-            print("\n-----------------------------------------------------------------")
-            print(">>> Połóż wagę na płaskiej powierzchni.")
-            print(">>> Naciśnij klawisz 't' (od tarowanie) i Enter, aby rozpocząć.")
-            print("-----------------------------------------------------------------")
-            while True:
-                key = input()
-                if key.lower() == 't':
-                    break
+            if self.calibrated:
+                self.resume()
+            else:
+                if self.interactive:
+                    self.wait_for_tare_key()
+                if self.load_cached_calibration():
+                    # Bez odczytu rejestrów: pomiary startują od razu
+                    self.resume()
+                    self.on_calibrated()
                 else:
-                    print("Oczekuję na 't'...")
-            # >>> KONIEC ZMIANY
-
-            logger.info("Rozpoczynam kalibrację...")
-            logger.debug("Wysyłanie żądania o dane kalibracyjne...")
-            self.send(COMMAND_READ_REGISTER, b"\x04\xA4\x00\x24\x00\x18")
-            self.calibration_requested = True
-
-            logger.debug("Łączenie z rozszerzeniem wagi, aby czytać dane masowe...")
-            self.send(COMMAND_REGISTER, b"\x04\xA4\x00\x40\x00")
-
-            logger.debug("Żądanie statusu...")
-            self.status()
-            self.light(False)
+                    self.calibrate()
             return True
-        except bluetooth.btcommon.BluetoothError as e:
+        except OSError as e: # BluetoothError (pybluez) dziedziczy po OSError
             logger.error(f"Nie udało się połączyć. Upewnij się, że urządzenie jest sparowane. Błąd: {e}")
             self.close()
             return False
 
+    def wait_for_tare_key(self):
+        print("\n-----------------------------------------------------------------")
+        print(">>> Połóż wagę na płaskiej powierzchni.")
+        print(">>> Naciśnij klawisz 't' (od tarowanie) i Enter, aby rozpocząć.")
+        print("-----------------------------------------------------------------")
+        while True:
+            key = input()
+            if key.lower() == 't':
+                break
+            else:
+                print("Oczekuję na 't'...")
+
+    def calibrate(self):
+        """Programowe wyzwolenie kalibracji: odczyt rejestrów i start raportowania."""
+        logger.info("Rozpoczynam kalibrację...")
+        logger.debug("Wysyłanie żądania o dane kalibracyjne...")
+        self.send(COMMAND_READ_REGISTER, b"\x04\xA4\x00\x24\x00\x18")
+        self.calibration_requested = True
+
+        self._start_streaming()
+        self.light(False)
+
+    def load_cached_calibration(self):
+        """Kalibracja z pamięci podręcznej dla bieżącego adresu. False gdy brak/niepoprawna."""
+        blocks = self.calibration_store.get(self.address) if self.address else None
+        if blocks is None: return False
+        logger.info(f"Kalibracja z pamięci podręcznej dla {self.address}.")
+        self.calibration = blocks
+        self.calibrated = True
+        return True
+
+    def resume(self):
+        """Wznowienie pomiarów po ponownym połączeniu: bez odczytu kalibracji i tarowania."""
+        logger.info("Wznawiam pomiary z zachowaną kalibracją.")
+        self._start_streaming()
+
+    def _start_streaming(self):
+        logger.debug("Łączenie z rozszerzeniem wagi, aby czytać dane masowe...")
+        self.send(COMMAND_REGISTER, b"\x04\xA4\x00\x40\x00")
+
+        logger.debug("Żądanie statusu...")
+        self.status()
+
+    # --- Tryb nieblokujący (selektor / asyncio) ---
+
+    def fileno(self):
+        return self.receivesocket.fileno()
+
+    def setblocking(self, flag):
+        if self.receivesocket: self.receivesocket.setblocking(flag)
+
+    def _recv(self):
+        """Odczyt jednego raportu do prealokowanego bufora, zwraca memoryview."""
+        sock = self.receivesocket
+        if hasattr(sock, 'recv_into'):
+            n = sock.recv_into(self._buffer)
+        else: # pybluez nie ma recv_into
+            data = sock.recv(len(self._buffer))
+            n = len(data)
+            self._buffer[:n] = data
+        return self._view[:n]
+
+    def handle_input(self):
+        """Obsługuje wszystkie oczekujące raporty (gniazdo nieblokujące). Nigdy nie blokuje."""
+        while self.running and self.receivesocket:
+            try:
+                data = self._recv()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                logger.warning(f"Rozłączono: {e}")
+                self.link_lost = True
+                self.close()
+                return
+            if not data: # EOF - urządzenie zamknęło połączenie
+                logger.warning("Rozłączono.")
+                self.link_lost = True
+                self.close()
+                return
+            if len(data) < 2: continue
+            try:
+                self.process_report(data)
+            except OSError as e: # Wysyłanie komend (np. po raporcie statusu)
+                logger.warning(f"Rozłączono: {e}")
+                self.link_lost = True
+                self.close()
+            except Exception as e:
+                self._drop_report(data, e)
+
+    def add_to_event_loop(self, loop):
+        """Rejestruje wagę w pętli asyncio (loop.add_reader), bez osobnego wątku."""
+        self.setblocking(False)
+        loop.add_reader(self.fileno(), self.handle_input)
+
+    def remove_from_event_loop(self, loop):
+        if self.receivesocket: loop.remove_reader(self.fileno())
+
     def send(self, *data):
         if not self.controlsocket: return
         self.controlsocket.send(b'\x52' + b''.join(data))
@@ -120,6 +270,24 @@ class Wiiboard:
     def reporting(self, mode=CONTINUOUS_REPORTING, extension=EXTENSION_8BYTES):
         self.send(COMMAND_REPORTING, mode, extension)
 
+    def apply_reporting(self):
+        """Tryb raportowania wynikający z subskrypcji i ustawienia continuous."""
+        if self.streams.active('board'):
+            self.reporting(CONTINUOUS_REPORTING if self.continuous else CHANGE_REPORTING, EXTENSION_8BYTES)
+        else:
+            self.reporting(CHANGE_REPORTING, BUTTONS_ONLY)
+
+    def subscribe(self, stream='board'):
+        self.streams.acquire(stream)
+
+    def unsubscribe(self, stream='board'):
+        self.streams.release(stream)
+
+    def _on_stream_change(self, stream, active):
+        if self.controlsocket:
+            self.apply_reporting()
+            logger.info(f"Strumień danych wagi: {'włączony' if active else 'wyłączony'}")
+
     def light(self, on_off=True):
         self.send(COMMAND_LIGHT, b'\x10' if on_off else b'\x00')
 
@@ -150,57 +318,103 @@ class Wiiboard:
             self.on_released()
 
     def get_mass(self, data):
-        mass_data = {}
-        raw_tr = bytes_to_int(data[0:2])
-        raw_br = bytes_to_int(data[2:4])
-        raw_tl = bytes_to_int(data[4:6])
-        raw_bl = bytes_to_int(data[6:8])
-
-        mass_data['top_right'] = self.calc_mass(raw_tr, TOP_RIGHT)
-        mass_data['bottom_right'] = self.calc_mass(raw_br, BOTTOM_RIGHT)
-        mass_data['top_left'] = self.calc_mass(raw_tl, TOP_LEFT)
-        mass_data['bottom_left'] = self.calc_mass(raw_bl, BOTTOM_LEFT)
-        return mass_data
+        """Masa z 8-bajtowego bloku czujników (zgodność wsteczna, zwraca dict)."""
+        raw_tr, raw_br, raw_tl, raw_bl = proto.BOARD_SENSORS.unpack_from(data, 0)
+        return {
+            'top_right': self.calc_mass(raw_tr, TOP_RIGHT),
+            'bottom_right': self.calc_mass(raw_br, BOTTOM_RIGHT),
+            'top_left': self.calc_mass(raw_tl, TOP_LEFT),
+            'bottom_left': self.calc_mass(raw_bl, BOTTOM_LEFT),
+        }
+
+    def update_sample_mass(self, sample):
+        """Przelicza sample.raw na sample.mass w miejscu. False gdy kalibracja zdegenerowana."""
+        raw, mass = sample.raw, sample.mass
+        for pos in range(4):
+            m = self.calc_mass(raw[pos], pos)
+            if m is None: return False
+            mass[pos] = m
+        return True
+
+    def process_report(self, data):
+        """Obsługuje jeden raport wejściowy (bytes, bytearray lub memoryview)."""
+        handler = self._handlers.get(data[1])
+        if not handler: return
+        if not proto.complete(data):
+            # Ucięty raport: parsery czytają pod stałymi przesunięciami
+            self.short_reports += 1
+            logger.debug(f"Pominięty krótki raport 0x{data[1]:02x} ({len(data)} B)")
+            return
+        handler(data)
+
+    def _on_status_report(self, data):
+        flags, battery_raw = proto.parse_status(data)
+        self.battery = min(1.0, battery_raw / 4800.0)
+        self.light_state = (flags & LED1_MASK) == LED1_MASK
+        self.on_status()
+
+    def _on_read_data_report(self, data):
+        if not self.calibration_requested: return
+        length, error, address, offset = proto.parse_read_data(data)
+        if len(data) < offset + length:
+            self.short_reports += 1
+            return
+        if length == 16:
+            self.calibration = [proto.parse_calibration_block(data, offset),
+                                proto.parse_calibration_block(data, offset + 8),
+                                [10000.0] * 4]
+        elif length == 8:
+            self.calibration[2] = proto.parse_calibration_block(data, offset)
+            self.calibration_requested = False
+            self.calibrated = True
+            self.calibration_store.put(self.address, self.calibration, source="l2cap")
+            self.on_calibrated()
+
+    def _on_mass_report(self, data):
+        sample = proto.parse_board_sensors(data, self.sample)
+        if self.update_sample_mass(sample):
+            if self.sensor_filter: self.sensor_filter.apply(time.time(), sample.mass)
+            self.on_sample(sample)
+        self.check_button(sample.buttons)
+
+    def _on_buttons_report(self, data):
+        # Strumień 'board' wyłączony: przycisk działa dalej
+        self.check_button(proto.parse_buttons(data))
 
     def loop(self):
+        """Pętla blokująca dla jednej wagi (dla wielu wag: WiiboardReactor)."""
         while self.running and self.receivesocket:
             try:
-                data = self.receivesocket.recv(32)
+                data = self._recv()
+                if not data: raise ConnectionResetError("EOF")
                 if len(data) < 2: continue
-                input_type = data[1:2]
-
-                if input_type == INPUT_STATUS:
-                    battery_raw = bytes_to_int(data[6:8])
-                    self.battery = min(1.0, battery_raw / 4800.0)
-                    self.light_state = (bytes_to_int(data[4:5]) & LED1_MASK) == LED1_MASK
-                    self.on_status()
-                elif input_type == INPUT_READ_DATA:
-                    if self.calibration_requested:
-                        length = bytes_to_int(data[4:5]) // 16 + 1
-                        payload = data[7 : 7 + length]
-                        def parse_cal_chunk(d):
-                            return [bytes_to_int(d[j:j+2]) for j in [0, 2, 4, 6]]
-
-                        if length == 16:
-                            self.calibration = [parse_cal_chunk(payload[0:8]), parse_cal_chunk(payload[8:16]), [10000.0] * 4]
-                        elif length == 8:
-                            self.calibration[2] = parse_cal_chunk(payload[0:8])
-                            self.calibration_requested = False
-                            self.on_calibrated()
-                elif input_type == EXTENSION_8BYTES:
-                    mass_data = self.get_mass(data[4:12])
-                    if all(v is not None for v in mass_data.values()):
-                        self.on_mass(mass_data)
-                    self.check_button(bytes_to_int(data[2:4]))
-            except bluetooth.btcommon.BluetoothError:
+            except OSError: # BluetoothError (pybluez) dziedziczy po OSError
                 logger.warning("Rozłączono.")
+                self.link_lost = True
                 self.close()
-            except Exception as e:
-                logger.error(f"Niespodziewany błąd w pętli: {e}", exc_info=True)
+                continue
+            try:
+                self.process_report(data)
+            except OSError as e: # Wysyłanie komend (np. po raporcie statusu)
+                logger.warning(f"Rozłączono: {e}")
+                self.link_lost = True
                 self.close()
+            except Exception as e:
+                self._drop_report(data, e)
+
+    def _drop_report(self, data, error):
+        """
+        Błędny raport jest pomijany, połączenie zostaje: zamknięcie bez link_lost
+        nadzorca uznałby za koniec sesji. Pełny ślad tylko przy pierwszym.
+        """
+        self.bad_reports += 1
+        if self.bad_reports == 1:
+            logger.error(f"Niespodziewany błąd w obsłudze raportu {bytes(data).hex()}: {error}", exc_info=True)
+        else:
+            logger.debug(f"Pominięty raport {bytes(data).hex()}: {error} (#{self.bad_reports})")
 
     def on_status(self):
-        self.reporting()
+        self.apply_reporting()
         logger.info(f"Status: bateria: {self.battery*100:.0f}%, dioda: {'on' if self.light_state else 'off'}")
         self.light(True)
 
@@ -208,6 +422,10 @@ class Wiiboard:
         logger.info("Waga pomyślnie skalibrowana. Rozpoczynam pomiary...")
         self.light(True)
 
+    def on_sample(self, sample):
+        """Wywoływane dla każdego raportu masy. Domyślnie przekazuje dict do on_mass()."""
+        self.on_mass(sample.as_dict())
+
     def on_mass(self, mass): pass
     def on_pressed(self):
         logger.info("Przycisk naciśnięty")
@@ -216,7 +434,7 @@ class Wiiboard:
         logger.info("Przycisk zwolniony")
 
     def close(self):
-        if not self.running: return
+        if not self.receivesocket and not self.controlsocket: return
         logger.info("Zamykanie połączenia...")
         self.running = False
         if self.receivesocket: self.receivesocket.close()
@@ -228,20 +446,245 @@ class Wiiboard:
     def __enter__(self): return self
     def __exit__(self, exc_type, exc_val, exc_tb): self.close()
 
+CLI_MAX_FAILURES = 5 # Próby z adresem z argumentu, zanim program się podda
+CLI_MAX_SCANS = 1    # Skanowania bez znalezionej wagi, zanim program się podda
+ATTEMPT_POLL = 0.05 # s, jak często reaktor sprawdza trwającą próbę połączenia
+
+class WiiboardReactor:
+    """
+    Obsługa wielu wag w jednym wątku: gniazda nieblokujące zarejestrowane
+    w jednym selektorze, bez wątku na wagę i bez interaktywnych przestojów.
+    """
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.boards = []
+        self.supervisors = []
+        # Próby połączenia i skanowanie (blokujące) w wątkach, pętla nie czeka
+        self._executor = None
+
+    def add(self, board):
+        board.setblocking(False)
+        self.selector.register(board.receivesocket, selectors.EVENT_READ, board)
+        self.boards.append(board)
+
+    def remove(self, board):
+        if board not in self.boards: return
+        self.boards.remove(board)
+        for key in list(self.selector.get_map().values()):
+            if key.data is board: self.selector.unregister(key.fileobj)
+
+    def poll(self, timeout=None):
+        """Obsługuje gotowe gniazda. Zwraca liczbę obsłużonych wag."""
+        events = self.selector.select(timeout)
+        for key, _ in events:
+            board = key.data
+            board.handle_input()
+            if not board.running or not board.receivesocket:
+                self.remove(board)
+        return len(events)
+
+    def supervise(self, supervisor):
+        """Dodaje nadzorcę: jego waga jest ponownie rejestrowana po każdym połączeniu."""
+        supervisor.reactor = self
+        self.supervisors.append(supervisor)
+
+    def run(self):
+        """Działa dopóki jest choć jedna aktywna waga (lub nadzorca, który próbuje się połączyć)."""
+        while self.boards or self.supervisors:
+            timeout = 1.0
+            for sup in list(self.supervisors):
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(thread_name_prefix="wiiboard-connect")
+                sup.tick_async(self._executor)
+                if sup.finished: self.supervisors.remove(sup)
+                elif sup.attempting: timeout = min(timeout, ATTEMPT_POLL)
+                elif not sup.connected: timeout = min(timeout, sup.time_to_next_attempt())
+            self.poll(timeout)
+
+    def close(self):
+        for board in list(self.boards):
+            self.remove(board)
+            board.close()
+        if self._executor: self._executor.shutdown(wait=False)
+        self.selector.close()
+
+class WiiboardSupervisor:
+    """
+    Utrzymuje sesję wagi przy życiu: po zerwaniu łącza radiowego łączy się
+    ponownie z wykładniczym backoffem z losowym rozrzutem (jitter), preferuje
+    zapamiętany adres z ~/.wiiboard_config, zachowuje kalibrację i tarę
+    (ten sam obiekt wagi) i wznawia pomiary bez ponownego tarowania.
+    Skanowanie (discover) tylko gdy brak adresu lub po `discover_after` porażkach.
+
+    Przed pierwszym połączeniem nadzorca może się poddać (gave_up, finished):
+    po `max_failures` nieudanych próbach z adresem podanym wprost albo po
+    `max_scans` skanowaniach bez znalezionej wagi. None = bez limitu.
+    Po zerwaniu łącza ponawia zawsze.
+    """
+    def __init__(self, board, address=None, base_delay=0.05, max_delay=2.0,
+                 connect_timeout=2.0, discover_after=20, max_failures=None, max_scans=None):
+        self.board = board
+        self.fixed_address = address is not None # Adres z argumentu: bez skanowania
+        self.address = address or load_config()
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.connect_timeout = connect_timeout
+        self.discover_after = discover_after
+        self.max_failures = max_failures
+        self.max_scans = max_scans
+        self.reactor = None
+        self.failures = 0
+        self.empty_scans = 0 # Skanowania bez wagi (lub z błędem Bluetooth)
+        self.reconnects = 0
+        self.finished = False
+        self.gave_up = False
+        self._next_attempt = 0.0
+        self._saved_address = None
+        self._was_connected = False
+        self._attempt = None # Future próby w tle (tick_async)
+
+    @property
+    def connected(self):
+        return self.board.running and self.board.receivesocket is not None
+
+    @property
+    def attempting(self):
+        return self._attempt is not None
+
+    def time_to_next_attempt(self):
+        return max(0.0, self._next_attempt - time.monotonic())
+
+    def _backoff(self):
+        # Pełny jitter: losowo z [0, min(max, base * 2^n)] - wiele wag nie próbuje naraz
+        delay = min(self.max_delay, self.base_delay * (2 ** min(self.failures, 16)))
+        return random.uniform(0.0, delay)
+
+    def _pick_address(self):
+        if self.address and (self.fixed_address or self.failures < self.discover_after):
+            return self.address
+        print(">>> Rozpoczynam skanowanie otoczenia (to może chwilę potrwać)...")
+        try:
+            found = discover()
+        except OSError as e:
+            logger.error(f"Błąd Bluetooth podczas skanowania: {e}")
+            self.empty_scans += 1
+            return None
+        if not found:
+            logger.error("Nie znaleziono żadnej wagi. Naciśnij czerwony przycisk synchronizacji i spróbuj ponownie.")
+            self.empty_scans += 1
+            return None
+        logger.info(f"Znaleziono wagę: {found[0]}")
+        self.address = found[0]
+        self.failures = 0
+        return self.address
+
+    def _due(self):
+        """True gdy czas na kolejną próbę połączenia."""
+        if self._was_connected and not self.board.link_lost:
+            # Sesję zakończył użytkownik (przycisk na wadze / close()), nie radio
+            self.finished = True
+            self.board.close()
+            return False
+        return time.monotonic() >= self._next_attempt
+
+    def _connect(self):
+        """Blokująca część próby: wybór adresu (ew. skanowanie) i połączenie."""
+        address = self._pick_address()
+        if not address or not self.board.connect(address, timeout=self.connect_timeout): return address, False
+        if address != self._saved_address:
+            save_config(address)
+            trust_device(address) # bluetoothctl, też blokuje
+            self._saved_address = address
+        return address, True
+
+    def tick(self):
+        """
+        Jeden krok nadzorcy. Zwraca True gdy waga jest połączona.
+        Blokuje co najwyżej na czas jednej próby połączenia (connect_timeout),
+        a przy skanowaniu dłużej - w reaktorze używane jest tick_async().
+        """
+        if self.finished: return False
+        if self.connected: return True
+        if not self._due(): return False
+        return self._attempt_done(*self._connect())
+
+    def tick_async(self, executor):
+        """
+        Jak tick(), ale próba połączenia biegnie w `executor` (wątek), a wynik
+        jest odbierany w kolejnych wywołaniach. Nigdy nie blokuje.
+        """
+        if self._attempt is not None:
+            if not self._attempt.done(): return False
+            attempt, self._attempt = self._attempt, None
+            try: result = attempt.result()
+            except Exception as e:
+                logger.error(f"Błąd próby połączenia: {e}", exc_info=True)
+                result = (None, False)
+            return self._attempt_done(*result)
+        if self.finished: return False
+        if self.connected: return True
+        if self._due(): self._attempt = executor.submit(self._connect)
+        return False
+
+    def _attempt_done(self, address, ok):
+        if self.finished: # stop() w trakcie próby
+            self.board.close()
+            return False
+        if ok:
+            if self._was_connected:
+                self.reconnects += 1
+                logger.info(f"Połączono ponownie (próba {self.failures + 1}).")
+            self._was_connected = True
+            self.failures = 0
+            if self.reactor: self.reactor.add(self.board)
+            return True
+
+        self.failures += 1
+        if not self._was_connected and self._limit_reached():
+            logger.error("Rezygnuję z łączenia z wagą.")
+            self.gave_up = self.finished = True
+            self.board.close()
+            return False
+        self._next_attempt = time.monotonic() + self._backoff()
+        return False
+
+    def _limit_reached(self):
+        if self.fixed_address and self.max_failures is not None and self.failures >= self.max_failures:
+            return True
+        return self.max_scans is not None and self.empty_scans >= self.max_scans
+
+    def run(self):
+        """Pętla blokująca dla jednej wagi: łączy, czyta, po zerwaniu łączy ponownie."""
+        while not self.finished:
+            if self.tick():
+                self.board.loop()
+            elif not self.finished:
+                time.sleep(self.time_to_next_attempt())
+
+    def stop(self):
+        self.finished = True
+        self.board.close()
+
 class WiiboardPrint(Wiiboard):
-    def __init__(self, address=None):
+    def __init__(self, address=None, interactive=True, calibration_store=None, sensor_filter=None):
         self.tare_value = 0.0
         self.is_tared = False
         self.reading_count = 0
-        super().__init__(address)
+        super().__init__(address, interactive, calibration_store, sensor_filter=sensor_filter)
 
     def on_calibrated(self):
         super().on_calibrated()
         print("Upewnij się, że waga stoi PUSTA. Automatyczne tarowanie za chwilę...")
 
 
+    def on_sample(self, sample):
+        # Bez budowania dict na raport
+        self.on_mass_total(sample.total)
+
     def on_mass(self, mass):
-        total_mass = sum(mass.values())
+        self.on_mass_total(sum(mass.values()))
+
+    def on_mass_total(self, total_mass):
         if not self.is_tared:
             if self.reading_count < 10:
                 self.tare_value += total_mass
@@ -250,6 +693,7 @@ class WiiboardPrint(Wiiboard):
                 self.tare_value /= self.reading_count
                 self.is_tared = True
                 logger.info(f"Automatyczne tarowanie zakończone. Offset: {self.tare_value:.2f} kg.")
+                self.calibration_store.add_tare(self.address, self.tare_value)
         else:
             final_weight = total_mass - self.tare_value
             if final_weight < 0: final_weight = 0.0
@@ -288,74 +732,43 @@ def trust_device(address):
     return False
 
 if __name__ == '__main__':
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('[%(asctime)s][%(levelname)s] %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
     if '-d' in sys.argv:
         logger.setLevel(logging.DEBUG)
         sys.argv.remove('-d')
-
-    board = WiiboardPrint()
+    interactive = True
+    if '-n' in sys.argv:
+        interactive = False
+        sys.argv.remove('-n')
+    sensor_filter = None
+    if '-f' in sys.argv:
+        sensor_filter = {'median': 5, 'smoother': 'kalman', 'latency': 0.1}
+        sys.argv.remove('-f')
+
+    board = WiiboardPrint(interactive=interactive, sensor_filter=sensor_filter)
     address = None
-    connected = False
 
-    # 1. Priorytet: Argument wiersza poleceń
+    # 1. Priorytet: Argument wiersza poleceń, 2. Plik konfiguracyjny, 3. Skanowanie
     if len(sys.argv) > 1:
         address = sys.argv[1]
         logger.info(f"Łączenie z adresem podanym w argumencie: {address}")
-        if board.connect(address):
-            connected = True
-            save_config(address)
-            trust_device(address)
-        else:
-            logger.error("Nie udało się połączyć z podanym adresem.")
-            sys.exit(1)
-
-    # 2. Priorytet: Plik konfiguracyjny
-    if not connected:
-        cached_address = load_config()
-        if cached_address:
-            logger.info(f"Znaleziono zapamiętany adres: {cached_address}")
-            print(f"\n>>> 💡 Proszę wcisnąć przycisk POWER na wadze, aby się połączyć...", end="\n\n")
-            
-            # Próba połączenia przez kilka sekund (np. 5 sekund)
-            for i in range(1, 20):
-                print(f"   Próba połączenia {i}/20...   ", end='\r')
-                if board.connect(cached_address):
-                    print(f"\n")
-                    connected = True
-                    address = cached_address
-                    trust_device(address) # Upewniamy się, że jest zaufane
-                    break
-                time.sleep(0.5) 
-
-            if not connected:
-                logger.warning("\nNie udało się połączyć z zapamiętaną wagą. Przechodzę do skanowania...")
-
-    # 3. Priorytet: Skanowanie
-    if not connected:
-        print(">>> Rozpoczynam skanowanie otoczenia (to może chwilę potrwać)...")
-        try:
-            wiiboards = discover()
-            if not wiiboards:
-                logger.error("Nie znaleziono żadnej wagi. Naciśnij czerwony przycisk synchronizacji i spróbuj ponownie.")
-                sys.exit(1)
-            address = wiiboards[0]
-            logger.info(f"Znaleziono wagę: {address}")
-            if board.connect(address):
-                connected = True
-                save_config(address)
-                trust_device(address)
-        except bluetooth.btcommon.BluetoothError as e:
-            logger.error(f"Błąd Bluetooth podczas skanowania: {e}")
-            logger.error("Upewnij się, że Bluetooth jest włączony i masz odpowiednie uprawnienia (uruchom jako sudo).")
-            sys.exit(1)
+    elif load_config():
+        logger.info(f"Znaleziono zapamiętany adres: {load_config()}")
+        print(f"\n>>> 💡 Proszę wcisnąć przycisk POWER na wadze, aby się połączyć...", end="\n\n")
 
-    if connected:
-        try:
-            if board.controlsocket:
-                logger.info("Naciśnij przycisk zasilania na wadze lub CTRL+C, aby zakończyć.")
-                board.loop()
-        except KeyboardInterrupt:
-            print("\nProgram przerwany przez użytkownika.")
-        except Exception as e:
-            logger.error(f"Wystąpił nieoczekiwany błąd: {e}", exc_info=True)
-        finally:
-            board.close()
\ No newline at end of file
+    # Nadzorca łączy ponownie po zerwaniu łącza (backoff z jitterem); bez pierwszego
+    # połączenia (podany adres nie odpowiada, skanowanie nic nie znalazło) - kod wyjścia 1
+    supervisor = WiiboardSupervisor(board, address, max_failures=CLI_MAX_FAILURES, max_scans=CLI_MAX_SCANS)
+    try:
+        logger.info("Naciśnij przycisk zasilania na wadze lub CTRL+C, aby zakończyć.")
+        supervisor.run()
+    except KeyboardInterrupt:
+        print("\nProgram przerwany przez użytkownika.")
+    except Exception as e:
+        logger.error(f"Wystąpił nieoczekiwany błąd: {e}", exc_info=True)
+    finally:
+        board.close()
+    if supervisor.gave_up: sys.exit(1)
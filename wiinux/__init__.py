@@ -0,0 +1,62 @@
+"""
+Wiinux: Wii accessories (Balance Board, Wiimote IR) on Linux.
+
+Lazy facade over the library modules: `import wiinux` loads nothing, each
+name is imported on first access (PEP 562), so analysis and replay code
+never pulls in evdev or pybluez unless it touches a hardware transport:
+
+    from wiinux import IRTracker, iter_capture  # pure Python
+    from wiinux import WiiEyeNative             # imports evdev here
+
+The library only logs to the "wii_accessories" logger (and "wiiboard");
+applications call setup_logging() to get the classic console output.
+"""
+
+import logging
+import importlib
+
+LOG_FORMAT = '[%(asctime)s][%(levelname)s] %(message)s'
+
+# Public name -> module providing it
+_EXPORTS = {
+    # Signal processing (pure Python)
+    'MorseDecoder': 'wii_signal', 'StabilityMonitor': 'wii_signal', 'PulseMonitor': 'wii_signal',
+    'BitClockEstimator': 'wii_signal', 'estimate_bit_clock': 'wii_signal',
+    'IRTracker': 'wii_analytics', 'BoardAnalytics': 'wii_analytics', 'analytics_for': 'wii_analytics',
+    'load_profile': 'wii_analytics', 'save_profile': 'wii_analytics',
+    'center_of_pressure': 'wii_sync', 'combined_center_of_pressure': 'wii_sync',
+    'SwaySpectrum': 'wii_spectrum', 'BoardSpectra': 'wii_spectrum',
+    'SensorFilter': 'wii_filter',
+    # Transports (hardware backends are imported when opened)
+    'SampleBatch': 'wii_transport', 'open_transport': 'wii_transport', 'iter_capture': 'wii_transport',
+    'load_capture': 'wii_transport', 'ReplayTransport': 'wii_transport', 'SimulatorTransport': 'wii_transport',
+    'EvdevBoardTransport': 'wii_transport', 'EvdevIRTransport': 'wii_transport', 'L2capBoardTransport': 'wii_transport',
+    'L2capIRTransport': 'wii_transport',
+    # Storage
+    'CaptureReader': 'wii_capture', 'CaptureWriter': 'wii_capture', 'Catalog': 'wii_capture',
+    'FrameEncoder': 'wii_codec', 'decode_stream': 'wii_codec',
+    'CalibrationStore': 'wii_calibration', 'default_store': 'wii_calibration',
+    # Tools
+    'generate_lod_html': 'generate_ir_chart', 'run_batch': 'wii_batch',
+    'StatsRegistry': 'wii_stats',
+    # Drivers (evdev / pybluez)
+    'WiiEyeNative': 'Wii_accesories_bib', 'WiiboardNative': 'Wii_accesories_bib',
+    'list_board_paths': 'Wii_accesories_bib', 'BoardGroup': 'wii_sync',
+    'Wiiboard': 'wiiboard', 'WiiboardSupervisor': 'wiiboard', 'WiimoteIR': 'wii_remote',
+}
+
+__all__ = sorted(_EXPORTS) + ['setup_logging', 'LOG_FORMAT']
+
+def setup_logging(level=logging.INFO):
+    """Console logging as the command line tools use it (root logger)."""
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None: raise AttributeError(f"module 'wiinux' has no attribute '{name}'")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value # Next access skips __getattr__
+    return value
+
+def __dir__():
+    return __all__